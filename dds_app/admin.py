@@ -1,12 +1,16 @@
 from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db.models import Q
 from .models import Transaction
+from .search import comment_search_q
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ('date', 'user', 'get_status_display', 'get_type_display', 
                     'get_category_display', 'get_subcategory_display', 'amount', 'created_at')
     list_filter = ('status', 'type', 'category', 'user', 'date', 'created_at')
-    search_fields = ('comment', 'user__username', 'user__email')
+    # Комментарий ищется по FTS-индексу в get_search_results, а не LIKE
+    search_fields = ('user__username', 'user__email')
     ordering = ('-date', '-created_at')
     date_hierarchy = 'date'
     list_per_page = 25
@@ -24,6 +28,19 @@ class TransactionAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по комментарию (FTS5) или по имени/email пользователя"""
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+
+        users = User.objects.filter(Q(username__icontains=search_term) | Q(email__icontains=search_term))
+        condition = Q(user__in=users.values('pk'))
+        comment_condition = comment_search_q(search_term, queryset.db)
+        if comment_condition is not None:
+            condition |= comment_condition
+        return queryset.filter(condition), False
+
     def get_status_display(self, obj):
         return obj.get_status_display()
     get_status_display.short_description = 'Статус'
@@ -0,0 +1,231 @@
+"""
+Async-варианты представлений, нагружающих в основном чтение.
+
+Подключаются вместо синхронных при DDS_ASYNC_VIEWS = True (по умолчанию
+под ASGI, см. dds_project/asgi.py). Пока запрос ждёт SQLite, воркер
+обслуживает другие запросы; выборки идут через async ORM (aiterator,
+afirst), а разбор фильтров, кэш и шаблоны общие с синхронными views.
+"""
+
+import csv
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse, StreamingHttpResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import render
+from django.views import View
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag, require_GET
+
+from .cache import get_result_cache
+from .conditional import make_etag, not_modified, set_validators
+from .balance import attach_balances
+from .facets import base_criteria, facet_counts, facet_groups
+from .forms import CashFlowReportForm, PivotReportForm
+from .models import UserDataVersion
+from .money import minor_units
+from .pagination import KeysetPaginator
+from .pivot import build_pivot, pivot_queryset
+from .taxonomy import CATEGORIES_BY_TYPE, SUBCATEGORIES_BY_CATEGORY
+from .views import (
+    TransactionExportView as SyncTransactionExportView,
+    TransactionListView as SyncTransactionListView,
+    _Echo,
+    cashflow_report_context,
+    cashflow_report_queries,
+    pivot_report_options,
+    taxonomy_etag,
+    taxonomy_response,
+)
+
+
+class AsyncLoginRequiredMixin(LoginRequiredMixin):
+    """LoginRequiredMixin для async-представлений: пользователь загружается через request.auser()"""
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Ленивый request.user в async-контексте обратился бы к БД синхронно;
+        # шаблоны и контекст-процессоры получат уже загруженного пользователя
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await View.dispatch(self, request, *args, **kwargs)
+
+
+class TransactionListView(AsyncLoginRequiredMixin, SyncTransactionListView):
+    """Список транзакций: те же фильтры, кэш и условный GET, выборка через async ORM"""
+
+    async def get(self, request):
+        # Построение queryset может проверить наличие FTS-индекса - это запрос к БД
+        transactions_queryset, filter_form = await sync_to_async(self.get_filtered_queryset)(request)
+        cursor = request.GET.get('cursor')
+        criteria = filter_form.cleaned_data if filter_form.is_valid() else {}
+
+        version, changed_at = await UserDataVersion.objects.acurrent(request.user)
+        # Страница содержит CSRF-токен формы массовых действий: новый секрет - новая копия.
+        # get_token создаёт секрет уже сейчас, если у клиента его ещё нет
+        get_token(request)
+        page_etag = make_etag(
+            request.user.pk, version, criteria, cursor, self.paginate_by, request.META['CSRF_COOKIE'],
+        )
+        response = not_modified(request, page_etag, changed_at)
+        if response is not None:
+            return response
+
+        cache_key = get_result_cache().make_key(request.user.pk, version, criteria, cursor, self.paginate_by)
+        page = await get_result_cache().aget_or_compute(
+            cache_key, lambda: self.aget_page(request, transactions_queryset, criteria, cursor)
+        )
+
+        facets_key = get_result_cache().make_key(request.user.pk, version, base_criteria(criteria), 'facets')
+        # Построение queryset с поиском проверяет FTS-индекс, а values_list().aiterator()
+        # выполняет запрос прямо в event loop - группы читаются целиком в потоке
+        groups = await get_result_cache().aget_or_compute(
+            facets_key, sync_to_async(lambda: list(facet_groups(request.user, criteria))),
+        )
+        counts = facet_counts(groups, criteria)
+
+        response = render(
+            request, 'dds_app/transaction_list.html', self.get_context_data(request, page, filter_form, counts),
+        )
+        return set_validators(response, page_etag, changed_at)
+
+    async def aget_page(self, request, transactions_queryset, criteria, cursor):
+        """get_page через async ORM"""
+        page = await KeysetPaginator(transactions_queryset, per_page=self.paginate_by).apage(cursor)
+        if page.object_list:
+            balances = self.get_balances_queryset(request, transactions_queryset, criteria, page.object_list)
+            attach_balances(page.object_list, [row async for row in balances.aiterator()])
+        return page
+
+
+class TransactionExportView(AsyncLoginRequiredMixin, SyncTransactionExportView):
+    """
+    Потоковая выгрузка в CSV из async-генератора.
+
+    Синхронный итератор StreamingHttpResponse под ASGI вычитывается
+    целиком до отправки первого байта; здесь строки читаются через
+    aiterator() частями по chunk_size, и каждая часть уходит клиенту сразу.
+    """
+
+    async def get(self, request):
+        transactions_queryset, filter_form = await sync_to_async(self.get_filtered_queryset)(request)
+        # values_list().aiterator() выполняет запрос в event loop, values() - в потоке
+        rows = transactions_queryset.order_by(*KeysetPaginator.ordering).values(
+            'date', 'status', 'type', 'category', 'subcategory', 'comment', amount_minor=minor_units('amount'),
+        )
+        rows = rows.using(rows.db)
+
+        response = StreamingHttpResponse(
+            self._astream_rows(rows.aiterator(chunk_size=self.chunk_size)),
+            content_type='text/csv; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
+        return response
+
+    async def _astream_rows(self, rows):
+        writer = csv.writer(_Echo())
+        # BOM, чтобы Excel открывал файл в UTF-8
+        yield '\ufeff' + writer.writerow(self.HEADER)
+        # Одно сообщение ASGI на часть, а не на строку
+        lines = []
+        async for row in rows:
+            lines.append(writer.writerow(self.csv_row(
+                row['date'], row['status'], row['type'], row['category'], row['subcategory'],
+                row['amount_minor'], row['comment'],
+            )))
+            if len(lines) >= self.chunk_size:
+                yield ''.join(lines)
+                lines.clear()
+        if lines:
+            yield ''.join(lines)
+
+
+@login_required
+async def taxonomy(request, version=None):
+    """Справочник тип -> категория -> подкатегория (см. views.taxonomy)"""
+    return taxonomy_response(request, version)
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@etag(taxonomy_etag)
+async def load_categories(request):
+    """AJAX загрузка категорий по типу транзакции"""
+    return JsonResponse(CATEGORIES_BY_TYPE.get(request.GET.get('type_value'), []), safe=False)
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@etag(taxonomy_etag)
+async def load_subcategories(request):
+    """AJAX загрузка подкатегорий по категории"""
+    return JsonResponse(SUBCATEGORIES_BY_CATEGORY.get(request.GET.get('category_value'), []), safe=False)
+
+
+@login_required
+async def cashflow_report(request):
+    """Отчёт ДДС по агрегатам (см. views.cashflow_report)"""
+    user = await request.auser()
+    request.user = user
+    form = CashFlowReportForm(request.GET or None)
+
+    version, changed_at = await UserDataVersion.objects.acurrent(user)
+    report_etag = make_etag(user.pk, version, form.cleaned_data if form.is_valid() else {}, 'cashflow')
+    response = not_modified(request, report_etag, changed_at)
+    if response is not None:
+        return response
+
+    period, grouped, by_category = cashflow_report_queries(user, form)
+    grouped_rows = [row async for row in grouped.aiterator()]
+    category_rows = [row async for row in by_category.aiterator()]
+    response = render(
+        request, 'dds_app/cashflow_report.html',
+        cashflow_report_context(form, period, grouped_rows, category_rows),
+    )
+    return set_validators(response, report_etag, changed_at)
+
+
+async def _apivot(user, form):
+    period, date_from, date_to = pivot_report_options(form)
+    rows = [row async for row in pivot_queryset(user, date_from, date_to).aiterator()]
+    return build_pivot(rows, period, date_from, date_to)
+
+
+@login_required
+async def pivot_report(request):
+    """Сводный отчёт ДДС (см. views.pivot_report)"""
+    user = await request.auser()
+    request.user = user
+    form = PivotReportForm(request.GET or None)
+
+    version, changed_at = await UserDataVersion.objects.acurrent(user)
+    report_etag = make_etag(user.pk, version, form.cleaned_data if form.is_valid() else {}, 'pivot')
+    response = not_modified(request, report_etag, changed_at)
+    if response is not None:
+        return response
+
+    report = await _apivot(user, form)
+    response = render(request, 'dds_app/pivot_report.html', {'form': form, 'report': report})
+    return set_validators(response, report_etag, changed_at)
+
+
+@require_GET
+async def pivot_report_api(request):
+    """JSON API сводного отчёта ДДС (см. views.pivot_report_api)"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+
+    form = PivotReportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'error': 'Неверные параметры отчёта', 'errors': form.errors}, status=400)
+
+    version, changed_at = await UserDataVersion.objects.acurrent(user)
+    report_etag = make_etag(user.pk, version, form.cleaned_data, 'pivot-json')
+    response = not_modified(request, report_etag, changed_at)
+    if response is not None:
+        return response
+
+    return set_validators(JsonResponse(await _apivot(user, form)), report_etag, changed_at)
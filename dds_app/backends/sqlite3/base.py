@@ -0,0 +1,69 @@
+"""
+SQLite-бэкенд с настройкой соединения под конкурентную нагрузку.
+
+На каждом новом соединении выполняются PRAGMA из DDS_SQLITE_PRAGMAS
+(поверх DEFAULT_PRAGMAS) и из OPTIONS['pragmas'] конкретной БД:
+WAL - читатели не блокируют писателя и наоборот, busy_timeout - вместо
+мгновенного "database is locked" соединение ждёт освобождения блокировки.
+Вместе с CONN_MAX_AGE настройка выполняется один раз на соединение,
+а не на каждый запрос.
+
+    DATABASES = {'default': {'ENGINE': 'dds_app.backends.sqlite3', ...}}
+"""
+
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+
+# busy_timeout первым: следующие PRAGMA (journal_mode) могут ждать блокировку
+DEFAULT_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,
+    'temp_store': 'MEMORY',
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+_NAME_RE = re.compile(r'^[a-z_]+$')
+_VALUE_RE = re.compile(r'^-?\w+$')
+
+
+def pragma_statements(pragmas):
+    """PRAGMA-команды из словаря {имя: значение}; None в значении отключает PRAGMA"""
+    statements = []
+    for name, value in pragmas.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            value = int(value)
+        if not _NAME_RE.match(name) or not _VALUE_RE.match(str(value)):
+            raise ImproperlyConfigured(f'Invalid SQLite pragma: {name} = {value!r}')
+        statements.append(f'PRAGMA {name} = {value}')
+    return statements
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # OPTIONS['pragmas'] - параметр бэкенда, а не sqlite3.connect()
+        params.pop('pragmas', None)
+        return params
+
+    @property
+    def pragmas(self):
+        return {
+            **DEFAULT_PRAGMAS,
+            **getattr(settings, 'DDS_SQLITE_PRAGMAS', {}),
+            **self.settings_dict['OPTIONS'].get('pragmas', {}),
+        }
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for statement in pragma_statements(self.pragmas):
+            conn.execute(statement)
+        return conn
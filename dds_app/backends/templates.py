@@ -0,0 +1,32 @@
+"""
+Бэкенд шаблонов Django с замером времени рендеринга для PerformanceMiddleware.
+
+Шаблоны бэкенда рендерятся через dds_app.middleware.time_rendering: внутри
+запроса время попадает в метрики запроса (Server-Timing, tpl), вне
+запроса рендеринг ничем не отличается от штатного.
+
+    TEMPLATES = [{'BACKEND': 'dds_app.backends.templates.TimedDjangoTemplates', 'NAME': 'django', ...}]
+"""
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from dds_app.middleware import time_rendering
+
+
+class TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        return time_rendering(super().render, context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,85 @@
+"""
+Нарастающий остаток в списке транзакций.
+
+Остаток строки - поступления минус списания по всем строкам выборки от
+самой старой до неё включительно. Для строк страницы он считается одним
+запросом: оконная сумма Sum(...) OVER (ORDER BY date, created_at, id)
+только по строкам страницы плюс входящий остаток - сумма строк старше
+самой старой строки страницы. Входящий остаток берётся из дневных
+агрегатов ДДС за предыдущие дни и транзакций того же дня, поэтому
+глубокая страница не пересуммирует всю историю. С поиском по комментарию
+агрегаты неприменимы, и входящий остаток суммируется по найденным строкам.
+"""
+
+from django.db.models import BigIntegerField, Case, F, Q, Subquery, Sum, Value, When, Window
+from django.db.models.expressions import RowRange
+from django.db.models.functions import Coalesce
+
+from .models import CashFlowRollup, Transaction
+from .money import from_minor
+from .pagination import KeysetPaginator
+
+
+# Суммы и остатки считаются в копейках (см. dds_app.money)
+AMOUNT_FIELD = BigIntegerField()
+
+
+def signed(field):
+    """Сумма в копейках со знаком: поступление - плюс, списание - минус"""
+    return Case(
+        When(type=Transaction.Type.INCOME, then=F(field)),
+        default=-F(field),
+        output_field=AMOUNT_FIELD,
+    )
+
+
+def _sum_subquery(queryset, field):
+    """Скалярный подзапрос: сумма со знаком по queryset (0, если строк нет)"""
+    total = queryset.order_by().annotate(group=Value(1)).values('group').annotate(
+        total=Sum(signed(field))
+    ).values('total')
+    return Coalesce(Subquery(total, output_field=AMOUNT_FIELD), Value(0), output_field=AMOUNT_FIELD)
+
+
+def opening_balance(user, queryset, cleaned_data, oldest, apply_filters):
+    """
+    Выражение входящего остатка для строк выборки queryset, идущих после oldest.
+
+    apply_filters(queryset, cleaned_data, date_field) - фильтр списка,
+    которым отбираются агрегаты ДДС за дни до oldest.date.
+    """
+    key = (oldest.date, oldest.created_at, oldest.pk)
+    if cleaned_data.get('q'):
+        return _sum_subquery(queryset.filter(KeysetPaginator._before_key(key)), 'amount')
+
+    rollups = apply_filters(
+        CashFlowRollup.objects.filter(user=user, day__lt=oldest.date), cleaned_data, date_field='day',
+    )
+    # Условие на ключ внутри дня без date < ...: иначе SQLite выбирает по
+    # индексу диапазон дат и перебирает всю историю до этого дня
+    same_day = queryset.filter(
+        Q(created_at__lt=oldest.created_at) | Q(created_at=oldest.created_at, id__lt=oldest.pk),
+        date=oldest.date,
+    )
+    return _sum_subquery(rollups, 'total') + _sum_subquery(same_day, 'amount')
+
+
+def page_balances(user, queryset, rows, cleaned_data, apply_filters):
+    """Запрос (pk, остаток) для строк страницы rows (в порядке списка)"""
+    running = Window(
+        Sum(signed('amount')),
+        order_by=[F(name).asc() for name in KeysetPaginator.reverse_ordering],
+        frame=RowRange(start=None, end=0),
+    )
+    opening = opening_balance(user, queryset, cleaned_data, rows[-1], apply_filters)
+    return Transaction.objects.filter(pk__in=[row.pk for row in rows]).annotate(
+        balance=running + opening
+    ).values('pk', 'balance').order_by()
+
+
+def attach_balances(rows, balances):
+    """Проставить строкам страницы атрибут balance из строк page_balances"""
+    by_pk = {row['pk']: row['balance'] for row in balances}
+    for row in rows:
+        row.balance = from_minor(by_pk[row.pk])
+    return rows
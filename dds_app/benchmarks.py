@@ -0,0 +1,432 @@
+"""Бенчмарки основных представлений и путей модели"""
+
+import importlib.util
+import json
+import platform
+import statistics
+import time
+from datetime import datetime, timezone
+
+import django
+from django.conf import settings
+from django.db import connection, transaction as db_transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+from django.template import engines
+from django.urls import reverse
+
+from .columnar import get_columnar_engine
+from .models import CashFlowRollup, Transaction
+from .money import minor_units
+from .pagination import KeysetPaginator
+from .views import TransactionListView
+
+
+BENCHMARKS = {}
+
+# Параметры фильтров списка: типичный AND-фильтр и широкий OR-фильтр
+AND_FILTER = {
+    'filter_mode': 'and',
+    'status': ['business'],
+    'type': ['expense'],
+    'category': ['food'],
+}
+OR_FILTER = {
+    'filter_mode': 'or',
+    'status': ['tax'],
+    'category': ['marketing', 'infrastructure'],
+    'subcategory': ['farpost'],
+}
+SEARCH_FILTER = {
+    'filter_mode': 'and',
+    'q': 'Ашан',
+}
+
+TRANSACTION_DATA = {
+    'date': '2024-05-17',
+    'status': 'business',
+    'type': 'expense',
+    'category': 'infrastructure',
+    'subcategory': 'vps',
+    'amount': '1250.00',
+    'comment': 'benchmark',
+}
+
+
+class BenchmarkError(Exception):
+    """Сценарий бенчмарка отработал не так, как ожидалось"""
+
+
+# Кэш результатов и кэш строк списка для сценариев с cached=True; остальные идут мимо кэшей
+CACHED_RESULTS = {
+    'BACKEND': 'dds_app.cache.LRUCacheBackend',
+    'OPTIONS': {'max_entries': 512},
+}
+CACHED_ROWS = {
+    'BACKEND': 'dds_app.cache.LRUCacheBackend',
+    'OPTIONS': {'max_entries': 10000},
+}
+
+
+def benchmark(name, cached=False, requires=None):
+    """
+    Зарегистрировать сценарий: фабрику, возвращающую измеряемую функцию.
+
+    requires - необязательный модуль, без которого сценарий пропускается.
+    """
+    def decorator(factory):
+        factory.cached = cached
+        factory.requires = requires
+        BENCHMARKS[name] = factory
+        return factory
+    return decorator
+
+
+def _expect(response, status_code):
+    if response.status_code != status_code:
+        raise BenchmarkError(f'expected HTTP {status_code}, got {response.status_code}')
+    return response
+
+
+def _rolled_back(func):
+    """Выполнить func в транзакции с откатом: набор данных не меняется между прогонами"""
+    def run():
+        with db_transaction.atomic():
+            func()
+            db_transaction.set_rollback(True)
+    return run
+
+
+class BenchmarkContext:
+    """Пользователь набора данных, залогиненный клиент и образец транзакции"""
+
+    def __init__(self, user):
+        self.user = user
+        self.client = Client()
+        self.client.force_login(user)
+        self.sample = Transaction.objects.filter(user=user).order_by('-date', '-created_at', '-id').first()
+        if self.sample is None:
+            raise BenchmarkError(f'user {user.username} has no transactions')
+
+
+@benchmark('list.no_filter')
+def list_no_filter(ctx):
+    url = reverse('dds_app:transaction_list')
+    return lambda: _expect(ctx.client.get(url), 200)
+
+
+@benchmark('list.and_filter')
+def list_and_filter(ctx):
+    url = reverse('dds_app:transaction_list')
+    return lambda: _expect(ctx.client.get(url, AND_FILTER), 200)
+
+
+@benchmark('list.or_filter')
+def list_or_filter(ctx):
+    url = reverse('dds_app:transaction_list')
+    return lambda: _expect(ctx.client.get(url, OR_FILTER), 200)
+
+
+@benchmark('list.search')
+def list_search(ctx):
+    url = reverse('dds_app:transaction_list')
+    return lambda: _expect(ctx.client.get(url, SEARCH_FILTER), 200)
+
+
+@benchmark('list.no_filter_cached', cached=True)
+def list_no_filter_cached(ctx):
+    url = reverse('dds_app:transaction_list')
+    return lambda: _expect(ctx.client.get(url), 200)
+
+
+@benchmark('list.not_modified')
+def list_not_modified(ctx):
+    url = reverse('dds_app:transaction_list')
+    page_etag = _expect(ctx.client.get(url), 200)['ETag']
+    return lambda: _expect(ctx.client.get(url, headers={'If-None-Match': page_etag}), 304)
+
+
+# Рендер строк списка: RENDER_ROWS строк шаблоном строки и из кэша фрагментов (dds_app.rows)
+RENDER_ROWS = 1000
+
+
+def _render_rows(ctx):
+    rows = list(Transaction.objects.filter(user=ctx.user).order_by(*KeysetPaginator.ordering)[:RENDER_ROWS])
+    balance = 0
+    for row in reversed(rows):
+        balance += row.amount if row.type == Transaction.Type.INCOME else -row.amount
+        row.balance = balance
+    template = engines['django'].from_string('{% load transaction_rows %}{% transaction_rows transactions %}')
+    return lambda: template.render({'transactions': rows})
+
+
+@benchmark('render.rows')
+def render_rows(ctx):
+    return _render_rows(ctx)
+
+
+@benchmark('render.rows_cached', cached=True)
+def render_rows_cached(ctx):
+    return _render_rows(ctx)
+
+
+@benchmark('create.post')
+def create_post(ctx):
+    url = reverse('dds_app:transaction_create')
+
+    def run():
+        _expect(ctx.client.post(url, TRANSACTION_DATA), 302)
+        # Сообщение об успехе не накапливается в cookie между прогонами
+        ctx.client.cookies.pop('messages', None)
+    return _rolled_back(run)
+
+
+@benchmark('edit.post')
+def edit_post(ctx):
+    url = reverse('dds_app:transaction_edit', args=[ctx.sample.pk])
+
+    def run():
+        _expect(ctx.client.post(url, TRANSACTION_DATA), 302)
+        ctx.client.cookies.pop('messages', None)
+    return _rolled_back(run)
+
+
+@benchmark('list.bulk_status')
+def list_bulk_status(ctx):
+    url = reverse('dds_app:transaction_bulk_action')
+    data = {'action': 'status', 'status': 'tax', 'all_matching': 'on', 'filter_query': 'filter_mode=and&type=income'}
+
+    def run():
+        _expect(ctx.client.post(url, data), 302)
+        ctx.client.cookies.pop('messages', None)
+    return _rolled_back(run)
+
+
+# Размер пачки в сценариях bulk JSON API
+API_BATCH = 1000
+
+
+@benchmark('api.bulk_create')
+def api_bulk_create(ctx):
+    url = reverse('dds_app:transactions_bulk')
+    body = json.dumps({'transactions': [TRANSACTION_DATA] * API_BATCH})
+    return _rolled_back(lambda: _expect(ctx.client.post(url, body, content_type='application/json'), 200))
+
+
+@benchmark('api.bulk_update')
+def api_bulk_update(ctx):
+    url = reverse('dds_app:transactions_bulk')
+    ids = Transaction.objects.filter(user=ctx.user).values_list('pk', flat=True)[:API_BATCH]
+    body = json.dumps({'transactions': [{'id': pk, 'amount': '99.00', 'comment': 'benchmark'} for pk in ids]})
+    return _rolled_back(lambda: _expect(ctx.client.post(url, body, content_type='application/json'), 200))
+
+
+@benchmark('report.pivot')
+def report_pivot(ctx):
+    url = reverse('dds_app:pivot_report')
+    return lambda: _expect(ctx.client.get(url, {'period': 'month'}), 200)
+
+
+@benchmark('report.pivot_export')
+def report_pivot_export(ctx):
+    url = reverse('dds_app:pivot_report_export')
+    return lambda: _expect(ctx.client.get(url, {'period': 'quarter'}), 200)
+
+
+# Аналитика: сумма по категориям и месяцам под AND-фильтром
+ANALYTICS_GROUP_BY = ('category', 'month')
+
+
+@benchmark('api.analytics', requires='numpy')
+def api_analytics(ctx):
+    url = reverse('dds_app:transactions_analytics')
+    params = {**AND_FILTER, 'group_by': list(ANALYTICS_GROUP_BY)}
+    return lambda: _expect(ctx.client.get(url, params), 200)
+
+
+@benchmark('analytics.columnar', requires='numpy')
+def analytics_columnar(ctx):
+    engine = get_columnar_engine()
+    engine.snapshot(ctx.user)
+    return lambda: engine.aggregate(ctx.user, AND_FILTER, ANALYTICS_GROUP_BY)
+
+
+@benchmark('analytics.sql')
+def analytics_sql(ctx):
+    """Та же группировка одним GROUP BY по транзакциям - для сравнения с analytics.columnar"""
+    queryset = TransactionListView()._apply_filters(Transaction.objects.filter(user=ctx.user), AND_FILTER)
+    grouped = queryset.order_by().annotate(month=TruncMonth('date')).values('category', 'month').annotate(
+        total=Sum('amount'), count=Count('id'),
+    ).order_by('category', 'month')
+    return lambda: list(grouped.all())
+
+
+# Суммы по всем транзакциям набора: в БД и построчно в Python (в копейках)
+@benchmark('sum.aggregate')
+def sum_aggregate(ctx):
+    queryset = Transaction.objects.filter(user=ctx.user)
+    return lambda: queryset.aggregate(total=Sum('amount'), count=Count('id'))
+
+
+@benchmark('sum.rows')
+def sum_rows(ctx):
+    """Чистый поток построчно в Python - как при выгрузке и пересчёте агрегатов"""
+    rows = Transaction.objects.filter(user=ctx.user).order_by().values_list('type', minor_units('amount'))
+
+    def run():
+        total = 0
+        for type_value, amount in rows.iterator(chunk_size=10000):
+            total += amount if type_value == Transaction.Type.INCOME else -amount
+        return total
+    return run
+
+
+@benchmark('rollups.deltas')
+def rollups_deltas(ctx):
+    queryset = Transaction.objects.filter(user=ctx.user)
+    return lambda: CashFlowRollup.objects.deltas_for(queryset)
+
+
+@benchmark('rollups.rebuild')
+def rollups_rebuild(ctx):
+    return _rolled_back(lambda: CashFlowRollup.objects.rebuild(ctx.user))
+
+
+@benchmark('export.csv')
+def export_csv(ctx):
+    url = reverse('dds_app:transaction_export')
+
+    def run():
+        for _ in _expect(ctx.client.get(url), 200).streaming_content:
+            pass
+    return run
+
+
+@benchmark('model.full_clean')
+def model_full_clean(ctx):
+    return ctx.sample.full_clean
+
+
+@benchmark('model.save')
+def model_save(ctx):
+    return _rolled_back(ctx.sample.save)
+
+
+@benchmark('ajax.taxonomy')
+def ajax_taxonomy(ctx):
+    url = reverse('dds_app:taxonomy')
+    return lambda: _expect(ctx.client.get(url), 200)
+
+
+@benchmark('ajax.load_categories')
+def ajax_load_categories(ctx):
+    url = reverse('dds_app:ajax_load_categories')
+    return lambda: _expect(ctx.client.get(url, {'type_value': 'expense'}), 200)
+
+
+@benchmark('ajax.load_subcategories')
+def ajax_load_subcategories(ctx):
+    url = reverse('dds_app:ajax_load_subcategories')
+    return lambda: _expect(ctx.client.get(url, {'category_value': 'infrastructure'}), 200)
+
+
+def measure(func, repeat, warmup=1):
+    """Время выполнения func в миллисекундах: сводная статистика по repeat прогонам"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        'runs': repeat,
+        'min_ms': round(timings[0], 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        'max_ms': round(timings[-1], 3),
+    }
+
+
+def _available(factory):
+    return factory.requires is None or importlib.util.find_spec(factory.requires) is not None
+
+
+def run_benchmarks(user, names=None, repeat=20, warmup=1):
+    """
+    Прогнать сценарии на данных пользователя.
+
+    Запросы идут через полный стек middleware; журнал медленных SQL
+    на время прогона отключён, кэш результатов и кэш строк списка включены
+    только для сценариев с cached=True. Помимо времени для каждого сценария
+    записывается число SQL-запросов одного вызова.
+    """
+    if names:
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise BenchmarkError(f'unknown benchmarks: {", ".join(unknown)}')
+        missing = [name for name in names if not _available(BENCHMARKS[name])]
+        if missing:
+            raise BenchmarkError(f'{", ".join(missing)}: required module is not installed')
+    else:
+        names = [name for name, factory in BENCHMARKS.items() if _available(factory)]
+
+    dataset = Transaction.objects.filter(user=user).count()
+    results = []
+    with override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        DDS_SLOW_QUERY_LOG_ENABLED=False,
+    ):
+        ctx = BenchmarkContext(user)
+        for name in names:
+            factory = BENCHMARKS[name]
+            with override_settings(
+                DDS_RESULT_CACHE=CACHED_RESULTS if factory.cached else None,
+                DDS_ROW_CACHE=CACHED_ROWS if factory.cached else None,
+            ):
+                func = factory(ctx)
+                stats = measure(func, repeat, warmup)
+                with CaptureQueriesContext(connection) as queries:
+                    func()
+            results.append({'benchmark': name, 'dataset': dataset, 'queries': len(queries), **stats})
+    return results
+
+
+def environment():
+    """Сведения об окружении для сопоставимости прогонов"""
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'platform': platform.platform(),
+    }
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Сравнить медианы с базовым прогоном.
+
+    Возвращает строки (benchmark, dataset, baseline_ms, current_ms, ratio, verdict),
+    verdict - 'slower'/'faster', если медиана изменилась больше чем на threshold,
+    иначе 'same'. Сценарии без пары в базовом прогоне пропускаются.
+    """
+    previous = {(entry['benchmark'], entry['dataset']): entry for entry in baseline}
+    rows = []
+    for entry in results:
+        base = previous.get((entry['benchmark'], entry['dataset']))
+        if base is None or not base['median_ms']:
+            continue
+        ratio = entry['median_ms'] / base['median_ms']
+        if ratio > 1 + threshold:
+            verdict = 'slower'
+        elif ratio < 1 - threshold:
+            verdict = 'faster'
+        else:
+            verdict = 'same'
+        rows.append((entry['benchmark'], entry['dataset'], base['median_ms'], entry['median_ms'], ratio, verdict))
+    return rows
@@ -0,0 +1,136 @@
+"""Пакетная валидация и загрузка транзакций без full_clean() на каждую строку"""
+
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction as db_transaction
+
+from .models import Transaction
+
+
+TRANSACTION_FIELDS = ('date', 'status', 'type', 'category', 'subcategory', 'amount', 'comment')
+
+# Поля модели берутся один раз: их clean() выполняет те же проверки
+# (тип, choices, max_digits/decimal_places), что и full_clean()
+_MODEL_FIELDS = {name: Transaction._meta.get_field(name) for name in TRANSACTION_FIELDS}
+
+INVALID_TYPE = 'Неверный тип значения'
+
+
+def clean_transaction_data(data):
+    """
+    Проверить данные одной транзакции по правилам модели.
+
+    Возвращает пару (cleaned_data, errors), где errors - словарь
+    {поле: сообщение}. Экземпляр модели и запросы к БД не создаются.
+    """
+    cleaned = {}
+    errors = {}
+
+    for name, field in _MODEL_FIELDS.items():
+        value = data.get(name)
+        if isinstance(value, str):
+            value = value.strip()
+        elif isinstance(value, (bool, list, dict)):
+            # True - не сумма 1.00, а ошибка клиента
+            errors[name] = INVALID_TYPE
+            continue
+        try:
+            cleaned[name] = field.clean(value, None)
+        except ValidationError as e:
+            errors[name] = '; '.join(e.messages)
+        except (TypeError, ValueError):
+            # Например, число вместо даты: to_python ждёт строку
+            errors[name] = INVALID_TYPE
+
+    if not errors:
+        errors.update(Transaction.relation_errors(
+            cleaned['type'], cleaned['category'], cleaned['subcategory']
+        ))
+
+    return cleaned, errors
+
+
+def _is_id(value):
+    """pk транзакции из JSON: целое число, но не true/false"""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def iter_batches(iterable, size):
+    """Разбить поток на списки длиной не больше size"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def save_transaction_batch(user, items, atomic=True):
+    """
+    Создать и обновить транзакции пользователя пачкой.
+
+    items - словари полей транзакции; элемент с "id" обновляет
+    существующую транзакцию пользователя (недостающие поля берутся из неё),
+    без "id" - создаёт новую. Все элементы проверяются до записи, затем
+    выполняются один bulk_create и один bulk_update в одной транзакции БД.
+
+    atomic=True - при любой ошибке ничего не записывается; atomic=False -
+    записываются прошедшие проверку элементы.
+
+    Возвращает список результатов по элементам в исходном порядке:
+    {'index', 'status': 'created' | 'updated' | 'error' | 'skipped', 'id' | 'errors'}.
+    """
+    update_ids = {item['id'] for item in items if isinstance(item, dict) and _is_id(item.get('id'))}
+    existing = Transaction.objects.filter(user=user).in_bulk(update_ids)
+
+    results = []
+    to_create, to_update = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results.append({'index': index, 'status': 'error', 'errors': {'__all__': 'Ожидается объект'}})
+            continue
+
+        target = None
+        if 'id' in item:
+            target = existing.get(item['id']) if _is_id(item['id']) else None
+            if target is None:
+                results.append({'index': index, 'status': 'error', 'errors': {'id': 'Транзакция не найдена'}})
+                continue
+            data = {name: item.get(name, getattr(target, name)) for name in TRANSACTION_FIELDS}
+        else:
+            data = item
+
+        cleaned, errors = clean_transaction_data(data)
+        if errors:
+            results.append({'index': index, 'status': 'error', 'errors': errors})
+        elif target is None:
+            obj = Transaction(user=user, **cleaned)
+            to_create.append(obj)
+            results.append({'index': index, 'status': 'created', 'object': obj})
+        else:
+            for name, value in cleaned.items():
+                setattr(target, name, value)
+            to_update.append(target)
+            results.append({'index': index, 'status': 'updated', 'object': target})
+
+    failed = any(result['status'] == 'error' for result in results)
+    if atomic and failed:
+        for result in results:
+            if result.pop('object', None) is not None:
+                result['status'] = 'skipped'
+        return results
+
+    with db_transaction.atomic():
+        if to_create:
+            Transaction.objects.bulk_create(to_create, batch_size=1000)
+        if to_update:
+            # Один объект мог прийти несколько раз - обновляется последним значением
+            Transaction.objects.bulk_update(list({obj.pk: obj for obj in to_update}.values()),
+                                            TRANSACTION_FIELDS, batch_size=500)
+
+    for result in results:
+        obj = result.pop('object', None)
+        if obj is not None:
+            result['id'] = obj.pk
+    return results
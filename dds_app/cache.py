@@ -0,0 +1,294 @@
+"""
+Кэш результатов списка транзакций.
+
+Ключ записи включает пользователя, нормализованные параметры фильтра,
+курсор страницы и версию данных пользователя (UserDataVersion). Любая
+запись транзакций увеличивает версию, поэтому устаревшие записи никогда
+не запрашиваются и со временем вытесняются бэкендом.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+class BaseCacheBackend:
+    """Хранилище записей кэша; get возвращает None при промахе"""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def get_many(self, keys):
+        """{ключ: значение} для найденных ключей"""
+        values = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    def set_many(self, mapping):
+        for key, value in mapping.items():
+            self.set(key, value)
+
+    async def aget(self, key):
+        return await sync_to_async(self.get)(key)
+
+    async def aset(self, key, value):
+        await sync_to_async(self.set)(key, value)
+
+    def info(self):
+        """Сведения для мониторинга (размер, вытеснения)"""
+        return {}
+
+
+class LRUCacheBackend(BaseCacheBackend):
+    """
+    In-process LRU-кэш.
+
+    Записи живут в памяти процесса, без сериализации; при переполнении
+    вытесняются давно не запрашивавшиеся.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                return None
+            return self._entries[key]
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def get_many(self, keys):
+        values = {}
+        with self._lock:
+            for key in keys:
+                value = self._entries.get(key)
+                if value is not None:
+                    self._entries.move_to_end(key)
+                    values[key] = value
+        return values
+
+    def set_many(self, mapping):
+        with self._lock:
+            for key, value in mapping.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # Память процесса: блокировка держится микросекунды, поток не нужен
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, value):
+        self.set(key, value)
+
+    def info(self):
+        return {'entries': len(self._entries), 'max_entries': self.max_entries, 'evictions': self.evictions}
+
+
+class DjangoCacheBackend(BaseCacheBackend):
+    """
+    Записи в кэше Django (CACHES[alias]): общий для процессов кэш.
+
+    Вытеснение выполняет сам бэкенд: LocMemCache - LRU по MAX_ENTRIES,
+    Redis/Memcached - по своей политике (allkeys-lru и т.п.).
+    """
+
+    def __init__(self, alias='default', timeout=300, key_prefix='dds:list:'):
+        self.alias = alias
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(self.key_prefix + key)
+
+    def set(self, key, value):
+        self.cache.set(self.key_prefix + key, value, self.timeout)
+
+    def get_many(self, keys):
+        prefix = self.key_prefix
+        return {key[len(prefix):]: value for key, value in self.cache.get_many([prefix + key for key in keys]).items()}
+
+    def set_many(self, mapping):
+        self.cache.set_many({self.key_prefix + key: value for key, value in mapping.items()}, self.timeout)
+
+    async def aget(self, key):
+        return await self.cache.aget(self.key_prefix + key)
+
+    async def aset(self, key, value):
+        await self.cache.aset(self.key_prefix + key, value, self.timeout)
+
+    def clear(self):
+        # Записи чужих префиксов не трогаем: устаревшие вытеснит сам кэш
+        pass
+
+    def info(self):
+        return {'alias': self.alias, 'timeout': self.timeout}
+
+
+def _normalize(value):
+    if isinstance(value, (list, tuple, set)):
+        return sorted(str(item) for item in value)
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def normalize_criteria(cleaned_data):
+    """
+    Параметры фильтра в каноническом виде: пустые значения отброшены,
+    списки отсортированы, даты в ISO. Одинаковые по смыслу фильтры
+    дают одинаковый ключ независимо от порядка параметров в URL.
+    """
+    return {
+        name: _normalize(value)
+        for name, value in sorted(cleaned_data.items())
+        if value not in (None, '', [], ())
+    }
+
+
+class ResultCache:
+    """Кэш результатов с версионированными ключами и счётчиками попаданий"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    @staticmethod
+    def make_key(user_id, version, criteria, *extra):
+        """Ключ записи: пользователь, версия его данных, фильтр и прочие параметры (курсор, размер страницы)"""
+        payload = json.dumps(
+            [normalize_criteria(criteria), list(extra)], sort_keys=True, default=str, ensure_ascii=False,
+        )
+        digest = hashlib.sha256(payload.encode()).hexdigest()[:32]
+        return f'u{user_id}:v{version}:{digest}'
+
+    def get_or_compute(self, key, compute):
+        """Значение из кэша или результат compute(), который сохраняется в кэш"""
+        if not self.enabled:
+            return compute()
+
+        value = self.backend.get(key)
+        if value is not None:
+            self._count('hits')
+            return value
+
+        self._count('misses')
+        value = compute()
+        # Внутри транзакции результат может включать незафиксированные
+        # изменения, а версия после отката повторится - такое не кэшируем
+        if connection.in_atomic_block:
+            self._count('skipped')
+        else:
+            self.backend.set(key, value)
+        return value
+
+    async def aget_or_compute(self, key, acompute):
+        """get_or_compute для async-представлений: acompute - функция, возвращающая корутину"""
+        if not self.enabled:
+            return await acompute()
+
+        value = await self.backend.aget(key)
+        if value is not None:
+            self._count('hits')
+            return value
+
+        self._count('misses')
+        value = await acompute()
+        # Async-представления не работают внутри atomic(), проверка на транзакцию не нужна
+        await self.backend.aset(key, value)
+        return value
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        """Счётчики процесса для мониторинга"""
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__ if self.enabled else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'skipped': self.skipped,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            **(self.backend.info() if self.enabled else {}),
+        }
+
+    def clear(self):
+        if self.enabled:
+            self.backend.clear()
+        with self._lock:
+            self.hits = self.misses = self.skipped = 0
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """
+    Кэш результатов по настройке DDS_RESULT_CACHE.
+
+    {'BACKEND': 'dds_app.cache.LRUCacheBackend', 'OPTIONS': {...}};
+    None отключает кэширование.
+    """
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                config = getattr(settings, 'DDS_RESULT_CACHE', None)
+                backend = None
+                if config:
+                    backend = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+                _result_cache = ResultCache(backend)
+    return _result_cache
+
+
+@receiver(setting_changed)
+def _reset_result_cache(setting, **kwargs):
+    global _result_cache
+    if setting == 'DDS_RESULT_CACHE':
+        _result_cache = None
@@ -0,0 +1,379 @@
+"""
+Колоночные снимки транзакций пользователя для аналитики (NumPy).
+
+Снимок - массивы по всем транзакциям пользователя: id (int64), день
+(int32, дни от 1970-01-01), сумма (int64, копейки) и коды справочников
+(uint8, порядковый номер значения в TextChoices). Фильтры и группировки
+выполняются масками и векторными операциями над массивами, без запросов
+к БД (кроме поиска по комментарию - он идёт через FTS-индекс).
+
+Снимок строится при первом запросе и хранится в LRU в пределах бюджета
+памяти. Записи транзакций догоняют загруженные снимки после фиксации
+(сигнал transactions_changed): изменённые строки перечитываются по pk.
+Снимок, пропустивший изменение (запись из другого процесса, массовая
+операция без списка pk), отстаёт по версии данных пользователя и
+перестраивается при следующем запросе.
+
+NumPy - необязательная зависимость: без него аналитика недоступна,
+остальное приложение работает.
+"""
+
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import transaction as db_transaction
+from django.dispatch import receiver
+
+from .models import Transaction, UserDataVersion, transactions_changed
+from .money import from_minor, minor_units
+from .search import comment_search_q
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImproperlyConfigured('The columnar analytics engine (DDS_COLUMNAR) requires numpy')
+    return numpy
+
+
+EPOCH = date(1970, 1, 1)
+
+# Справочные поля снимка и их коды: индекс значения в TextChoices
+CHOICE_FIELDS = {
+    'status': Transaction.Status.values,
+    'type': Transaction.Type.values,
+    'category': Transaction.Category.values,
+    'subcategory': Transaction.Subcategory.values,
+}
+CODES = {name: {value: code for code, value in enumerate(values)} for name, values in CHOICE_FIELDS.items()}
+
+# Значение вне справочника (например, после ручной правки БД)
+UNKNOWN_CODE = 255
+
+# Поля, по которым можно группировать: справочники и периоды
+GROUP_FIELDS = (*CHOICE_FIELDS, 'date', 'month', 'year')
+
+# Колонки выборки для снимка; сумма читается сразу в копейках, без Decimal
+SOURCE_COLUMNS = ('id', 'date', minor_units('amount'), *CHOICE_FIELDS)
+
+
+def _columns(rows):
+    """Массивы снимка из строк values_list(*SOURCE_COLUMNS)"""
+    np = _numpy()
+    rows = list(rows)
+    columns = {
+        'id': np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+        'day': np.fromiter(((row[1] - EPOCH).days for row in rows), dtype=np.int32, count=len(rows)),
+        'amount': np.fromiter((row[2] for row in rows), dtype=np.int64, count=len(rows)),
+    }
+    for index, name in enumerate(CHOICE_FIELDS, start=3):
+        codes = CODES[name]
+        columns[name] = np.fromiter(
+            (codes.get(row[index], UNKNOWN_CODE) for row in rows), dtype=np.uint8, count=len(rows),
+        )
+    return columns
+
+
+class ColumnarSnapshot:
+    """Колонки транзакций одного пользователя на версии его данных version"""
+
+    # До стольких возможных ключей группы считаются через bincount, дальше - через сортировку
+    DENSE_GROUPS = 1 << 20
+
+    def __init__(self, user_id, version, columns):
+        self.user_id = user_id
+        self.version = version
+        self.columns = columns
+
+    @classmethod
+    def build(cls, user_id, version, using='default'):
+        rows = Transaction.objects.using(using).filter(user_id=user_id).order_by().values_list(*SOURCE_COLUMNS)
+        return cls(user_id, version, _columns(rows.iterator(chunk_size=10000)))
+
+    @property
+    def rows(self):
+        return len(self.columns['id'])
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def patched(self, version, removed_ids, rows):
+        """
+        Новый снимок: строки removed_ids удалены, rows (values_list) добавлены.
+
+        Массивы не меняются на месте - запросы, уже читающие этот снимок
+        в других потоках, видят его целиком.
+        """
+        np = _numpy()
+        keep = ~np.isin(self.columns['id'], np.fromiter(removed_ids, dtype=np.int64))
+        added = _columns(rows)
+        columns = {
+            name: np.concatenate((column[keep], added[name]))
+            for name, column in self.columns.items()
+        }
+        return ColumnarSnapshot(self.user_id, version, columns)
+
+    def mask(self, cleaned_data):
+        """
+        Маска строк под фильтр формы TransactionFilterForm - та же логика,
+        что у TransactionListView._apply_filters: справочники объединяются
+        по filter_mode, даты и поиск по комментарию сужают результат всегда.
+        """
+        np = _numpy()
+        mask = np.ones(self.rows, dtype=bool)
+        if cleaned_data.get('date_from'):
+            mask &= self.columns['day'] >= (cleaned_data['date_from'] - EPOCH).days
+        if cleaned_data.get('date_to'):
+            mask &= self.columns['day'] <= (cleaned_data['date_to'] - EPOCH).days
+
+        conditions = []
+        for name in CHOICE_FIELDS:
+            selected = cleaned_data.get(name)
+            if selected:
+                # Таблица кодов вместо isin: одно индексирование на строку
+                table = np.zeros(256, dtype=bool)
+                table[[CODES[name][value] for value in selected if value in CODES[name]]] = True
+                conditions.append(table[self.columns[name]])
+        if conditions:
+            combine = np.logical_or if cleaned_data.get('filter_mode') == 'or' else np.logical_and
+            mask &= combine.reduce(conditions)
+
+        condition = comment_search_q(cleaned_data['q'], user_id=self.user_id) if cleaned_data.get('q') else None
+        if condition is not None:
+            found = Transaction.objects.filter(condition, user_id=self.user_id).values_list('pk', flat=True)
+            mask &= np.isin(self.columns['id'], np.fromiter(found, dtype=np.int64))
+        return mask
+
+    def _group_codes(self, name, mask):
+        """Целочисленные коды группы для отобранных строк и функция, возвращающая значение по коду"""
+        np = _numpy()
+        if name in CHOICE_FIELDS:
+            values = CHOICE_FIELDS[name]
+            return (
+                self.columns[name][mask].astype(np.int64),
+                lambda code: values[code] if code < len(values) else None,
+            )
+        days = self.columns['day'][mask].astype('datetime64[D]')
+        if name == 'date':
+            return days.astype(np.int64), lambda code: EPOCH + timedelta(days=int(code))
+        if name == 'month':
+            return (
+                days.astype('datetime64[M]').astype(np.int64),
+                lambda code: date(1970 + int(code) // 12, int(code) % 12 + 1, 1),
+            )
+        return days.astype('datetime64[Y]').astype(np.int64), lambda code: 1970 + int(code)
+
+    def aggregate(self, cleaned_data, group_by=()):
+        """
+        Сумма и количество транзакций под фильтром в разрезе group_by.
+
+        Возвращает список словарей {поле группы: значение, ..., 'total': Decimal,
+        'count': int} в порядке групп (справочники - в порядке TextChoices,
+        периоды - по возрастанию); без group_by - одна строка.
+        """
+        np = _numpy()
+        unknown = [name for name in group_by if name not in GROUP_FIELDS]
+        if unknown:
+            raise ValueError(f'Группировка по {", ".join(unknown)} не поддерживается')
+
+        mask = self.mask(cleaned_data)
+        amounts = self.columns['amount'][mask]
+        if not group_by:
+            return [{'total': from_minor(int(amounts.sum())), 'count': len(amounts)}]
+
+        # Составной ключ группы: коды полей в смешанной системе счисления
+        keys = np.zeros(len(amounts), dtype=np.int64)
+        decoders = []
+        for name in group_by:
+            codes, decode = self._group_codes(name, mask)
+            low = int(codes.min()) if len(codes) else 0
+            radix = int(codes.max()) - low + 1 if len(codes) else 1
+            keys = keys * radix + (codes - low)
+            decoders.append((name, decode, low, radix))
+
+        size = 1
+        for *_, radix in decoders:
+            size *= radix
+        if size <= self.DENSE_GROUPS and int(np.abs(amounts).sum()) < 2 ** 53:
+            # Ключей немного: счётчики по плотному массиву без сортировки.
+            # Суммы в float64 точны, пока модуль суммы меньше 2**53 копеек
+            counts = np.bincount(keys, minlength=size)
+            groups = np.flatnonzero(counts)
+            totals = np.rint(np.bincount(keys, weights=amounts, minlength=size)[groups]).astype(np.int64)
+            counts = counts[groups]
+        else:
+            groups, inverse = np.unique(keys, return_inverse=True)
+            totals = np.zeros(len(groups), dtype=np.int64)
+            np.add.at(totals, inverse, amounts)
+            counts = np.bincount(inverse, minlength=len(groups))
+
+        result = []
+        for key, total, count in zip(groups.tolist(), totals.tolist(), counts.tolist()):
+            row = {}
+            for name, decode, low, radix in reversed(decoders):
+                key, code = divmod(key, radix)
+                row[name] = decode(code + low)
+            result.append({
+                **{name: row[name] for name in group_by},
+                'total': from_minor(total),
+                'count': count,
+            })
+        return result
+
+
+class ColumnarEngine:
+    """LRU снимков пользователей в пределах бюджета памяти"""
+
+    def __init__(self, memory_budget_mb=256):
+        _numpy()
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.builds = 0
+        self.patches = 0
+        self.evictions = 0
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+
+    def snapshot(self, user, version=None):
+        """Снимок данных пользователя, актуальный для версии version (по умолчанию - текущей)"""
+        if version is None:
+            version = UserDataVersion.objects.current(user)[0]
+        with self._lock:
+            snapshot = self._snapshots.get(user.pk)
+            if snapshot is not None and snapshot.version >= version:
+                self._snapshots.move_to_end(user.pk)
+                return snapshot
+
+        snapshot = ColumnarSnapshot.build(user.pk, version)
+        with self._lock:
+            self.builds += 1
+            self._store(snapshot)
+        return snapshot
+
+    def aggregate(self, user, cleaned_data, group_by=(), version=None):
+        """ColumnarSnapshot.aggregate по актуальному снимку пользователя"""
+        return self.snapshot(user, version).aggregate(cleaned_data, group_by)
+
+    def loaded(self, user_ids):
+        """Пользователи из user_ids, чьи снимки сейчас в памяти"""
+        with self._lock:
+            return [user_id for user_id in user_ids if user_id in self._snapshots]
+
+    def patch(self, versions, changed_ids, using='default'):
+        """
+        Догнать снимки после зафиксированной записи.
+
+        versions - {user_id: версия после записи}; changed_ids - pk
+        созданных, изменённых и удалённых транзакций или None, если они
+        неизвестны (снимки этих пользователей сбрасываются). Снимок
+        патчится, только если он на версию позади записи - иначе он
+        пропустил чужие изменения и тоже сбрасывается.
+        """
+        with self._lock:
+            current = {user_id: self._snapshots.get(user_id) for user_id in versions}
+        stale = [
+            user_id for user_id, snapshot in current.items()
+            if snapshot is None or changed_ids is None or snapshot.version != versions[user_id] - 1
+        ]
+        targets = {user_id: snapshot for user_id, snapshot in current.items() if user_id not in stale}
+
+        rows_by_user = {user_id: [] for user_id in targets}
+        if targets and changed_ids:
+            # Строка могла сменить владельца, поэтому выборка по одним pk
+            for row in Transaction.objects.using(using).filter(pk__in=changed_ids).order_by().values_list(
+                'user_id', *SOURCE_COLUMNS
+            ):
+                if row[0] in rows_by_user:
+                    rows_by_user[row[0]].append(row[1:])
+        patched = [
+            snapshot.patched(versions[user_id], changed_ids, rows_by_user[user_id])
+            for user_id, snapshot in targets.items()
+        ]
+
+        with self._lock:
+            for user_id in stale:
+                if self._snapshots.pop(user_id, None) is not None:
+                    self.evictions += 1
+            for snapshot in patched:
+                # Пока строился патч, снимок мог смениться - берём только более новый
+                existing = self._snapshots.get(snapshot.user_id)
+                if existing is None or existing.version < snapshot.version:
+                    self.patches += 1
+                    self._store(snapshot)
+
+    def _store(self, snapshot):
+        """Положить снимок в LRU и вытеснить старые сверх бюджета; вызывается под блокировкой"""
+        if snapshot.nbytes > self.memory_budget:
+            return
+        self._snapshots[snapshot.user_id] = snapshot
+        self._snapshots.move_to_end(snapshot.user_id)
+        used = sum(entry.nbytes for entry in self._snapshots.values())
+        while used > self.memory_budget:
+            _, evicted = self._snapshots.popitem(last=False)
+            used -= evicted.nbytes
+            self.evictions += 1
+
+    def stats(self):
+        """Счётчики процесса для мониторинга"""
+        with self._lock:
+            return {
+                'snapshots': len(self._snapshots),
+                'rows': sum(snapshot.rows for snapshot in self._snapshots.values()),
+                'bytes': sum(snapshot.nbytes for snapshot in self._snapshots.values()),
+                'memory_budget': self.memory_budget,
+                'builds': self.builds,
+                'patches': self.patches,
+                'evictions': self.evictions,
+            }
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_columnar_engine():
+    """
+    Движок по настройке DDS_COLUMNAR ({'memory_budget_mb': ...});
+    None, если аналитика выключена. Без numpy - ImproperlyConfigured.
+    """
+    global _engine
+    config = getattr(settings, 'DDS_COLUMNAR', None)
+    if config is None:
+        return None
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = ColumnarEngine(**config)
+    return _engine
+
+
+@receiver(transactions_changed)
+def _patch_snapshots(sender, using, user_ids, changed_ids=None, **kwargs):
+    """
+    Запомнить версии затронутых пользователей внутри транзакции записи
+    (писатель держит блокировку, версия точно его) и патчить снимки
+    после фиксации; при откате снимки не трогаются.
+    """
+    engine = _engine
+    if engine is None:
+        return
+    loaded = engine.loaded(user_ids)
+    if not loaded:
+        return
+    versions = dict(
+        UserDataVersion.objects.using(using).filter(user_id__in=loaded).values_list('user_id', 'version')
+    )
+    changed_ids = None if changed_ids is None else list(changed_ids)
+    db_transaction.on_commit(lambda: engine.patch(versions, changed_ids, using), using=using)
+
+
+@receiver(setting_changed)
+def _reset_engine(setting, **kwargs):
+    global _engine
+    if setting == 'DDS_COLUMNAR':
+        _engine = None
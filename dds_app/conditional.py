@@ -0,0 +1,64 @@
+"""
+Условные GET-запросы для страниц с данными пользователя.
+
+Валидаторы строятся из версии данных пользователя (UserDataVersion):
+ETag - хэш версии, параметров запроса и версии шаблонов, Last-Modified -
+время последнего изменения его транзакций. Если у клиента актуальная
+копия, ответ 304 отдаётся без выборки данных и рендеринга шаблона.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+
+from django.contrib import messages
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .cache import normalize_criteria
+
+
+def _templates_version():
+    """Хэш шаблонов приложения: после деплоя с новой разметкой валидаторы меняются"""
+    digest = hashlib.sha256()
+    for path in sorted((Path(__file__).resolve().parent / 'templates').rglob('*.html')):
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+TEMPLATES_VERSION = _templates_version()
+
+
+def make_etag(user_id, version, criteria=None, *extra):
+    """Сильный ETag состояния данных пользователя для конкретных параметров запроса"""
+    payload = json.dumps(
+        [user_id, version, TEMPLATES_VERSION, normalize_criteria(criteria or {}), list(extra)],
+        sort_keys=True, default=str, ensure_ascii=False,
+    )
+    return '"%s"' % hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def not_modified(request, etag, changed_at):
+    """
+    Ответ 304, если копия клиента актуальна, иначе None.
+
+    Пока есть непоказанные flash-сообщения, страницу нужно отрендерить,
+    поэтому 304 не отдаётся.
+    """
+    if len(messages.get_messages(request)):
+        return None
+    last_modified = int(changed_at.timestamp()) if changed_at else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, changed_at)
+    return response
+
+
+def set_validators(response, etag, changed_at):
+    """ETag/Last-Modified и обязательная перепроверка у сервера перед использованием копии"""
+    response['ETag'] = etag
+    if changed_at:
+        response['Last-Modified'] = http_date(changed_at.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
@@ -0,0 +1,79 @@
+"""
+Счётчики фильтров списка транзакций (фасеты).
+
+Все счётчики считаются из одного GROUP BY по четырём полям фильтра с
+учётом периода и поиска, дальше - в Python по нескольким десяткам групп.
+Без поиска группируются агрегаты ДДС (их строк меньше, чем транзакций),
+с поиском - найденные транзакции. Сгруппированные строки кэшируются по
+версии данных пользователя, поэтому смена отмеченных вариантов не стоит
+запроса к БД.
+"""
+
+from django.db.models import Count, Sum
+
+from .models import CashFlowRollup, Transaction
+
+
+FACET_FIELDS = ('status', 'type', 'category', 'subcategory')
+
+
+def base_criteria(cleaned_data):
+    """Параметры фильтра, от которых зависят сгруппированные строки"""
+    return {name: cleaned_data.get(name) for name in ('date_from', 'date_to', 'q')}
+
+
+def facet_groups(user, cleaned_data):
+    """Запрос: (status, type, category, subcategory, число строк) в пределах периода и поиска"""
+    date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+
+    if cleaned_data.get('q'):
+        queryset = Transaction.objects.filter(user=user).search(cleaned_data['q'], user=user)
+        date_field, rows = 'date', Count('id')
+    else:
+        queryset = CashFlowRollup.objects.filter(user=user)
+        date_field, rows = 'day', Sum('count')
+
+    if date_from:
+        queryset = queryset.filter(**{f'{date_field}__gte': date_from})
+    if date_to:
+        queryset = queryset.filter(**{f'{date_field}__lte': date_to})
+    return queryset.order_by().values_list(*FACET_FIELDS).annotate(rows=rows)
+
+
+def facet_counts(groups, cleaned_data):
+    """
+    Счётчики {поле: {значение: число строк}} для вариантов фильтра.
+
+    В режиме AND вариант считается с учётом отмеченных вариантов остальных
+    полей (сколько строк даст выбор этого варианта). В режиме OR - сколько
+    строк вариант добавит к выборке: строки, уже отобранные отмеченными
+    вариантами остальных полей, не считаются.
+    """
+    selected = {name: set(cleaned_data.get(name) or ()) for name in FACET_FIELDS}
+    or_mode = cleaned_data.get('filter_mode') == 'or'
+    counts = {name: {} for name in FACET_FIELDS}
+
+    for *values, rows in groups:
+        row = dict(zip(FACET_FIELDS, values))
+        for name in FACET_FIELDS:
+            others = [other for other in FACET_FIELDS if other != name and selected[other]]
+            if or_mode:
+                # Строка уже в выборке по другому полю - вариант её не добавит
+                skip = any(row[other] in selected[other] for other in others)
+            else:
+                skip = any(row[other] not in selected[other] for other in others)
+            if skip:
+                continue
+            counts[name][row[name]] = counts[name].get(row[name], 0) + rows
+    return counts
+
+
+def facet_choices(filter_form, counts):
+    """Варианты полей формы фильтра с их счётчиками: {поле: [(вариант, число), ...]}"""
+    return {
+        name: [
+            (choice, counts[name].get(choice.data['value'], 0) if counts is not None else None)
+            for choice in filter_form[name]
+        ]
+        for name in FACET_FIELDS
+    }
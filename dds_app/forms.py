@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from .models import Transaction
+from .pivot import MAX_COLUMNS, period_span
 from datetime import datetime
 
 
@@ -23,9 +24,6 @@ class TransactionForm(forms.ModelForm):
         
         if self.instance.pk:
             # Режим редактирования
-            print(f"Setting up form for editing transaction {self.instance.pk}")
-            print(f"Original values: type={self.instance.type}, category={self.instance.category}, subcategory={self.instance.subcategory}")
-            
             # В режиме редактирования оставляем все варианты доступными
             # Django автоматически выберет правильные значения из instance
             # AJAX будет работать только при изменении пользователем
@@ -36,84 +34,47 @@ class TransactionForm(forms.ModelForm):
             
         else:
             # Режим создания
-            print("Setting up form for creating new transaction")
-            
-            # При создании начинаем с пустых выборов для AJAX
-            self.fields['category'].choices = [('', '---------')]
-            self.fields['subcategory'].choices = [('', '---------')]
+            if self.is_bound:
+                # Выборы по отправленным значениям: иначе подгруженные
+                # через AJAX категория и подкатегория не пройдут валидацию
+                self.fields['category'].choices = self._get_category_choices(self.data.get(self.add_prefix('type')))
+                self.fields['subcategory'].choices = self._get_subcategory_choices(
+                    self.data.get(self.add_prefix('category'))
+                )
+            else:
+                # При создании начинаем с пустых выборов для AJAX
+                self.fields['category'].choices = [('', '---------')]
+                self.fields['subcategory'].choices = [('', '---------')]
 
     def clean(self):
-        """Расширенная валидация с детальным логированием"""
-        print("\n" + "="*50)
-        print("FORM VALIDATION STARTED")
-        print("="*50)
-        
-        # Логируем исходные данные
-        if hasattr(self, 'data'):
-            print("Raw POST data:")
-            for key, value in self.data.items():
-                if key != 'csrfmiddlewaretoken':
-                    print(f"  {key}: {value}")
-        
-        # Вызываем родительскую валидацию
+        """Проверка связей тип -> категория -> подкатегория"""
         cleaned_data = super().clean()
         
-        print(f"\nCleaned data after super().clean():")
-        for key, value in cleaned_data.items():
-            print(f"  {key}: {repr(value)}")
-        
         # Получаем значения для проверки зависимостей
         transaction_type = cleaned_data.get('type')
         category = cleaned_data.get('category')
         subcategory = cleaned_data.get('subcategory')
         
-        print(f" Validating dependencies:")
-        print(f"  Type: {repr(transaction_type)}")
-        print(f"  Category: {repr(category)}")
-        print(f"  Subcategory: {repr(subcategory)}")
-        
         # Валидация 1: Тип -> Категория
         if transaction_type and category:
             allowed_categories = Transaction.TYPE_CATEGORY_MAP.get(transaction_type, [])
-            print(f"  Allowed categories for type '{transaction_type}': {allowed_categories}")
-            
+
             if category not in allowed_categories:
                 category_display = dict(Transaction.Category.choices).get(category, category)
                 type_display = dict(Transaction.Type.choices).get(transaction_type, transaction_type)
                 error_msg = f'Категория "{category_display}" не относится к выбранному типу "{type_display}"'
-                
-                print(f"  VALIDATION ERROR: {error_msg}")
                 self.add_error('category', error_msg)
-            else:
-                print(f" Category validation passed")
 
         # Валидация 2: Категория -> Подкатегория
         if category and subcategory:
             allowed_subcategories = Transaction.CATEGORY_SUBCATEGORY_MAP.get(category, [])
-            print(f"  Allowed subcategories for category '{category}': {allowed_subcategories}")
-            
+
             if subcategory not in allowed_subcategories:
                 subcategory_display = dict(Transaction.Subcategory.choices).get(subcategory, subcategory)
                 category_display = dict(Transaction.Category.choices).get(category, category)
                 error_msg = f'Подкатегория "{subcategory_display}" не относится к выбранной категории "{category_display}"'
-                
-                print(f"  VALIDATION ERROR: {error_msg}")
                 self.add_error('subcategory', error_msg)
-            else:
-                print(f" Subcategory validation passed")
 
-        # Логируем финальные ошибки
-        if self.errors:
-            print(f"\nFinal form errors:")
-            for field, errors in self.errors.items():
-                print(f"  {field}: {errors}")
-        else:
-            print(f" Form validation successful - no errors")
-        
-        print("="*50)
-        print("FORM VALIDATION COMPLETED")
-        print("="*50 + "\n")
-        
         return cleaned_data
 
     def _get_category_choices(self, transaction_type_value):
@@ -219,6 +180,147 @@ class TransactionFilterForm(forms.Form):
         widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
     )
 
+    q = forms.CharField(
+        label="Поиск по комментарию",
+        required=False,
+        max_length=200,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'type': 'search', 'placeholder': 'Например: Ашан'})
+    )
+
+
+class TransactionBulkActionForm(forms.Form):
+    """Массовое действие над выбранными в списке транзакциями"""
+
+    ACTION_CHOICES = (
+        ('status', 'Изменить статус'),
+        ('recategorize', 'Изменить категорию'),
+        ('delete', 'Удалить'),
+    )
+
+    action = forms.ChoiceField(
+        choices=ACTION_CHOICES,
+        label="Действие",
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    ids = forms.Field(required=False, widget=forms.MultipleHiddenInput)
+    # Применить ко всем транзакциям, подходящим под фильтр, а не только к отмеченным
+    all_matching = forms.BooleanField(required=False)
+    filter_query = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    status = forms.ChoiceField(
+        choices=[('', 'Статус')] + list(Transaction.Status.choices),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    category = forms.ChoiceField(
+        choices=[('', 'Категория')] + list(Transaction.Category.choices),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    subcategory = forms.ChoiceField(
+        choices=[('', 'Подкатегория')] + list(Transaction.Subcategory.choices),
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+
+    def clean_ids(self):
+        try:
+            return [int(value) for value in self.cleaned_data['ids'] or []]
+        except (TypeError, ValueError):
+            raise forms.ValidationError('Некорректный список транзакций')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.errors:
+            return cleaned_data
+
+        if not cleaned_data['ids'] and not cleaned_data['all_matching']:
+            raise forms.ValidationError('Не выбрано ни одной транзакции')
+
+        action = cleaned_data['action']
+        if action == 'status' and not cleaned_data['status']:
+            self.add_error('status', 'Выберите статус')
+        elif action == 'recategorize':
+            category, subcategory = cleaned_data['category'], cleaned_data['subcategory']
+            if not category or not subcategory:
+                raise forms.ValidationError('Выберите категорию и подкатегорию')
+            # Тип определяется категорией; строки другого типа отсекает представление
+            cleaned_data['type'] = next(
+                type_value for type_value, categories in Transaction.TYPE_CATEGORY_MAP.items()
+                if category in categories
+            )
+            errors = Transaction.relation_errors(cleaned_data['type'], category, subcategory)
+            if errors:
+                raise forms.ValidationError(list(errors.values()))
+        return cleaned_data
+
+
+class CashFlowReportForm(forms.Form):
+    """Параметры отчёта о движении денежных средств"""
+
+    PERIOD_CHOICES = (
+        ('month', 'По месяцам'),
+        ('day', 'По дням'),
+    )
+
+    period = forms.ChoiceField(
+        choices=PERIOD_CHOICES,
+        initial='month',
+        required=False,
+        label="Группировка",
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    date_from = forms.DateField(
+        label="Дата с",
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    date_to = forms.DateField(
+        label="Дата по",
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+
+
+class PivotReportForm(forms.Form):
+    """Параметры сводного отчёта ДДС: шаг столбцов и период"""
+
+    PERIOD_CHOICES = (
+        ('month', 'По месяцам'),
+        ('quarter', 'По кварталам'),
+        ('year', 'По годам'),
+    )
+
+    period = forms.ChoiceField(
+        choices=PERIOD_CHOICES,
+        initial='month',
+        required=False,
+        label="Столбцы",
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    date_from = forms.DateField(
+        label="Дата с",
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    date_to = forms.DateField(
+        label="Дата по",
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError('Дата начала позже даты окончания')
+        period = cleaned_data.get('period') or 'month'
+        if date_from and date_to and period_span(date_from, date_to, period) > MAX_COLUMNS:
+            raise forms.ValidationError(
+                f'Слишком длинный период: не больше {MAX_COLUMNS} столбцов отчёта'
+            )
+        return cleaned_data
+
 
 class UserRegistrationForm(UserCreationForm):
     """Форма регистрации пользователя"""
@@ -0,0 +1,112 @@
+import json
+import logging
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from dds_app.benchmarks import BENCHMARKS, BenchmarkError, compare, environment, run_benchmarks
+from dds_app.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Time the core views and model paths on generated datasets and compare with a baseline run'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, nargs='+', default=[10000],
+            help='Dataset sizes to benchmark, e.g. --rows 10000 100000 1000000',
+        )
+        parser.add_argument('--benchmark', action='append', choices=sorted(BENCHMARKS),
+                            help='Run only this benchmark (repeatable)')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per benchmark')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed runs before measuring')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for generated datasets')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--baseline', help='JSON results of a previous run to compare against')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative median change reported as slower/faster (default 0.2 = 20%%)')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error if any benchmark got slower than the baseline')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be positive')
+
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as baseline_file:
+                    baseline = json.load(baseline_file)['results']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f'Cannot read baseline {options["baseline"]}: {e}')
+
+        # Построчные логи middleware и отладочные сообщения не должны влиять на замеры
+        app_logger = logging.getLogger('dds_app')
+        previous_level = app_logger.level
+        app_logger.setLevel(logging.WARNING)
+        try:
+            results = []
+            for rows in options['rows']:
+                user = self._dataset_user(rows, options)
+                self.stdout.write(f'Dataset {rows} rows ({user.username})')
+                try:
+                    dataset_results = run_benchmarks(
+                        user, options['benchmark'], options['repeat'], options['warmup'],
+                    )
+                except BenchmarkError as e:
+                    raise CommandError(str(e))
+                for entry in dataset_results:
+                    self.stdout.write(
+                        f'  {entry["benchmark"]:<26} median {entry["median_ms"]:>9.2f} ms  '
+                        f'p95 {entry["p95_ms"]:>9.2f} ms  {entry["queries"]:>3} queries'
+                    )
+                results.extend(dataset_results)
+        finally:
+            app_logger.setLevel(previous_level)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output_file:
+                json.dump({'environment': environment(), 'results': results}, output_file, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if baseline is not None:
+            self._report_comparison(compare(results, baseline, options['threshold']), options)
+
+    def _dataset_user(self, rows, options):
+        """Пользователь с ровно rows транзакциями; создаётся генератором seed_db"""
+        prefix = f'bench{rows}_'
+        username = f'{prefix}1'
+        user = User.objects.filter(username=username).first()
+        if user is None:
+            self.stdout.write(f'Generating dataset of {rows} rows...')
+            call_command(
+                'seed_db', users=1, per_user=rows, seed=options['seed'],
+                username_prefix=prefix, verbosity=0,
+            )
+            user = User.objects.get(username=username)
+
+        count = Transaction.objects.filter(user=user).count()
+        if count != rows:
+            raise CommandError(
+                f'Dataset user {username} has {count} transactions instead of {rows}; '
+                f'delete the user to regenerate it'
+            )
+        return user
+
+    def _report_comparison(self, rows, options):
+        self.stdout.write('')
+        self.stdout.write('Comparison with baseline (median):')
+        regressions = 0
+        for name, dataset, base_ms, current_ms, ratio, verdict in rows:
+            line = f'  {name:<26} {dataset:>8}  {base_ms:>9.2f} -> {current_ms:>9.2f} ms  x{ratio:.2f}'
+            if verdict == 'slower':
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line + '  slower'))
+            elif verdict == 'faster':
+                self.stdout.write(self.style.SUCCESS(line + '  faster'))
+            else:
+                self.stdout.write(line)
+
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'{regressions} benchmark(s) slower than the baseline')
@@ -0,0 +1,165 @@
+import http.client
+import json
+import statistics
+import threading
+import time
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from dds_app.benchmarks import environment
+
+
+DEFAULT_PATHS = (
+    '/dds_app/transactions/',
+    '/dds_app/transactions/?filter_mode=and&category=food&status=business',
+    '/dds_app/reports/cashflow/',
+    '/dds_app/ajax/load-categories/?type_value=expense',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure concurrent-client throughput of a running server (runserver/gunicorn for WSGI, '
+        'uvicorn for ASGI) and compare it with a previous run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the running server')
+        parser.add_argument('--user', required=True, help='Username whose session the clients use')
+        parser.add_argument('--path', action='append', help='Path to request (repeatable; default: read views)')
+        parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32],
+                            help='Concurrency levels, e.g. --clients 1 8 32')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per concurrency level')
+        parser.add_argument('--label', default='', help='Name of the setup, e.g. wsgi or asgi')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--baseline', help='JSON results of a previous run to compare throughput with')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+
+        target = urlsplit(options['url'])
+        if target.scheme != 'http' or not target.hostname:
+            raise CommandError('--url must be an http:// URL')
+
+        paths = options['path'] or list(DEFAULT_PATHS)
+        cookie = self._session_cookie(user)
+        results = []
+
+        for clients in options['clients']:
+            result = self._run_level(target, paths, cookie, clients, options['requests'])
+            results.append(result)
+            self.stdout.write(
+                f'{clients:>4} clients  {result["rps"]:>8.1f} req/s  '
+                f'median {result["median_ms"]:>8.2f} ms  p95 {result["p95_ms"]:>8.2f} ms  '
+                f'errors {result["errors"]}'
+            )
+            if result['errors']:
+                self.stdout.write(self.style.WARNING(f'  statuses: {result["statuses"]}'))
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output_file:
+                json.dump({
+                    'environment': environment(),
+                    'label': options['label'],
+                    'url': options['url'],
+                    'paths': paths,
+                    'results': results,
+                }, output_file, indent=2)
+            self.stdout.write(f'Results written to {options["output"]}')
+
+        if options['baseline']:
+            self._compare(results, options['baseline'], options['label'])
+
+    @staticmethod
+    def _session_cookie(user):
+        """Сессия пользователя в БД сервера - как после входа через форму"""
+        engine = import_module(settings.SESSION_ENGINE)
+        session = engine.SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    @staticmethod
+    def _run_level(target, paths, cookie, clients, total_requests):
+        """clients потоков с keep-alive соединениями делят total_requests запросов"""
+        counter = iter(range(total_requests))
+        counter_lock = threading.Lock()
+        timings, statuses = [], {}
+        results_lock = threading.Lock()
+
+        def worker():
+            connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=60)
+            local_timings, local_statuses = [], {}
+            try:
+                while True:
+                    with counter_lock:
+                        number = next(counter, None)
+                    if number is None:
+                        break
+                    path = paths[number % len(paths)]
+                    started = time.perf_counter()
+                    try:
+                        connection.request('GET', path, headers={'Cookie': cookie})
+                        response = connection.getresponse()
+                        response.read()
+                        status = response.status
+                    except (OSError, http.client.HTTPException):
+                        connection.close()
+                        status = 'error'
+                    local_timings.append((time.perf_counter() - started) * 1000)
+                    local_statuses[status] = local_statuses.get(status, 0) + 1
+            finally:
+                connection.close()
+            with results_lock:
+                timings.extend(local_timings)
+                for status, count in local_statuses.items():
+                    statuses[status] = statuses.get(status, 0) + count
+
+        threads = [threading.Thread(target=worker) for _ in range(clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        timings.sort()
+        return {
+            'clients': clients,
+            'requests': len(timings),
+            'errors': sum(count for status, count in statuses.items() if status != 200),
+            'statuses': {str(status): count for status, count in statuses.items()},
+            'seconds': round(elapsed, 3),
+            'rps': round(len(timings) / elapsed, 1) if elapsed else 0,
+            'median_ms': round(statistics.median(timings), 2) if timings else 0,
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2) if timings else 0,
+        }
+
+    def _compare(self, results, baseline_path, label):
+        try:
+            with open(baseline_path, encoding='utf-8') as baseline_file:
+                baseline = json.load(baseline_file)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read baseline {baseline_path}: {e}')
+
+        previous = {entry['clients']: entry for entry in baseline.get('results', [])}
+        self.stdout.write('')
+        self.stdout.write(f'Throughput: {baseline.get("label") or "baseline"} -> {label or "current"}')
+        for entry in results:
+            base = previous.get(entry['clients'])
+            if base is None or not base['rps']:
+                continue
+            ratio = entry['rps'] / base['rps']
+            line = f'{entry["clients"]:>4} clients  {base["rps"]:>8.1f} -> {entry["rps"]:>8.1f} req/s  x{ratio:.2f}'
+            style = self.style.SUCCESS if ratio >= 1 else self.style.WARNING
+            self.stdout.write(style(line))
@@ -0,0 +1,80 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from dds_app.models import Transaction
+from dds_app.pagination import KeysetPaginator
+from dds_app.views import TransactionListView
+
+
+# Типовые комбинации фильтров из TransactionFilterForm
+FILTER_CASES = [
+    ('без фильтров', {}),
+    ('период', {'date_from': date(2025, 1, 1), 'date_to': date(2025, 12, 31)}),
+    ('категория', {'category': ['food', 'transport']}),
+    ('категория + период', {'category': ['food'], 'date_from': date(2025, 1, 1)}),
+    ('подкатегория', {'subcategory': ['vps', 'proxy']}),
+    ('статус', {'status': ['business']}),
+    ('тип', {'type': ['income']}),
+    ('AND: статус + тип + категория', {
+        'filter_mode': 'and', 'status': ['business'], 'type': ['expense'], 'category': ['marketing'],
+    }),
+    ('OR: статус | категория', {
+        'filter_mode': 'or', 'status': ['tax'], 'category': ['salary'],
+        'date_from': date(2025, 1, 1),
+    }),
+]
+
+
+class Command(BaseCommand):
+    help = 'Check via EXPLAIN QUERY PLAN that list queries use indexes without full scans or temp sorts'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN check is only supported on SQLite')
+
+        view = TransactionListView()
+        # Ключ граничной строки для проверки страниц "глубже" первой
+        cursor_key = (date(2025, 6, 1), timezone.now(), 1)
+        failures = []
+
+        for case_title, cleaned_data in FILTER_CASES:
+            queryset = view._apply_filters(
+                Transaction.objects.filter(user_id=0),
+                {'filter_mode': 'and', **cleaned_data},
+            )
+            for title, page_queryset in (
+                (case_title, queryset),
+                (f'{case_title}, по курсору', queryset.filter(KeysetPaginator._before_key(cursor_key))),
+            ):
+                if self._check(title, page_queryset, view.paginate_by, options['verbosity']):
+                    failures.append(title)
+
+        if failures:
+            raise CommandError(f'{len(failures)} query plan(s) use full scans or temp B-tree sorts')
+
+    def _check(self, title, queryset, per_page, verbosity):
+        """Проверить план запроса страницы; True, если найдены проблемы"""
+        plan = queryset.order_by(*KeysetPaginator.ordering)[:per_page + 1].explain()
+
+        problems = self._find_problems(plan)
+        if problems:
+            self.stdout.write(self.style.ERROR(f'FAIL  {title}: {", ".join(problems)}'))
+            self.stdout.write(plan)
+        else:
+            self.stdout.write(self.style.SUCCESS(f'OK    {title}'))
+            if verbosity > 1:
+                self.stdout.write(plan)
+        return bool(problems)
+
+    @staticmethod
+    def _find_problems(plan):
+        problems = []
+        for line in plan.splitlines():
+            if 'SCAN dds_app_transaction' in line and 'USING' not in line:
+                problems.append('full table scan')
+            if 'USE TEMP B-TREE' in line:
+                problems.append('temp B-tree sort')
+        return problems
@@ -0,0 +1,124 @@
+import csv
+import time
+from contextlib import ExitStack
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from dds_app.bulk import TRANSACTION_FIELDS, clean_transaction_data, iter_batches
+from dds_app.models import Transaction
+
+
+REQUIRED_COLUMNS = ('date', 'status', 'type', 'category', 'subcategory', 'amount')
+
+# В выписках встречаются как коды, так и подписи ("Списание", "Еда")
+CHOICE_LOOKUPS = {
+    name: {
+        **{str(label).lower(): value for value, label in choices},
+        **{value: value for value, label in choices},
+    }
+    for name, choices in (
+        ('status', Transaction.Status.choices),
+        ('type', Transaction.Type.choices),
+        ('category', Transaction.Category.choices),
+        ('subcategory', Transaction.Subcategory.choices),
+    )
+}
+
+DATE_FORMATS = ('%d.%m.%Y', '%d/%m/%Y')
+
+
+class Command(BaseCommand):
+    help = 'Import transactions from a CSV bank statement using batched validation and bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path', help='Path to the CSV file')
+        parser.add_argument('--user', required=True, help='Username the transactions belong to')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per validation/insert batch')
+        parser.add_argument('--reject-file', help='Where to write rejected rows (default: <csv_path>.rejects.csv)')
+        parser.add_argument('--delimiter', default=',', help='CSV delimiter')
+        parser.add_argument('--encoding', default='utf-8-sig', help='CSV file encoding')
+        parser.add_argument('--dry-run', action='store_true', help='Validate only, do not write to the database')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist")
+
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive')
+
+        reject_path = options['reject_file'] or f"{options['csv_path']}.rejects.csv"
+        imported = rejected = 0
+        rejects_writer = None
+        started = time.perf_counter()
+
+        try:
+            source = open(options['csv_path'], newline='', encoding=options['encoding'])
+        except OSError as e:
+            raise CommandError(f'Cannot open {options["csv_path"]}: {e}')
+
+        # Файл отказов открывается по первой ошибке и закрывается, даже если импорт прервался
+        with source, ExitStack() as files:
+            reader = csv.DictReader(source, delimiter=options['delimiter'])
+            missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+            if missing:
+                raise CommandError(f'Missing CSV columns: {", ".join(missing)}')
+
+            # Номер строки файла: заголовок - первая строка
+            for batch in iter_batches(enumerate(reader, start=2), options['batch_size']):
+                objects = []
+                for line_number, row in batch:
+                    cleaned, errors = clean_transaction_data(self._normalize_row(row))
+                    if errors:
+                        if rejects_writer is None:
+                            rejects_writer = csv.writer(
+                                files.enter_context(open(reject_path, 'w', newline='', encoding='utf-8'))
+                            )
+                            rejects_writer.writerow(['line', *reader.fieldnames, 'error'])
+                        rejects_writer.writerow([
+                            line_number,
+                            *(row.get(column) for column in reader.fieldnames),
+                            '; '.join(f'{field}: {message}' for field, message in errors.items()),
+                        ])
+                        rejected += 1
+                    else:
+                        objects.append(Transaction(user=user, **cleaned))
+
+                if objects and not options['dry_run']:
+                    # bulk_create выполняется атомарно вместе с обновлением агрегатов
+                    Transaction.objects.bulk_create(objects)
+                imported += len(objects)
+
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'  processed {imported + rejected} rows')
+
+        elapsed = time.perf_counter() - started
+        rate = (imported + rejected) / elapsed if elapsed else 0
+        verb = 'Validated' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {imported} transactions, rejected {rejected} in {elapsed:.2f}s ({rate:,.0f} rows/s)'
+        ))
+        if rejected:
+            self.stdout.write(self.style.WARNING(f'Rejected rows written to {reject_path}'))
+
+    @staticmethod
+    def _normalize_row(row):
+        """Привести значения выписки к формату полей модели"""
+        data = {name: (row.get(name) or '').strip() for name in TRANSACTION_FIELDS}
+
+        for name, lookup in CHOICE_LOOKUPS.items():
+            data[name] = lookup.get(data[name].lower(), data[name])
+
+        for date_format in DATE_FORMATS:
+            try:
+                data['date'] = datetime.strptime(data['date'], date_format).date()
+                break
+            except ValueError:
+                continue
+
+        # "1 234,56" -> "1234.56"
+        data['amount'] = data['amount'].replace('\xa0', '').replace(' ', '').replace(',', '.')
+        return data
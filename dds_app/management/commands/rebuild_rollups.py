@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from dds_app.models import CashFlowRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild cash-flow rollups from raw transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username to rebuild rollups for (default: all users)')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist")
+
+        buckets = CashFlowRollup.objects.rebuild(user=user)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {buckets} cash-flow buckets'))
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dds_app.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the SQLite FTS5 full-text index over transaction comments'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if not rebuild_index():
+            raise CommandError(
+                'Full-text index is not available: it requires SQLite with FTS5 and migration 0004_transaction_search'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt full-text index in {time.perf_counter() - started:.1f}s'
+        ))
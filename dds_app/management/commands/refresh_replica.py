@@ -0,0 +1,53 @@
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from dds_app.routers import REPLICA_ALIAS, replica_configured
+
+
+class Command(BaseCommand):
+    help = 'Copy the main SQLite database into the read replica with the SQLite online backup API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=-1,
+                            help='Pages copied per backup step (default: the whole database in one step)')
+        parser.add_argument('--every', type=float,
+                            help='Keep running and refresh every N seconds (keep below DDS_REPLICA_STICKY_SECONDS)')
+
+    def handle(self, *args, **options):
+        if not replica_configured():
+            raise CommandError(f"DATABASES['{REPLICA_ALIAS}'] is not configured (set DDS_READ_REPLICA=1)")
+        source, target = connections[DEFAULT_DB_ALIAS], connections[REPLICA_ALIAS]
+        if source.vendor != 'sqlite' or target.vendor != 'sqlite':
+            raise CommandError('refresh_replica supports SQLite databases only')
+        if source.is_in_memory_db() or target.is_in_memory_db():
+            raise CommandError('Both databases must be files')
+
+        while True:
+            started = time.perf_counter()
+            self._backup(source, str(target.settings_dict['NAME']), options['pages'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Replica {target.settings_dict["NAME"]} refreshed in {time.perf_counter() - started:.2f}s'
+            ))
+            if not options['every']:
+                break
+            time.sleep(options['every'])
+
+    @staticmethod
+    def _backup(source, target_path, pages):
+        """
+        Онлайн-копия: писатели основной БД не блокируются, реплика получает
+        согласованный снимок. Читатели реплики до конца копирования видят
+        предыдущее состояние.
+        """
+        source.ensure_connection()
+        target = sqlite3.connect(target_path, timeout=30)
+        try:
+            # Постоянные соединения представлений держат реплику в WAL;
+            # копирование в неё выполняется как обычная транзакция записи
+            target.execute('PRAGMA journal_mode = WAL')
+            source.connection.backup(target, pages=pages)
+        finally:
+            target.close()
@@ -1,42 +1,160 @@
-from django.core.management.base import BaseCommand
-from dds_app.models import Transaction  # Import the Transaction model
-from django.contrib.auth.models import User # Import User model
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from dds_app.models import CashFlowRollup, Transaction
+
+
+# Веса категорий и параметры логнормального распределения сумм (mu, sigma):
+# медиана суммы равна exp(mu), например exp(11.3) ~ 80 000 для зарплаты
+CATEGORY_PROFILES = {
+    'income': {
+        'salary': (30, 11.3, 0.3),
+        'freelance': (35, 9.8, 0.8),
+        'investments': (10, 8.5, 1.0),
+        'sales': (25, 9.0, 1.1),
+    },
+    'expense': {
+        'food': (40, 6.7, 0.9),
+        'transport': (22, 6.2, 0.8),
+        'entertainment': (15, 6.9, 0.9),
+        'infrastructure': (13, 7.4, 1.0),
+        'marketing': (10, 8.6, 1.0),
+    },
+}
+TYPE_WEIGHTS = {'income': 18, 'expense': 82}
+STATUS_WEIGHTS = {'business': 45, 'personal': 50, 'tax': 5}
+
+COMMENTS = {
+    'salary': ['Зарплата за месяц', 'Аванс', 'Премия по итогам квартала'],
+    'freelance': ['Оплата по договору', 'Заказ на бирже', 'Доработка сайта'],
+    'investments': ['Дивиденды', 'Купонный доход'],
+    'sales': ['Продажа на Авито', 'Оплата заказа'],
+    'food': ['Продукты в Ашане', 'Пятёрочка', 'Обед', 'Доставка еды', 'Кофе'],
+    'transport': ['Такси', 'Заправка', 'Метро'],
+    'entertainment': ['Кино', 'Подписка', 'Книги'],
+    'infrastructure': ['Продление VPS', 'Домен', 'Прокси на месяц'],
+    'marketing': ['Реклама в Яндекс.Директ', 'Продвижение объявления'],
+}
+
+MAX_AMOUNT = Decimal('9999999999.99')
+
 
 class Command(BaseCommand):
-    help = 'Seeds the database with initial data'
+    help = 'Generate a deterministic synthetic dataset of users and transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1, help='Number of users to generate')
+        parser.add_argument('--per-user', type=int, default=1000, help='Transactions per user')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (same seed - same data)')
+        parser.add_argument('--start-date', type=date.fromisoformat, default=date(2023, 1, 1),
+                            help='First transaction date (YYYY-MM-DD)')
+        parser.add_argument('--days', type=int, default=3 * 365, help='Length of the date range in days')
+        parser.add_argument('--chunk-size', type=int, default=10000, help='Rows per bulk_create transaction')
+        parser.add_argument('--username-prefix', default='seeduser', help='Generated usernames prefix')
+        parser.add_argument('--password', default='defaultpassword', help='Password for generated users')
+        parser.add_argument('--reset', action='store_true',
+                            help='Delete transactions of existing generated users and generate them again '
+                                 '(by default such users are skipped)')
 
     def handle(self, *args, **options):
-        # Create a default user
-        default_user, created = User.objects.get_or_create(
-            username='defaultuser',
-            defaults={'password': 'defaultpassword'}  # Replace with a secure password in production
-        )
-        if created:
-            default_user.set_password('defaultpassword')  # Hash the password
-            default_user.save()
-
-
-        # Create some transactions for the default user
-        Transaction.objects.create(
-            user=default_user,
-            date='2025-08-03',
-            status=Transaction.Status.BUSINESS,
-            type=Transaction.Type.INCOME,
-            category=Transaction.Category.SALARY,
-            subcategory=Transaction.Subcategory.MAIN_SALARY,
-            amount=50000.00,
-            comment='Зарплата за июль'
-        )
+        if options['users'] < 1 or options['per_user'] < 0 or options['days'] < 1:
+            raise CommandError('--users and --days must be positive, --per-user must not be negative')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be positive')
+
+        started = time.perf_counter()
+        users = self._ensure_users(options)
+        total = skipped = 0
+
+        for index, user in enumerate(users):
+            # Повторный запуск не дублирует данные: пользователь с транзакциями
+            # пропускается, с --reset - генерируется заново
+            existing = Transaction.objects.filter(user=user)
+            if existing.exists():
+                if not options['reset']:
+                    skipped += 1
+                    continue
+                existing.delete()
+
+            # Отдельный генератор на пользователя: данные пользователя не
+            # зависят от того, сколько пользователей генерируется вместе с ним
+            rng = random.Random(f"{options['seed']}:{index}")
+            rows = self._generate(rng, user, options)
+            while True:
+                chunk = [next(rows, None) for _ in range(options['chunk_size'])]
+                chunk = [obj for obj in chunk if obj is not None]
+                if not chunk:
+                    break
+                # Вставка в порядке дат даёт локальность по индексам (user, ..., date)
+                chunk.sort(key=lambda obj: obj.date)
+                with transaction.atomic():
+                    Transaction.objects.bulk_create(chunk, update_rollups=False)
+                total += len(chunk)
+                if options['verbosity'] > 1:
+                    self.stdout.write(f'  {total} transactions')
 
-        Transaction.objects.create(
-            user=default_user,
-            date='2025-08-02',
-            status=Transaction.Status.PERSONAL,
-            type=Transaction.Type.EXPENSE,
-            category=Transaction.Category.FOOD,
-            subcategory=Transaction.Subcategory.PRODUCTS,
-            amount=5000.00,
-            comment='Продукты в Ашане'
+            # Агрегаты пользователя пересчитываются одним GROUP BY после загрузки
+            CashFlowRollup.objects.rebuild(user=user)
+
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        if options['verbosity'] > 0:
+            self.stdout.write(self.style.SUCCESS(
+                f'Generated {total} transactions for {len(users) - skipped} users in {elapsed:.1f}s ({rate:,.0f} rows/s)'
+            ))
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f'Skipped {skipped} users that already have transactions (use --reset to regenerate them)'
+            ))
+
+    def _ensure_users(self, options):
+        usernames = [f"{options['username_prefix']}{index + 1}" for index in range(options['users'])]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        # Хэш пароля считается один раз: PBKDF2 на каждого пользователя дорог
+        password = make_password(options['password'])
+        User.objects.bulk_create(
+            [User(username=username, password=password) for username in usernames if username not in existing],
+            batch_size=1000,
         )
+        users = {user.username: user for user in User.objects.filter(username__in=usernames)}
+        return [users[username] for username in usernames]
+
+    @staticmethod
+    def _generate(rng, user, options):
+        """Поток транзакций пользователя; связи категорий соблюдаются по CATEGORY_SUBCATEGORY_MAP"""
+        types = list(TYPE_WEIGHTS)
+        type_weights = list(TYPE_WEIGHTS.values())
+        statuses = list(STATUS_WEIGHTS)
+        status_weights = list(STATUS_WEIGHTS.values())
+        categories = {
+            type_value: (list(profiles), [weight for weight, _, _ in profiles.values()])
+            for type_value, profiles in CATEGORY_PROFILES.items()
+        }
+
+        for _ in range(options['per_user']):
+            type_value = rng.choices(types, type_weights)[0]
+            names, weights = categories[type_value]
+            category = rng.choices(names, weights)[0]
+            _, mu, sigma = CATEGORY_PROFILES[type_value][category]
+            amount = min(
+                Decimal(str(round(rng.lognormvariate(mu, sigma), 2))).quantize(Decimal('0.01')),
+                MAX_AMOUNT,
+            )
 
-        self.stdout.write(self.style.SUCCESS('Successfully seeded the database'))
\ No newline at end of file
+            yield Transaction(
+                user=user,
+                date=options['start_date'] + timedelta(days=rng.randrange(options['days'])),
+                status=rng.choices(statuses, status_weights)[0],
+                type=type_value,
+                category=category,
+                subcategory=rng.choice(Transaction.CATEGORY_SUBCATEGORY_MAP[category]),
+                amount=max(amount, Decimal('0.01')),
+                comment=rng.choice(COMMENTS[category]) if rng.random() < 0.6 else '',
+            )
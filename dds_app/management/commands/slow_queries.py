@@ -0,0 +1,66 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from dds_app.querylog import normalize_sql
+
+
+class Command(BaseCommand):
+    help = 'Summarise the slow SQL log by normalized query shape'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', help='Path to the slow query log (default: DDS_SLOW_QUERY_LOG)')
+        parser.add_argument('--limit', type=int, default=20, help='Number of query shapes to show')
+        parser.add_argument(
+            '--sort', choices=('total', 'count', 'max'), default='total',
+            help='Order shapes by total time, occurrences or worst duration',
+        )
+
+    def handle(self, *args, **options):
+        path = options['log'] or getattr(settings, 'DDS_SLOW_QUERY_LOG', None)
+        if not path:
+            raise CommandError('No slow query log configured; pass --log')
+
+        # Журнал после ротации (<путь>.1) и текущий
+        paths = [log_path for log_path in (f'{path}.1', path) if os.path.exists(log_path)]
+        if not paths:
+            raise CommandError(f'Slow query log {path} does not exist')
+
+        shapes = {}
+        for log_path in paths:
+            with open(log_path, encoding='utf-8') as log_file:
+                for line in log_file:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    shape = entry.get('shape') or normalize_sql(entry['sql'])
+                    summary = shapes.setdefault(shape, {
+                        'count': 0, 'total': 0.0, 'max': 0.0, 'views': set(), 'plan': None,
+                    })
+                    summary['count'] += 1
+                    summary['total'] += entry['duration_ms']
+                    if entry['duration_ms'] >= summary['max']:
+                        summary['max'] = entry['duration_ms']
+                        summary['plan'] = entry.get('plan')
+                    if entry.get('view'):
+                        summary['views'].add(entry['view'])
+
+        ordered = sorted(shapes.items(), key=lambda item: item[1][options['sort']], reverse=True)
+        self.stdout.write(f'{len(shapes)} query shapes, {sum(s["count"] for s in shapes.values())} slow queries')
+
+        for shape, summary in ordered[:options['limit']]:
+            full_scan = any(
+                line.startswith('SCAN') and 'USING' not in line for line in summary['plan'] or []
+            )
+            header = (
+                f'{summary["count"]}x  total {summary["total"]:.1f} ms  '
+                f'avg {summary["total"] / summary["count"]:.1f} ms  max {summary["max"]:.1f} ms'
+            )
+            self.stdout.write('')
+            self.stdout.write(self.style.ERROR(header + '  FULL SCAN') if full_scan else self.style.WARNING(header))
+            self.stdout.write(f'  views: {", ".join(sorted(summary["views"])) or "-"}')
+            self.stdout.write(f'  {shape}')
+            for plan_line in summary['plan'] or []:
+                self.stdout.write(f'    {plan_line}')
@@ -0,0 +1,129 @@
+import statistics
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from dds_app.models import Transaction, UserDataVersion
+from dds_app.pagination import KeysetPaginator
+from dds_app.writer import GroupCommitWriter
+
+
+CHECKED_PRAGMAS = ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'temp_store', 'mmap_size')
+
+
+class Command(BaseCommand):
+    help = (
+        'Run concurrent writers and readers against the database and fail on "database is locked" '
+        'or other database errors'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help='Threads creating transactions')
+        parser.add_argument('--readers', type=int, default=8, help='Threads reading list pages')
+        parser.add_argument('--seconds', type=float, default=10, help='Test duration')
+        parser.add_argument('--group-commit', action='store_true',
+                            help='Writers go through the group-commit writer (dds_app.writer) instead of save()')
+        parser.add_argument('--username', default='contention_test', help='Temporary user for the test data')
+
+    def handle(self, *args, **options):
+        if options['writers'] < 0 or options['readers'] < 0 or options['writers'] + options['readers'] < 1:
+            raise CommandError('At least one writer or reader is required')
+        if User.objects.filter(username=options['username']).exists():
+            raise CommandError(f"User '{options['username']}' already exists; pass another --username")
+
+        self._report_pragmas()
+        user = User.objects.create_user(options['username'])
+        try:
+            results = self._run(user, options)
+        finally:
+            # Транзакции, агрегаты и версия данных удаляются каскадом
+            user.delete()
+
+        failed = False
+        for role in ('write', 'read'):
+            result = results[role]
+            if not result['timings']:
+                continue
+            timings = sorted(result['timings'])
+            self.stdout.write(
+                f'{role:>5}  {len(timings) / options["seconds"]:>8.1f} ops/s  '
+                f'median {statistics.median(timings):>7.2f} ms  '
+                f'p95 {timings[min(len(timings) - 1, int(len(timings) * 0.95))]:>7.2f} ms  '
+                f'max {timings[-1]:>8.2f} ms  errors {sum(result["errors"].values())}'
+            )
+            for message, count in result['errors'].items():
+                failed = True
+                self.stdout.write(self.style.ERROR(f'       {count} x {message}'))
+
+        if failed:
+            raise CommandError('Database errors under concurrent load')
+        self.stdout.write(self.style.SUCCESS('No database errors under concurrent load'))
+
+    def _report_pragmas(self):
+        with connection.cursor() as cursor:
+            values = []
+            for name in CHECKED_PRAGMAS:
+                cursor.execute(f'PRAGMA {name}')
+                values.append(f'{name}={cursor.fetchone()[0]}')
+        self.stdout.write(f'{connection.settings_dict["ENGINE"]}: {", ".join(values)}')
+
+    def _run(self, user, options):
+        results = {role: {'timings': [], 'errors': {}} for role in ('write', 'read')}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + options['seconds']
+        writer = GroupCommitWriter(**(settings.DDS_GROUP_COMMIT or {})) if options['group_commit'] else None
+
+        def write(number):
+            obj = Transaction(
+                user=user, date=date(2025, 1, 1) + timedelta(days=number % 365),
+                status='business', type='expense', category='food', subcategory='products',
+                amount=Decimal('100.00'), comment=f'Нагрузочный тест {number}',
+            )
+            if writer is not None:
+                writer.create(obj)
+            else:
+                obj.save()
+
+        def read(number):
+            list(KeysetPaginator(Transaction.objects.filter(user=user), per_page=20).page(None))
+            UserDataVersion.objects.current(user)
+
+        def worker(role, operation, worker_number):
+            timings, errors = [], {}
+            number = worker_number
+            try:
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        operation(number)
+                    except OperationalError as e:
+                        errors[str(e)] = errors.get(str(e), 0) + 1
+                    timings.append((time.perf_counter() - started) * 1000)
+                    number += 1000
+            finally:
+                # Соединения потоков не переиспользуются после теста
+                connections.close_all()
+            with lock:
+                results[role]['timings'].extend(timings)
+                for message, count in errors.items():
+                    results[role]['errors'][message] = results[role]['errors'].get(message, 0) + count
+
+        threads = [
+            threading.Thread(target=worker, args=('write', write, index)) for index in range(options['writers'])
+        ] + [
+            threading.Thread(target=worker, args=('read', read, index)) for index in range(options['readers'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if writer is not None:
+            writer.stop()
+            self.stdout.write(f'group commit: {writer.stats()}')
+        return results
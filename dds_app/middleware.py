@@ -0,0 +1,196 @@
+import json
+import logging
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .querylog import SlowQueryLog, current_view
+from .routers import amark_write, mark_write
+
+
+logger = logging.getLogger('dds_app.performance')
+
+# Метрики текущего запроса; None вне PerformanceMiddleware
+_current_stats = ContextVar('dds_request_stats', default=None)
+
+
+class RequestStats:
+    """Счётчики одного запроса: SQL и время рендеринга шаблонов"""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_time += time.perf_counter() - started
+
+
+def time_rendering(render, *args):
+    """
+    Выполнить render(*args) с замером времени для метрик текущего запроса.
+
+    Вызывается бэкендом шаблонов dds_app.backends.templates. Вложенные
+    вызовы (шаблон строки списка внутри страницы) не измеряются отдельно -
+    время не считается дважды. Вне запроса ничего не измеряется.
+    """
+    stats = _current_stats.get()
+    if stats is None or stats.rendering:
+        return render(*args)
+    stats.rendering = True
+    started = time.perf_counter()
+    try:
+        return render(*args)
+    finally:
+        stats.template_time += time.perf_counter() - started
+        stats.rendering = False
+
+
+class PerformanceMiddleware:
+    """
+    Метрики производительности каждого запроса.
+
+    Время обработки, число SQL-запросов и их суммарное время, время
+    рендеринга шаблонов (при бэкенде dds_app.backends.templates) отдаются
+    заголовком Server-Timing и пишутся одной структурированной строкой в
+    лог dds_app.performance: обычные запросы с уровнем INFO, дольше
+    DDS_SLOW_REQUEST_MS - с уровнем WARNING.
+    Заодно подключается журнал медленных SQL (dds_app.querylog).
+    Работает и под WSGI, и под ASGI без переключения в синхронный режим.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_request_ms = getattr(settings, 'DDS_SLOW_REQUEST_MS', 500)
+        self.server_timing = getattr(settings, 'DDS_SERVER_TIMING', True)
+        self.slow_query_log = SlowQueryLog() if getattr(settings, 'DDS_SLOW_QUERY_LOG_ENABLED', False) else None
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        view_token = current_view.set(None)
+        started = time.perf_counter()
+        try:
+            with self._wrap_connections(stats):
+                response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+            current_view.reset(view_token)
+        return self._finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        view_token = current_view.set(None)
+        started = time.perf_counter()
+        try:
+            # Async ORM выполняет запросы в отдельном потоке со своими
+            # соединениями, поэтому обёртки ставятся из этого же потока
+            stack = await sync_to_async(self._wrap_connections)(stats)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _current_stats.reset(token)
+            current_view.reset(view_token)
+        return self._finish(request, response, stats, started)
+
+    def _wrap_connections(self, stats):
+        """Подключить счётчики и журнал медленных SQL ко всем соединениям текущего потока"""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats.sql_wrapper))
+            if self.slow_query_log is not None:
+                stack.enter_context(connection.execute_wrapper(self.slow_query_log))
+        return stack
+
+    def _finish(self, request, response, stats, started):
+        total_ms = (time.perf_counter() - started) * 1000
+
+        sql_ms = stats.sql_time * 1000
+        template_ms = stats.template_time * 1000
+
+        if self.server_timing:
+            response['Server-Timing'] = ', '.join((
+                f'total;dur={total_ms:.1f}',
+                f'db;dur={sql_ms:.1f};desc="{stats.sql_count} queries"',
+                f'tpl;dur={template_ms:.1f}',
+            ))
+
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'sql_count': stats.sql_count,
+            'sql_ms': round(sql_ms, 1),
+            'template_ms': round(template_ms, 1),
+        }
+        slow = total_ms >= self.slow_request_ms
+        if slow:
+            record['slow'] = True
+        logger.log(
+            logging.WARNING if slow else logging.INFO,
+            json.dumps(record, ensure_ascii=False),
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Имя представления для журнала медленных запросов
+        match = request.resolver_match
+        current_view.set(match.view_name if match else getattr(view_func, '__name__', None))
+
+
+class ReplicaStickyMiddleware:
+    """
+    Отмечает в сессии запросы, которые могут писать (POST, PUT, PATCH, DELETE).
+
+    После такого запроса чтения пользователя идут в основную БД, пока
+    реплика не догонит её (см. dds_app.routers). Подключается после
+    SessionMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if request.method not in self.SAFE_METHODS:
+            mark_write(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in self.SAFE_METHODS:
+            await amark_write(request)
+        return response
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def build_rollups(apps, schema_editor):
+    """Заполнить агрегаты по уже существующим транзакциям"""
+    Transaction = apps.get_model('dds_app', 'Transaction')
+    CashFlowRollup = apps.get_model('dds_app', 'CashFlowRollup')
+
+    grouped = Transaction.objects.order_by().values(
+        'user_id', 'date', 'type', 'status', 'category', 'subcategory'
+    ).annotate(amount_sum=Sum('amount'), rows=Count('id'))
+
+    CashFlowRollup.objects.bulk_create(
+        [
+            CashFlowRollup(
+                user_id=row['user_id'],
+                day=row['date'],
+                type=row['type'],
+                status=row['status'],
+                category=row['category'],
+                subcategory=row['subcategory'],
+                total=row['amount_sum'],
+                count=row['rows'],
+            )
+            for row in grouped
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds_app', '0002_transaction_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashFlowRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('type', models.CharField(choices=[('income', 'Поступление'), ('expense', 'Списание')], max_length=20, verbose_name='Тип')),
+                ('status', models.CharField(choices=[('business', 'Бизнес'), ('personal', 'Личное'), ('tax', 'Налог')], max_length=20, verbose_name='Статус')),
+                ('category', models.CharField(choices=[('salary', 'Зарплата'), ('freelance', 'Фриланс'), ('investments', 'Инвестиции'), ('sales', 'Продажи'), ('infrastructure', 'Инфраструктура'), ('marketing', 'Маркетинг'), ('food', 'Еда'), ('transport', 'Транспорт'), ('entertainment', 'Развлечения')], max_length=20, verbose_name='Категория')),
+                ('subcategory', models.CharField(choices=[('vps', 'VPS'), ('proxy', 'Proxy'), ('domains', 'Домены'), ('ssl', 'SSL-сертификаты'), ('farpost', 'Farpost'), ('avito', 'Avito'), ('yandex_direct', 'Яндекс.Директ'), ('google_ads', 'Google Ads'), ('products', 'Продукты'), ('restaurants', 'Рестораны'), ('delivery', 'Доставка'), ('fuel', 'Топливо'), ('public_transport', 'Общественный транспорт'), ('taxi', 'Такси'), ('cinema', 'Кино'), ('games', 'Игры'), ('books', 'Книги'), ('subscriptions', 'Подписки'), ('main_salary', 'Основная зарплата'), ('bonus', 'Премия'), ('web_dev', 'Веб-разработка'), ('design', 'Дизайн'), ('dividends', 'Дивиденды'), ('goods_sales', 'Продажа товаров')], max_length=20, verbose_name='Подкатегория')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Сумма')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cashflow_rollups', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Агрегат ДДС',
+                'verbose_name_plural': 'Агрегаты ДДС',
+                'constraints': [models.UniqueConstraint(fields=('user', 'day', 'type', 'status', 'category', 'subcategory'), name='unique_cashflow_bucket')],
+            },
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+from django.db import migrations
+
+
+FTS_TABLE = 'dds_app_transaction_fts'
+
+CREATE_SQL = [
+    # Бесконтентная таблица: хранится только индекс, rowid = id транзакции.
+    # Колонка owner содержит токен владельца ('u<user_id>'), поэтому поиск
+    # по транзакциям одного пользователя - пересечение списков в самом FTS
+    f"""
+    CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        comment,
+        owner,
+        content='',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON dds_app_transaction BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, comment, owner) VALUES (new.id, new.comment, 'u' || new.user_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON dds_app_transaction BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, comment, owner)
+        VALUES ('delete', old.id, old.comment, 'u' || old.user_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF comment, user_id ON dds_app_transaction BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, comment, owner)
+        VALUES ('delete', old.id, old.comment, 'u' || old.user_id);
+        INSERT INTO {FTS_TABLE}(rowid, comment, owner) VALUES (new.id, new.comment, 'u' || new.user_id);
+    END
+    """,
+    # Индексация уже существующих транзакций
+    f"INSERT INTO {FTS_TABLE}(rowid, comment, owner) SELECT id, comment, 'u' || user_id FROM dds_app_transaction",
+]
+
+DROP_SQL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def _fts5_supported(connection):
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        return 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+
+
+def create_search_index(apps, schema_editor):
+    """FTS5-индекс комментариев; на других СУБД и без FTS5 поиск работает через icontains"""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite' or not _fts5_supported(connection):
+        return
+    for statement in CREATE_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds_app', '0003_cashflow_rollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
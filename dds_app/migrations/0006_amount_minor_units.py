@@ -0,0 +1,108 @@
+import dds_app.money
+from django.db import migrations, models
+from django.db.models import BigIntegerField, DecimalField, ExpressionWrapper, F, Value
+from django.db.models.functions import Cast, Round
+
+
+FTS_TABLE = 'dds_app_transaction_fts'
+
+# Триггеры FTS-индекса из 0004_transaction_search: пересоздание таблицы
+# транзакций на SQLite (AddField NOT NULL) удаляет их вместе со старой таблицей
+TRIGGERS_SQL = [
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON dds_app_transaction BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, comment, owner) VALUES (new.id, new.comment, 'u' || new.user_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON dds_app_transaction BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, comment, owner)
+        VALUES ('delete', old.id, old.comment, 'u' || old.user_id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF comment, user_id ON dds_app_transaction BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, comment, owner)
+        VALUES ('delete', old.id, old.comment, 'u' || old.user_id);
+        INSERT INTO {FTS_TABLE}(rowid, comment, owner) VALUES (new.id, new.comment, 'u' || new.user_id);
+    END
+    """,
+]
+
+
+def restore_search_triggers(apps, schema_editor):
+    """Триггеры FTS-индекса, если сам индекс есть (строки таблицы и их id не менялись)"""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        if cursor.fetchone() is None:
+            return
+    for suffix in ('ai', 'ad', 'au'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+    for statement in TRIGGERS_SQL:
+        schema_editor.execute(statement)
+
+
+def to_minor_units(apps, schema_editor):
+    """Рубли (Decimal) -> копейки: одним UPDATE на таблицу"""
+    using = schema_editor.connection.alias
+    apps.get_model('dds_app', 'Transaction').objects.using(using).update(
+        amount=Cast(Round(F('amount_decimal') * 100), BigIntegerField())
+    )
+    apps.get_model('dds_app', 'CashFlowRollup').objects.using(using).update(
+        total=Cast(Round(F('total_decimal') * 100), BigIntegerField())
+    )
+
+
+def from_minor_units(apps, schema_editor):
+    using = schema_editor.connection.alias
+    # Деление на 100.0, а не 100: на SQLite деление целых отбрасывает копейки
+    apps.get_model('dds_app', 'Transaction').objects.using(using).update(
+        amount_decimal=ExpressionWrapper(F('amount') / Value(100.0), output_field=DecimalField())
+    )
+    apps.get_model('dds_app', 'CashFlowRollup').objects.using(using).update(
+        total_decimal=ExpressionWrapper(F('total') / Value(100.0), output_field=DecimalField())
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dds_app', '0005_user_data_version'),
+    ]
+
+    operations = [
+        # Старые колонки переименовываются, новые добавляются рядом: перевод
+        # на месте (AlterField) на SQLite скопировал бы рубли как есть,
+        # а на других СУБД отбросил бы копейки при приведении к BIGINT
+        migrations.RenameField('transaction', 'amount', 'amount_decimal'),
+        migrations.AddField(
+            model_name='transaction',
+            name='amount',
+            field=dds_app.money.MoneyField(default=0, max_digits=12, verbose_name='Сумма'),
+            preserve_default=False,
+        ),
+        migrations.RenameField('cashflowrollup', 'total', 'total_decimal'),
+        migrations.AddField(
+            model_name='cashflowrollup',
+            name='total',
+            field=models.BigIntegerField(default=0, verbose_name='Сумма, коп.'),
+        ),
+        migrations.RunPython(to_minor_units, from_minor_units),
+        # Значение по умолчанию только в состоянии миграций (Django не хранит его
+        # в схеме): при откате старая NOT NULL колонка добавляется в непустую таблицу
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='transaction',
+                name='amount_decimal',
+                field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Сумма'),
+            ),
+        ]),
+        # Вперёд - после пересоздания таблицы в AddField, при откате - после
+        # пересоздания при возврате amount_decimal
+        migrations.RunPython(restore_search_triggers, restore_search_triggers),
+        migrations.RemoveField('transaction', 'amount_decimal'),
+        migrations.RemoveField('cashflowrollup', 'total_decimal'),
+    ]
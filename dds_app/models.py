@@ -1,6 +1,175 @@
-from django.db import models
+from django.db import connections, models, transaction as db_transaction
+from django.db.models import Count, F, Sum
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .money import MoneyField, MoneyQuerySet, from_minor, minor_units, to_minor
+from .search import comment_search_q
+
+
+# Транзакции пользователей user_ids изменились; отправляется в транзакции записи
+# после увеличения версии их данных. changed_ids - pk созданных, изменённых и
+# удалённых строк или None, если они неизвестны (см. UserDataVersionManager.bump)
+transactions_changed = Signal()
+
+class TransactionQuerySet(MoneyQuerySet):
+    """QuerySet транзакций, поддерживающий агрегаты при массовых операциях"""
+
+    def search(self, text, user=None):
+        """
+        Транзакции, в комментарии которых есть все слова text (по префиксу).
+
+        user - владелец транзакций: отбор по нему выполняется прямо в FTS-индексе.
+        """
+        condition = comment_search_q(text, self.db, user_id=user.pk if user is not None else None)
+        return self if condition is None else self.filter(condition)
+
+    def bulk_create(self, objs, *args, update_rollups=True, **kwargs):
+        """
+        bulk_create с обновлением агрегатов ДДС в той же транзакции.
+
+        update_rollups=False - для массовой загрузки, после которой
+        агрегаты пересчитываются целиком через CashFlowRollup.objects.rebuild().
+        """
+        objs = list(objs)
+        with db_transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            if update_rollups:
+                deltas = {}
+                for obj in created:
+                    CashFlowRollup.add_delta(deltas, obj, to_minor(obj.amount), 1)
+                CashFlowRollup.objects.apply_deltas(deltas)
+            UserDataVersion.objects.bump({obj.user_id for obj in created}, [obj.pk for obj in created])
+        return created
+
+    def bulk_update(self, objs, fields, batch_size=None):
+        """
+        bulk_update с обновлением агрегатов ДДС и updated_at.
+
+        Выполняется одним UPDATE ... WHERE id = %s через executemany:
+        штатный bulk_update строит CASE WHEN на каждую строку и поле, и на
+        тысячах строк это квадратичная работа. Фильтры queryset не
+        применяются - строки выбираются по pk объектов.
+        Старые значения вычитаются из корзин одним GROUP BY по БД,
+        новые прибавляются по объектам.
+        """
+        objs = list(objs)
+        if not objs:
+            return 0
+        fields = [self.model._meta.get_field(name) for name in fields]
+        # auto_now не срабатывает без save(), время изменения проставляется вручную
+        updated_at = self.model._meta.get_field('updated_at')
+        if updated_at not in fields:
+            now = timezone.now()
+            for obj in objs:
+                obj.updated_at = now
+            fields.append(updated_at)
+
+        connection = connections[self.db]
+        quote = connection.ops.quote_name
+        sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+            quote(self.model._meta.db_table),
+            ', '.join(f'{quote(field.column)} = %s' for field in fields),
+            quote(self.model._meta.pk.column),
+        )
+        params = [
+            [field.get_db_prep_save(getattr(obj, field.attname), connection) for field in fields] + [obj.pk]
+            for obj in objs
+        ]
+
+        with db_transaction.atomic(using=self.db):
+            deltas = CashFlowRollup.objects.deltas_for(
+                self.model.objects.using(self.db).filter(pk__in=[obj.pk for obj in objs]), sign=-1
+            )
+            user_ids = {key[0] for key in deltas}
+            rows = 0
+            with connection.cursor() as cursor:
+                for start in range(0, len(params), batch_size or len(params)):
+                    cursor.executemany(sql, params[start:start + (batch_size or len(params))])
+                    rows += cursor.rowcount
+            for obj in objs:
+                CashFlowRollup.add_delta(deltas, obj, to_minor(obj.amount), 1)
+            CashFlowRollup.objects.apply_deltas(deltas)
+            UserDataVersion.objects.bump(user_ids | {obj.user_id for obj in objs}, [obj.pk for obj in objs])
+        return rows
+
+    bulk_update.alters_data = True
+
+    def delete(self):
+        with db_transaction.atomic(using=self.db):
+            deltas = CashFlowRollup.objects.deltas_for(self, sign=-1)
+            CashFlowRollup.objects.apply_deltas(deltas)
+            result = super().delete()
+            # Ключ корзины начинается с user_id - отдельный запрос за владельцами не нужен
+            UserDataVersion.objects.bump({key[0] for key in deltas})
+            return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    # Поля, от которых зависят корзины агрегатов ДДС
+    ROLLUP_FIELDS = frozenset(('user', 'user_id', 'date', 'type', 'status', 'category', 'subcategory', 'amount'))
+
+    def update(self, **kwargs):
+        """
+        update с обновлением агрегатов ДДС, если меняются поля корзины или сумма.
+
+        Вклад строк в старые корзины снимается по одному GROUP BY до
+        обновления. Для постоянных значений новые корзины получаются заменой
+        изменённых полей в тех же группах, без повторного чтения строк;
+        для выражений (F() и т.п.) строки перечитываются по pk.
+        Время изменения проставляется вручную, как в bulk_update: по
+        updated_at обновляется кэш строк списка (dds_app.rows).
+        """
+        kwargs.setdefault('updated_at', timezone.now())
+        with db_transaction.atomic(using=self.db):
+            if not self.ROLLUP_FIELDS & kwargs.keys():
+                user_ids = set(self.order_by().values_list('user_id', flat=True).distinct())
+                rows = super().update(**kwargs)
+                # Поля корзин не менялись - для подписчиков строки те же
+                UserDataVersion.objects.bump(user_ids, changed_ids=())
+                return rows
+
+            deltas = CashFlowRollup.objects.deltas_for(self, sign=-1)
+            pks = None
+            changes = {
+                name: value for name, value in kwargs.items() if name in self.ROLLUP_FIELDS
+            }
+            if any(hasattr(value, 'resolve_expression') for value in changes.values()):
+                pks = list(self.values_list('pk', flat=True))
+                rows = super().update(**kwargs)
+                for key, delta in CashFlowRollup.objects.deltas_for(
+                    self.model.objects.using(self.db).filter(pk__in=pks)
+                ).items():
+                    CashFlowRollup.add_delta(deltas, dict(zip(CashFlowRollup.SOURCE_FIELDS, key)), *delta)
+            else:
+                rows = super().update(**kwargs)
+                changes = self._normalize_changes(changes)
+                for key, (amount, count) in list(deltas.items()):
+                    source = {**dict(zip(CashFlowRollup.SOURCE_FIELDS, key)), **changes}
+                    new_amount = to_minor(changes['amount']) * -count if 'amount' in changes else -amount
+                    CashFlowRollup.add_delta(deltas, source, new_amount, -count)
+
+            CashFlowRollup.objects.apply_deltas(deltas)
+            # Ключ корзины начинается с user_id: старые и новые владельцы
+            UserDataVersion.objects.bump({key[0] for key in deltas}, pks)
+            return rows
+
+    def _normalize_changes(self, changes):
+        """Новые значения полей корзины в том виде, в каком их вернёт БД"""
+        normalized = {}
+        for name, value in changes.items():
+            field = self.model._meta.get_field(name)
+            if field.is_relation:
+                normalized[field.attname] = getattr(value, 'pk', value)
+            else:
+                normalized[name] = field.to_python(value)
+        return normalized
+
+    update.alters_data = True
+
 
 class Transaction(models.Model):
     """Основная модель транзакций"""
@@ -92,9 +261,9 @@ class Transaction(models.Model):
         choices=Subcategory.choices,
         verbose_name="Подкатегория"
     )
-    amount = models.DecimalField(
+    # Хранится в копейках, в Python - Decimal (см. dds_app.money)
+    amount = MoneyField(
         max_digits=12,
-        decimal_places=2,
         verbose_name="Сумма"
     )
     comment = models.TextField(
@@ -105,10 +274,23 @@ class Transaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TransactionQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Транзакция"
         verbose_name_plural = "Транзакции"
         ordering = ['-date', '-created_at']
+        indexes = [
+            # Список транзакций: user=... ORDER BY -date, -created_at, -id.
+            # Колонки по возрастанию: SQLite читает индекс в обратном порядке,
+            # а неявно добавленный rowid (id) закрывает последний ключ сортировки.
+            models.Index(fields=['user', 'date', 'created_at'], name='txn_user_date_idx'),
+            # Фильтры по справочникам с диапазоном дат
+            models.Index(fields=['user', 'category', 'date'], name='txn_user_category_date_idx'),
+            models.Index(fields=['user', 'subcategory', 'date'], name='txn_user_subcat_date_idx'),
+            models.Index(fields=['user', 'status', 'date'], name='txn_user_status_date_idx'),
+            models.Index(fields=['user', 'type', 'date'], name='txn_user_type_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.date} - {self.amount}₽ - {self.user.username}"
@@ -138,21 +320,35 @@ class Transaction(models.Model):
         """Валидация логических связей на уровне модели"""
         # Эта валидация должна быть, она важна для целостности данных.
         # Она вызывается через self.full_clean()
-        if self.type and self.category:
-            allowed_categories = self.TYPE_CATEGORY_MAP.get(self.type)
-            if allowed_categories is not None and self.category not in allowed_categories:
-                raise ValidationError(
-                    {'category': f'Категория "{self.get_category_display()}" не относится к типу "{self.get_type_display()}"'}
-                )
-
-        if self.category and self.subcategory:
-            allowed_subcategories = self.CATEGORY_SUBCATEGORY_MAP.get(self.category)
+        errors = self.relation_errors(self.type, self.category, self.subcategory)
+        if errors:
+            raise ValidationError(errors)
+
+    @classmethod
+    def relation_errors(cls, type_value, category, subcategory):
+        """
+        Проверка связей тип -> категория -> подкатегория.
+
+        Возвращает словарь {поле: сообщение}; используется и в clean(),
+        и при пакетной валидации без создания экземпляров модели.
+        """
+        if type_value and category:
+            allowed_categories = cls.TYPE_CATEGORY_MAP.get(type_value)
+            if allowed_categories is not None and category not in allowed_categories:
+                category_display = dict(cls.Category.choices).get(category, category)
+                type_display = dict(cls.Type.choices).get(type_value, type_value)
+                return {'category': f'Категория "{category_display}" не относится к типу "{type_display}"'}
+
+        if category and subcategory:
+            allowed_subcategories = cls.CATEGORY_SUBCATEGORY_MAP.get(category)
             # Проверяем, что subcategory вообще существует, если она не пустая.
             # Если поле subcategory_id пустое (None или пустая строка), то это нормально.
-            if self.subcategory and (allowed_subcategories is None or self.subcategory not in allowed_subcategories):
-                raise ValidationError(
-                    {'subcategory': f'Подкатегория "{self.get_subcategory_display()}" не относится к категории "{self.get_category_display()}"'}
-                )
+            if allowed_subcategories is None or subcategory not in allowed_subcategories:
+                subcategory_display = dict(cls.Subcategory.choices).get(subcategory, subcategory)
+                category_display = dict(cls.Category.choices).get(category, category)
+                return {'subcategory': f'Подкатегория "{subcategory_display}" не относится к категории "{category_display}"'}
+
+        return {}
 
     def save(self, *args, **kwargs):
         # Вызываем валидацию перед сохранением.
@@ -165,4 +361,239 @@ class Transaction(models.Model):
                 for msg in messages_list:
                     error_details.append(f"{field}: {msg}")
             raise ValueError(f"Ошибка валидации данных транзакции: {'; '.join(error_details)}")
-        super().save(*args, **kwargs)
\ No newline at end of file
+
+        # Агрегаты ДДС обновляются в той же транзакции БД, что и сама запись.
+        # При редактировании строка может переехать в другую корзину,
+        # поэтому старое состояние вычитается, а новое прибавляется.
+        with db_transaction.atomic():
+            deltas = {}
+            if self.pk is not None:
+                previous = Transaction.objects.filter(pk=self.pk).values(
+                    *CashFlowRollup.SOURCE_FIELDS, 'amount'
+                ).first()
+                if previous is not None:
+                    CashFlowRollup.add_delta(deltas, previous, -to_minor(previous['amount']), -1)
+            super().save(*args, **kwargs)
+            CashFlowRollup.add_delta(deltas, self, to_minor(self.amount), 1)
+            CashFlowRollup.objects.apply_deltas(deltas)
+            UserDataVersion.objects.bump({key[0] for key in deltas}, [self.pk])
+
+    def delete(self, *args, **kwargs):
+        with db_transaction.atomic():
+            deltas = {}
+            pk = self.pk
+            CashFlowRollup.add_delta(deltas, self, -to_minor(self.amount), -1)
+            result = super().delete(*args, **kwargs)
+            CashFlowRollup.objects.apply_deltas(deltas)
+            UserDataVersion.objects.bump([self.user_id], [pk])
+        return result
+
+
+class CashFlowRollupManager(models.Manager):
+    """Поддержка агрегатов ДДС в актуальном состоянии"""
+
+    def deltas_for(self, queryset, sign=1):
+        """Приращения корзин для набора транзакций (один GROUP BY запрос)"""
+        deltas = {}
+        grouped = queryset.order_by().values(*CashFlowRollup.SOURCE_FIELDS).annotate(
+            amount_sum=Sum(minor_units('amount')), rows=Count('id')
+        )
+        for row in grouped:
+            CashFlowRollup.add_delta(deltas, row, sign * row['amount_sum'], sign * row['rows'])
+        return deltas
+
+    # Начиная с этого числа корзин приращения применяются пакетно
+    BULK_THRESHOLD = 16
+
+    def apply_deltas(self, deltas):
+        """Применить приращения {ключ корзины: (сумма в копейках, количество)}"""
+        deltas = {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+        if len(deltas) >= self.BULK_THRESHOLD:
+            return self._apply_deltas_bulk(deltas)
+
+        for key, (amount, count) in deltas.items():
+            lookup = dict(zip(CashFlowRollup.BUCKET_FIELDS, key))
+            updated = self.filter(**lookup).update(
+                total=F('total') + amount, count=F('count') + count
+            )
+            if not updated:
+                self.create(total=amount, count=count, **lookup)
+            elif count < 0:
+                self.filter(count__lte=0, **lookup).delete()
+
+    def _apply_deltas_bulk(self, deltas):
+        """
+        Пакетное применение: одна выборка затронутых корзин, затем
+        delete + bulk_create вместо пары запросов на корзину.
+        Изменённые корзины пересоздаются: bulk_update строит CASE WHEN
+        на каждую строку, и на тысячах корзин это квадратичная работа.
+        Вызывается внутри транзакции, которая уже держит блокировку записи.
+        """
+        user_ids = {key[0] for key in deltas}
+        days = [key[1] for key in deltas]
+        existing = {
+            tuple(row[1:-2]): (row[0], row[-2], row[-1])
+            for row in self.select_for_update().filter(
+                user_id__in=user_ids, day__gte=min(days), day__lte=max(days)
+            ).values_list('pk', *CashFlowRollup.BUCKET_FIELDS, 'total', 'count')
+        }
+
+        to_create, to_delete = [], []
+        for key, (amount, count) in deltas.items():
+            current = existing.get(key)
+            if current is not None:
+                pk, total, rows = current
+                to_delete.append(pk)
+                amount += total
+                count += rows
+            if count > 0:
+                to_create.append(CashFlowRollup(
+                    total=amount, count=count, **dict(zip(CashFlowRollup.BUCKET_FIELDS, key))
+                ))
+
+        for start in range(0, len(to_delete), 500):
+            self.filter(pk__in=to_delete[start:start + 500])._raw_delete(self.db)
+        self.bulk_create(to_create, batch_size=1000)
+
+    def rebuild(self, user=None):
+        """
+        Пересчитать агрегаты с нуля по сырым транзакциям.
+
+        Группировка и вставка выполняются одним INSERT ... SELECT ... GROUP BY
+        на стороне БД, без выгрузки корзин в Python.
+        """
+        transactions = Transaction.objects.all()
+        rollups = self.all()
+        if user is not None:
+            transactions = transactions.filter(user=user)
+            rollups = rollups.filter(user=user)
+
+        grouped = transactions.order_by().values(*CashFlowRollup.SOURCE_FIELDS).annotate(
+            amount_sum=Sum(minor_units('amount')), rows=Count('id')
+        )
+        select_sql, params = grouped.query.sql_with_params()
+        columns = ', '.join(
+            CashFlowRollup._meta.get_field(name).column
+            for name in (*CashFlowRollup.BUCKET_FIELDS, 'total', 'count')
+        )
+
+        connection = connections[self.db]
+        with db_transaction.atomic(using=self.db), connection.cursor() as cursor:
+            rollups._raw_delete(self.db)
+            cursor.execute(
+                f'INSERT INTO {connection.ops.quote_name(CashFlowRollup._meta.db_table)} ({columns}) {select_sql}',
+                params,
+            )
+            return cursor.rowcount
+
+
+class CashFlowRollup(models.Model):
+    """Дневные агрегаты ДДС: сумма и количество транзакций в корзине"""
+
+    # Поля корзины и соответствующие им поля транзакции
+    BUCKET_FIELDS = ('user_id', 'day', 'type', 'status', 'category', 'subcategory')
+    SOURCE_FIELDS = ('user_id', 'date', 'type', 'status', 'category', 'subcategory')
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cashflow_rollups',
+        verbose_name="Пользователь"
+    )
+    day = models.DateField(verbose_name="День")
+    type = models.CharField(max_length=20, choices=Transaction.Type.choices, verbose_name="Тип")
+    status = models.CharField(max_length=20, choices=Transaction.Status.choices, verbose_name="Статус")
+    category = models.CharField(max_length=20, choices=Transaction.Category.choices, verbose_name="Категория")
+    subcategory = models.CharField(
+        max_length=20,
+        choices=Transaction.Subcategory.choices,
+        verbose_name="Подкатегория"
+    )
+    # Сумма в копейках: агрегаты складываются как целые (см. dds_app.money)
+    total = models.BigIntegerField(default=0, verbose_name="Сумма, коп.")
+    count = models.IntegerField(default=0, verbose_name="Количество")
+
+    objects = CashFlowRollupManager()
+
+    class Meta:
+        verbose_name = "Агрегат ДДС"
+        verbose_name_plural = "Агрегаты ДДС"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'day', 'type', 'status', 'category', 'subcategory'],
+                name='unique_cashflow_bucket',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.type}/{self.category}: {from_minor(self.total)}₽ ({self.count})"
+
+    @classmethod
+    def add_delta(cls, deltas, source, amount, count):
+        """Добавить приращение для транзакции (объекта или словаря values()); amount - в копейках"""
+        if isinstance(source, dict):
+            key = tuple(source[field] for field in cls.SOURCE_FIELDS)
+        else:
+            key = tuple(getattr(source, field) for field in cls.SOURCE_FIELDS)
+        total, rows = deltas.get(key, (0, 0))
+        deltas[key] = (total + amount, rows + count)
+
+
+class UserDataVersionManager(models.Manager):
+
+    def bump(self, user_ids, changed_ids=None):
+        """
+        Увеличить версию данных пользователей и отправить transactions_changed.
+
+        Вызывается в транзакции записи: при откате версия откатывается
+        вместе с данными. changed_ids - pk затронутых транзакций, если
+        вызывающий их знает.
+        """
+        user_ids = set(user_ids)
+        if not user_ids:
+            return
+        now = timezone.now()
+        updated = self.filter(user_id__in=user_ids).update(version=F('version') + 1, changed_at=now)
+        if updated < len(user_ids):
+            existing = set(self.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+            self.bulk_create(
+                [self.model(user_id=user_id, version=1, changed_at=now) for user_id in user_ids - existing],
+                ignore_conflicts=True,
+            )
+        transactions_changed.send(sender=Transaction, using=self.db, user_ids=user_ids, changed_ids=changed_ids)
+
+    def current(self, user):
+        """(версия, время последнего изменения) данных пользователя; (0, None) до первой записи"""
+        return self.filter(user=user).values_list('version', 'changed_at').first() or (0, None)
+
+    async def acurrent(self, user):
+        return await self.filter(user=user).values_list('version', 'changed_at').afirst() or (0, None)
+
+
+class UserDataVersion(models.Model):
+    """
+    Версия данных пользователя.
+
+    Растёт при любом создании, изменении и удалении его транзакций;
+    входит в ключи кэша, поэтому после записи старые записи кэша
+    больше не запрашиваются.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='data_version',
+        verbose_name="Пользователь"
+    )
+    version = models.BigIntegerField(default=0, verbose_name="Версия")
+    changed_at = models.DateTimeField(default=timezone.now, verbose_name="Изменено")
+
+    objects = UserDataVersionManager()
+
+    class Meta:
+        verbose_name = "Версия данных пользователя"
+        verbose_name_plural = "Версии данных пользователей"
+
+    def __str__(self):
+        return f"{self.user_id}: v{self.version}"
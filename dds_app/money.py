@@ -0,0 +1,248 @@
+"""
+Денежные суммы в целых копейках.
+
+В БД суммы хранятся как BIGINT: SQLite складывает и сравнивает их как
+целые, без REAL и преобразования каждой строки в Decimal. Снаружи
+(модель, формы, API, шаблоны) сумма остаётся Decimal с двумя знаками.
+Внутренние пути - агрегаты ДДС, отчёты, выгрузка, колоночные снимки -
+читают копейки напрямую через minor_units() и переводят в Decimal только
+итоговые значения. Арифметика в выражениях ORM (F('amount') + 1,
+Avg('amount')) переводится в копейки в MoneyQuerySet.
+"""
+
+import functools
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+
+from django import forms
+from django.core import validators
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.db.models import Avg, ExpressionWrapper, F, Func, Max, Min, Q, Sum, Value
+from django.db.models.expressions import Combinable, CombinedExpression
+from django.db.models.functions import Round
+from django.utils.translation import gettext_lazy as _
+
+
+MINOR_UNITS = 100
+
+
+def to_minor(value):
+    """Decimal (рубли) -> int (копейки); дробные копейки округляются"""
+    return int((Decimal(value) * MINOR_UNITS).to_integral_value(ROUND_HALF_UP))
+
+
+def from_minor(value):
+    """int (копейки) -> Decimal (рубли) с двумя знаками"""
+    return Decimal(value).scaleb(-2)
+
+
+def format_minor(value):
+    """Копейки строкой в рублях ('1250.05'), как str() от Decimal с двумя знаками"""
+    sign = '-' if value < 0 else ''
+    rubles, cents = divmod(abs(value), MINOR_UNITS)
+    return f'{sign}{rubles}.{cents:02d}'
+
+
+def minor_units(expression):
+    """Значение MoneyField (имя поля или выражение) в копейках, без перевода в Decimal"""
+    if isinstance(expression, str):
+        expression = F(expression)
+    return ExpressionWrapper(expression, output_field=models.BigIntegerField())
+
+
+class MoneyField(models.BigIntegerField):
+    """
+    Сумма в рублях (Decimal), хранимая в копейках (BIGINT).
+
+    Значения из БД и агрегаты по полю (Sum('amount')) возвращаются как
+    Decimal; при записи и в фильтрах Decimal переводится в копейки.
+    max_digits ограничивает число цифр суммы в рублях, как у DecimalField.
+    Выражения с полем (F() с числами, Avg()) верны в QuerySet модели,
+    унаследованном от MoneyQuerySet.
+    """
+
+    description = _('Money amount stored in minor units')
+    default_error_messages = {
+        'invalid': _('“%(value)s” value must be a decimal number.'),
+    }
+
+    decimal_places = 2
+
+    def __init__(self, *args, max_digits=None, **kwargs):
+        self.max_digits = max_digits
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.max_digits is not None:
+            kwargs['max_digits'] = self.max_digits
+        return name, path, args, kwargs
+
+    @property
+    def validators(self):
+        # Диапазон BIGINT в копейках заведомо шире max_digits
+        return [*self.default_validators, *self._validators, validators.DecimalValidator(
+            self.max_digits, self.decimal_places,
+        )]
+
+    def to_python(self, value):
+        if value is None or isinstance(value, Decimal):
+            return value
+        if isinstance(value, bool):
+            # Decimal(True) == 1: логическое значение - не сумма
+            raise ValidationError(self.error_messages['invalid'], code='invalid', params={'value': value})
+        if isinstance(value, float):
+            return Decimal(str(value))
+        try:
+            return Decimal(value)
+        except (InvalidOperation, TypeError, ValueError):
+            raise ValidationError(self.error_messages['invalid'], code='invalid', params={'value': value})
+
+    def get_prep_value(self, value):
+        value = models.Field.get_prep_value(self, value)
+        if value is None or hasattr(value, 'resolve_expression'):
+            return value
+        return to_minor(self.to_python(value))
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else from_minor(value)
+
+    def value_to_string(self, obj):
+        value = self.value_from_object(obj)
+        return '' if value is None else str(value)
+
+    def formfield(self, **kwargs):
+        return models.Field.formfield(self, **{
+            'form_class': forms.DecimalField,
+            'max_digits': self.max_digits,
+            'decimal_places': self.decimal_places,
+            **kwargs,
+        })
+
+
+def money_expression(expression, fields):
+    """
+    Выражение ORM с арифметикой над полями MoneyField (имена fields) в копейках.
+
+    Числа в сложении и вычитании (F('amount') + Decimal('1.00'),
+    F('amount') - 1) переводятся в копейки, произведение и частное с
+    числом округляются до копейки. Результат арифметики и Sum, Min, Max
+    над полем получают тип MoneyField, Avg() делится на 100 в SQL -
+    все они возвращаются как Decimal в рублях.
+    """
+    return _money(expression, fields)[0]
+
+
+def _money(expression, fields):
+    """(выражение, в копейках ли его значение)"""
+    if isinstance(expression, F):
+        return expression, expression.name in fields
+    if isinstance(expression, Value):
+        return expression, isinstance(expression._output_field_or_none, MoneyField)
+    if not hasattr(expression, 'get_source_expressions'):
+        return expression, False
+    sources = [
+        (None, False) if source is None else _money(source, fields)
+        for source in expression.get_source_expressions()
+    ]
+    if not any(is_money for _, is_money in sources):
+        return expression, False
+    expression = expression.copy()
+    expression.set_source_expressions([source for source, _ in sources])
+    if isinstance(expression, CombinedExpression):
+        return _combine(expression, *sources)
+    if isinstance(expression, Avg):
+        # Avg() от целого поля вернул бы float в копейках
+        return _Rubles(expression), False
+    if isinstance(expression, (Sum, Min, Max)):
+        expression.output_field = MoneyField()
+        return expression, True
+    return expression, False
+
+
+def _combine(expression, lhs, rhs):
+    (lhs, lhs_money), (rhs, rhs_money) = lhs, rhs
+    connector = expression.connector
+    additive = connector in (Combinable.ADD, Combinable.SUB)
+    if lhs_money and rhs_money:
+        if not additive:
+            return expression, False
+        expression.output_field = MoneyField()
+        return expression, True
+
+    number = rhs if lhs_money else lhs
+    if not isinstance(number, Value) or number.value is None:
+        # Сумма и другое поле или выражение: единицы неизвестны
+        return expression, False
+    if additive:
+        number = Value(number.value, output_field=MoneyField())
+    elif connector == Combinable.DIV and lhs_money:
+        # На SQLite деление целых отбрасывает остаток
+        number = Value(float(number.value))
+    elif connector != Combinable.MUL:
+        return expression, False
+    expression.set_source_expressions([lhs, number] if lhs_money else [number, rhs])
+    if additive:
+        expression.output_field = MoneyField()
+        return expression, True
+    return Round(expression, output_field=MoneyField()), True
+
+
+class _Rubles(Func):
+    """Дробное значение в копейках (среднее) - Decimal в рублях, как у DecimalField"""
+
+    template = f'(%(expressions)s / {MINOR_UNITS}.0)'
+
+    def __init__(self, expression):
+        super().__init__(expression, output_field=models.DecimalField())
+
+    @property
+    def default_alias(self):
+        # aggregate(Avg('amount')) без имени - ключ amount__avg
+        return self.source_expressions[0].default_alias
+
+
+@functools.cache
+def _money_fields(model):
+    return frozenset(field.name for field in model._meta.concrete_fields if isinstance(field, MoneyField))
+
+
+class MoneyQuerySet(models.QuerySet):
+    """
+    QuerySet модели с полями MoneyField: выражения в update(), annotate(),
+    alias(), aggregate(), filter() и exclude() проходят через
+    money_expression и считаются в копейках.
+    """
+
+    def _money(self, value):
+        if isinstance(value, Q):
+            return value.create([
+                (child[0], self._money(child[1])) if isinstance(child, tuple) else self._money(child)
+                for child in value.children
+            ], value.connector, value.negated)
+        if not hasattr(value, 'resolve_expression'):
+            return value
+        return money_expression(value, _money_fields(self.model))
+
+    def _money_kwargs(self, kwargs):
+        return {name: self._money(value) for name, value in kwargs.items()}
+
+    def annotate(self, *args, **kwargs):
+        return super().annotate(*map(self._money, args), **self._money_kwargs(kwargs))
+
+    def alias(self, *args, **kwargs):
+        return super().alias(*map(self._money, args), **self._money_kwargs(kwargs))
+
+    def aggregate(self, *args, **kwargs):
+        return super().aggregate(*map(self._money, args), **self._money_kwargs(kwargs))
+
+    def filter(self, *args, **kwargs):
+        return super().filter(*map(self._money, args), **self._money_kwargs(kwargs))
+
+    def exclude(self, *args, **kwargs):
+        return super().exclude(*map(self._money, args), **self._money_kwargs(kwargs))
+
+    def update(self, **kwargs):
+        return super().update(**self._money_kwargs(kwargs))
+
+    update.alters_data = True
@@ -0,0 +1,157 @@
+import base64
+import json
+from datetime import date, datetime
+
+from django.db.models import Q
+
+
+class KeysetPage:
+    """Страница результатов keyset-пагинации"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Seek-пагинация по ключу (-date, -created_at, -id).
+
+    Вместо OFFSET страница выбирается условием "строго после/до ключа
+    граничной строки", поэтому стоимость запроса зависит только от размера
+    страницы, а не от глубины листания. Курсоры непрозрачны для клиента:
+    это base64 от JSON с ключом граничной строки и направлением.
+    """
+
+    ordering = ('-date', '-created_at', '-id')
+    reverse_ordering = ('date', 'created_at', 'id')
+
+    def __init__(self, queryset, per_page=50):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def page(self, cursor=None):
+        """Получить страницу по курсору (None - первая страница)"""
+        position = self.decode_cursor(cursor) if cursor else None
+        page = self._build_page(list(self._page_queryset(position)), position)
+        if page is None:
+            # Дошли до начала списка - отдаём полную первую страницу
+            return self.page()
+        return page
+
+    async def apage(self, cursor=None):
+        """page() для async-представлений: строки выбираются через aiterator()"""
+        position = self.decode_cursor(cursor) if cursor else None
+        rows = [row async for row in self._page_queryset(position).aiterator()]
+        page = self._build_page(rows, position)
+        if page is None:
+            return await self.apage()
+        return page
+
+    def _page_queryset(self, position):
+        """Запрос строк страницы: на одну больше размера, чтобы узнать, есть ли продолжение"""
+        if position is None:
+            return self.queryset.order_by(*self.ordering)[:self.per_page + 1]
+
+        key, direction = position
+        if direction == 'prev':
+            # Берём строки "новее" курсора в обратном порядке и разворачиваем
+            return self.queryset.filter(self._after_key(key)).order_by(*self.reverse_ordering)[:self.per_page + 1]
+        return self.queryset.filter(self._before_key(key)).order_by(*self.ordering)[:self.per_page + 1]
+
+    def _build_page(self, rows, position):
+        """Страница из выбранных строк; None, если листание назад упёрлось в начало списка"""
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if position is None:
+            return KeysetPage(
+                rows,
+                next_cursor=self._cursor_for(rows[-1], 'next') if has_more else None,
+            )
+
+        if position[1] == 'prev':
+            if not has_more:
+                return None
+            rows.reverse()
+            return KeysetPage(
+                rows,
+                next_cursor=self._cursor_for(rows[-1], 'next'),
+                previous_cursor=self._cursor_for(rows[0], 'prev'),
+            )
+
+        return KeysetPage(
+            rows,
+            next_cursor=self._cursor_for(rows[-1], 'next') if has_more else None,
+            previous_cursor=self._cursor_for(rows[0], 'prev') if rows else None,
+        )
+
+    @staticmethod
+    def _before_key(key):
+        """Строки, идущие в списке после ключа (более старые)"""
+        row_date, created_at, pk = key
+        # Избыточное условие date__lte даёт SQLite диапазон по индексу,
+        # иначе перебор шёл бы от начала списка до курсора
+        return Q(date__lte=row_date) & (
+            Q(date__lt=row_date)
+            | Q(date=row_date, created_at__lt=created_at)
+            | Q(date=row_date, created_at=created_at, id__lt=pk)
+        )
+
+    @staticmethod
+    def _after_key(key):
+        """Строки, идущие в списке до ключа (более новые)"""
+        row_date, created_at, pk = key
+        return Q(date__gte=row_date) & (
+            Q(date__gt=row_date)
+            | Q(date=row_date, created_at__gt=created_at)
+            | Q(date=row_date, created_at=created_at, id__gt=pk)
+        )
+
+    @staticmethod
+    def _cursor_for(row, direction):
+        payload = {
+            'd': row.date.isoformat(),
+            'c': row.created_at.isoformat(),
+            'i': row.pk,
+            'r': direction,
+        }
+        raw = json.dumps(payload, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        """Разобрать курсор; для повреждённого курсора возвращает None"""
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            key = (
+                date.fromisoformat(payload['d']),
+                datetime.fromisoformat(payload['c']),
+                int(payload['i']),
+            )
+            direction = payload['r']
+        except (ValueError, TypeError, KeyError):
+            return None
+        if direction not in ('next', 'prev'):
+            return None
+        return key, direction
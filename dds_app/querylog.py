@@ -0,0 +1,118 @@
+"""Журнал медленных SQL-запросов с планом выполнения"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+
+logger = logging.getLogger('dds_app.slow_sql')
+
+# Имя представления, выполняющего запрос (выставляет PerformanceMiddleware)
+current_view = ContextVar('dds_current_view', default=None)
+
+_write_lock = threading.Lock()
+
+_IN_LIST_RE = re.compile(r'IN \((?:%s, )*%s\)')
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """Форма запроса: литералы и списки IN (...) любой длины схлопнуты"""
+    shape = _STRING_RE.sub('%s', sql)
+    shape = _NUMBER_RE.sub('%s', shape)
+    shape = _IN_LIST_RE.sub('IN (...)', shape)
+    return _SPACES_RE.sub(' ', shape).strip()
+
+
+def _json_default(value):
+    return str(value)
+
+
+class SlowQueryLog:
+    """
+    execute_wrapper, записывающий запросы дольше порога.
+
+    Для каждого медленного запроса сохраняются SQL с плейсхолдерами, число
+    параметров (сами значения - комментарии, ключи сессий - не пишутся),
+    имя представления и, если включено, результат EXPLAIN QUERY PLAN на
+    SQLite. Записи добавляются строками JSON в файл DDS_SLOW_QUERY_LOG и
+    дублируются в лог dds_app.slow_sql. Файл больше max_bytes переименовывается
+    в <путь>.1 (прежняя копия удаляется).
+    """
+
+    def __init__(self, threshold_ms=None, path=None, explain=None, max_bytes=None):
+        self.threshold_ms = (
+            threshold_ms if threshold_ms is not None
+            else getattr(settings, 'DDS_SLOW_QUERY_MS', 100)
+        )
+        self.path = path if path is not None else getattr(settings, 'DDS_SLOW_QUERY_LOG', None)
+        self.explain = explain if explain is not None else getattr(settings, 'DDS_SLOW_QUERY_EXPLAIN', False)
+        self.max_bytes = (
+            max_bytes if max_bytes is not None
+            else getattr(settings, 'DDS_SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024)
+        )
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            if duration_ms >= self.threshold_ms:
+                self._record(sql, params, many, context['connection'], duration_ms)
+
+    def _record(self, sql, params, many, connection, duration_ms):
+        entry = {
+            'time': datetime.now(timezone.utc).isoformat(),
+            'duration_ms': round(duration_ms, 2),
+            'view': current_view.get(),
+            'database': connection.alias,
+            'sql': sql,
+            'param_count': None if many or params is None else len(params),
+            'shape': normalize_sql(sql),
+        }
+        if self.explain and not many:
+            entry['plan'] = self._explain(sql, params, connection)
+
+        line = json.dumps(entry, ensure_ascii=False, default=_json_default)
+        logger.warning(line)
+        if self.path:
+            with _write_lock:
+                self._rotate(len(line.encode()) + 1)
+                with open(self.path, 'a', encoding='utf-8') as log_file:
+                    log_file.write(line + '\n')
+
+    def _rotate(self, size):
+        if not self.max_bytes:
+            return
+        try:
+            if os.path.getsize(self.path) + size > self.max_bytes:
+                os.replace(self.path, f'{self.path}.1')
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _explain(sql, params, connection):
+        """EXPLAIN QUERY PLAN для SELECT на SQLite; None в остальных случаях"""
+        if connection.vendor != 'sqlite' or not sql.lstrip().upper().startswith('SELECT'):
+            return None
+        # Курсор поверх сырого соединения: мимо execute_wrapper, без рекурсии
+        from django.db.backends.sqlite3.base import SQLiteCursorWrapper
+
+        cursor = connection.connection.cursor(factory=SQLiteCursorWrapper)
+        try:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+        except Exception as e:
+            return [f'EXPLAIN failed: {e}']
+        finally:
+            cursor.close()
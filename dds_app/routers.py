@@ -0,0 +1,104 @@
+"""
+Маршрутизация чтений на реплику БД.
+
+Реплика - копия основной SQLite-базы (алиас REPLICA_ALIAS), которую
+обновляет команда refresh_replica. Чтения моделей dds_app идут на неё
+только внутри представлений, обёрнутых replica_reads, и только если
+сессия давно ничего не записывала: после записи пользователь в течение
+DDS_REPLICA_STICKY_SECONDS читает из основной БД и видит свои изменения.
+Все записи идут в основную БД.
+"""
+
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+REPLICA_ALIAS = 'replica'
+
+# Время последней записи в сессии (unix time)
+LAST_WRITE_SESSION_KEY = '_dds_last_write'
+
+# Разрешены ли чтения с реплики в текущем запросе
+_replica_reads = ContextVar('dds_replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def _is_fresh_write(last_write):
+    sticky_seconds = getattr(settings, 'DDS_REPLICA_STICKY_SECONDS', 300)
+    return last_write is not None and time.time() - last_write < sticky_seconds
+
+
+def mark_write(request):
+    """Запомнить в сессии момент записи: дальше её чтения идут в основную БД"""
+    if replica_configured() and hasattr(request, 'session'):
+        request.session[LAST_WRITE_SESSION_KEY] = time.time()
+
+
+async def amark_write(request):
+    if replica_configured() and hasattr(request, 'session'):
+        await request.session.aset(LAST_WRITE_SESSION_KEY, time.time())
+
+
+def replica_reads(view_func):
+    """Читать данные dds_app с реплики, если сессия не в окне после записи"""
+
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            allowed = (
+                replica_configured() and request.method in ('GET', 'HEAD')
+                and not _is_fresh_write(await request.session.aget(LAST_WRITE_SESSION_KEY))
+            )
+            token = _replica_reads.set(allowed)
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+    else:
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            allowed = (
+                replica_configured() and request.method in ('GET', 'HEAD')
+                and not _is_fresh_write(request.session.get(LAST_WRITE_SESSION_KEY))
+            )
+            token = _replica_reads.set(allowed)
+            try:
+                return view_func(request, *args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+
+    return wrapper
+
+
+class ReplicaRouter:
+    """Чтения dds_app в replica_reads-представлениях - с реплики, остальное - в основную БД"""
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and model._meta.app_label == 'dds_app' and replica_configured():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Без явного ответа Django записал бы объект, прочитанный с реплики, обратно в неё
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия основной БД, связи между их объектами корректны
+        databases = {DEFAULT_DB_ALIAS, REPLICA_ALIAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплики приходит вместе с данными из refresh_replica
+        if db == REPLICA_ALIAS:
+            return False
+        return None
@@ -0,0 +1,126 @@
+"""
+HTML строк списка транзакций с кэшем фрагментов.
+
+Строка <tr> рендерится шаблоном dds_app/transaction_row.html один раз на
+версию транзакции - ключ (pk, updated_at) - и дальше берётся из кэша: на
+страницу приходится один get_many вместо сотен узлов шаблона на строку.
+Нарастающий остаток зависит от фильтра и страницы, а не от версии
+строки, поэтому в кэше хранятся части строки до и после его ячейки.
+
+Любая запись транзакции меняет updated_at (save, bulk_update и update
+проставляют его), так что устаревшие фрагменты больше не запрашиваются и
+вытесняются бэкендом. В ключ входят хэш исходника шаблона строки и
+часовой пояс: правка разметки или другой пояс дают новые ключи.
+"""
+
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.html import format_html
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+
+
+ROW_TEMPLATE = 'dds_app/transaction_row.html'
+
+# Место ячейки остатка в отрендеренной строке
+BALANCE_SLOT = '<!--balance-->'
+
+
+def balance_cell(balance):
+    return format_html('<td class="text-nowrap{}">{}₽</td>', ' text-danger' if balance < 0 else '', balance)
+
+
+def _key_prefix(template):
+    source = hashlib.sha256(template.template.source.encode()).hexdigest()[:12]
+    return f'row:{source}:{timezone.get_current_timezone_name()}'
+
+
+class RowCache:
+    """Фрагменты строк списка в бэкенде dds_app.cache и счётчики попаданий"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def render_rows(self, transactions):
+        """HTML строк <tr> для транзакций страницы (с атрибутом balance)"""
+        template = get_template(ROW_TEMPLATE)
+        prefix = _key_prefix(template)
+        keys = [f'{prefix}:{transaction.pk}:{transaction.updated_at.isoformat()}' for transaction in transactions]
+        fragments = self.backend.get_many(keys) if self.enabled else {}
+        hits = len(fragments)
+
+        rendered = {}
+        parts = []
+        for key, transaction in zip(keys, transactions):
+            fragment = fragments.get(key)
+            if fragment is None:
+                fragment = fragments[key] = rendered[key] = tuple(
+                    template.render({'transaction': transaction}).split(BALANCE_SLOT, 1)
+                )
+            parts.extend((fragment[0], balance_cell(transaction.balance), fragment[1]))
+
+        if self.enabled:
+            if rendered:
+                self.backend.set_many(rendered)
+            with self._lock:
+                self.hits += hits
+                self.misses += len(rendered)
+        return mark_safe(''.join(parts))
+
+    def stats(self):
+        """Счётчики процесса для мониторинга"""
+        lookups = self.hits + self.misses
+        return {
+            'backend': type(self.backend).__name__ if self.enabled else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            **(self.backend.info() if self.enabled else {}),
+        }
+
+    def clear(self):
+        if self.enabled:
+            self.backend.clear()
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+_row_cache = None
+_row_cache_lock = threading.Lock()
+
+
+def get_row_cache():
+    """
+    Кэш строк по настройке DDS_ROW_CACHE (формат как у DDS_RESULT_CACHE);
+    None отключает кэширование - строки рендерятся шаблоном каждый раз.
+    """
+    global _row_cache
+    if _row_cache is None:
+        with _row_cache_lock:
+            if _row_cache is None:
+                config = getattr(settings, 'DDS_ROW_CACHE', None)
+                backend = None
+                if config:
+                    backend = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+                _row_cache = RowCache(backend)
+    return _row_cache
+
+
+@receiver(setting_changed)
+def _reset_row_cache(setting, **kwargs):
+    global _row_cache
+    if setting == 'DDS_ROW_CACHE':
+        _row_cache = None
@@ -0,0 +1,78 @@
+"""Полнотекстовый поиск по комментариям транзакций (SQLite FTS5)"""
+
+import re
+
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+# Бесконтентная FTS5-таблица (comment, owner) с rowid = id транзакции,
+# синхронизируется триггерами (миграция 0004_transaction_search)
+FTS_TABLE = 'dds_app_transaction_fts'
+
+_WORD_RE = re.compile(r'\w+')
+
+# (alias, имя БД) -> есть ли FTS-таблица
+_fts_tables = {}
+
+
+def build_match_query(text, user_id=None):
+    """
+    Строка запроса FTS5 из пользовательского ввода.
+
+    Каждое слово берётся в кавычки (спецсимволы FTS5 не интерпретируются)
+    и ищется по префиксу; слова объединяются через AND. С user_id поиск
+    ограничивается токеном владельца: 'Ашан', 5 -> 'owner:"u5" AND comment:("Ашан"*)'.
+    None, если слов нет.
+    """
+    words = _WORD_RE.findall(text)
+    if not words:
+        return None
+    match = 'comment:(' + ' '.join(f'"{word}"*' for word in words) + ')'
+    if user_id is not None:
+        match = f'owner:"u{user_id}" AND {match}'
+    return match
+
+
+def fts_available(using='default'):
+    """Есть ли в БД FTS-индекс комментариев (SQLite с поддержкой FTS5)"""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    key = (using, str(connection.settings_dict['NAME']))
+    if key not in _fts_tables:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_tables[key] = cursor.fetchone() is not None
+    return _fts_tables[key]
+
+
+def comment_search_q(text, using='default', user_id=None):
+    """
+    Условие поиска по комментарию; None, если в запросе нет слов.
+
+    На SQLite - выборка rowid из FTS-индекса (поиск по индексу вместо
+    LIKE '%...%' по всей таблице), на остальных СУБД - icontains.
+    user_id сужает выборку из индекса до транзакций одного пользователя.
+    """
+    match = build_match_query(text, user_id)
+    if match is None:
+        return None
+    if not fts_available(using):
+        return Q(comment__icontains=text.strip())
+    return Q(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,)))
+
+
+def rebuild_index(using='default'):
+    """Перестроить FTS-индекс по текущему содержимому таблицы транзакций"""
+    if not fts_available(using):
+        return False
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, comment, owner) "
+            f"SELECT id, comment, 'u' || user_id FROM dds_app_transaction"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return True
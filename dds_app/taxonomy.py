@@ -0,0 +1,51 @@
+"""Справочник тип -> категория -> подкатегория для форм и API"""
+
+import hashlib
+import json
+
+from .models import Transaction
+
+
+def build_taxonomy():
+    """Полное дерево справочника с подписями, в порядке объявления choices"""
+    category_labels = dict(Transaction.Category.choices)
+    subcategory_labels = dict(Transaction.Subcategory.choices)
+
+    return {
+        'types': [
+            {
+                'id': type_value,
+                'name': type_label,
+                'categories': [
+                    {
+                        'id': category,
+                        'name': category_labels[category],
+                        'subcategories': [
+                            {'id': subcategory, 'name': subcategory_labels[subcategory]}
+                            for subcategory in Transaction.CATEGORY_SUBCATEGORY_MAP.get(category, [])
+                        ],
+                    }
+                    for category in Transaction.TYPE_CATEGORY_MAP.get(type_value, [])
+                ],
+            }
+            for type_value, type_label in Transaction.Type.choices
+        ],
+    }
+
+
+# Справочник задан в коде и меняется только с деплоем, поэтому дерево,
+# его JSON и версия (хэш содержимого) вычисляются один раз при импорте.
+TAXONOMY = build_taxonomy()
+TAXONOMY_JSON = json.dumps(TAXONOMY, ensure_ascii=False, separators=(',', ':')).encode()
+TAXONOMY_VERSION = hashlib.sha256(TAXONOMY_JSON).hexdigest()[:16]
+
+# Плоские списки для обратной совместимости со старыми AJAX-эндпоинтами
+CATEGORIES_BY_TYPE = {
+    type_node['id']: [{'id': node['id'], 'name': node['name']} for node in type_node['categories']]
+    for type_node in TAXONOMY['types']
+}
+SUBCATEGORIES_BY_CATEGORY = {
+    category_node['id']: category_node['subcategories']
+    for type_node in TAXONOMY['types']
+    for category_node in type_node['categories']
+}
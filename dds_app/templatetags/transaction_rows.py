@@ -0,0 +1,12 @@
+from django import template
+
+from ..rows import get_row_cache
+
+
+register = template.Library()
+
+
+@register.simple_tag
+def transaction_rows(transactions):
+    """Строки <tr> списка транзакций из кэша фрагментов (см. dds_app.rows)"""
+    return get_row_cache().render_rows(transactions)
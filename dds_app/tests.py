@@ -1,3 +1,1437 @@
-from django.test import TestCase
+import csv
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import Future
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, connections, transaction as db_transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Avg, Count, F, Min, Sum
+from django.db.models.functions import ExtractYear, TruncMonth
+from django.http import HttpResponse
+from django.template import engines
+from django.template.backends.django import Template as DjangoTemplate
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import async_views
+from .backends.templates import TimedTemplate
+from .benchmarks import compare
+from .bulk import TRANSACTION_FIELDS
+from .cache import get_result_cache
+from .columnar import get_columnar_engine
+from .conditional import make_etag, not_modified
+from .facets import FACET_FIELDS, facet_counts, facet_groups
+from .forms import PivotReportForm
+from .models import CashFlowRollup, Transaction, UserDataVersion, transactions_changed
+from .money import from_minor
+from .pagination import KeysetPaginator
+from .querylog import SlowQueryLog
+from .routers import LAST_WRITE_SESSION_KEY, ReplicaRouter, amark_write, mark_write, replica_reads
+from .rows import balance_cell, get_row_cache
+from .search import fts_available
+from .taxonomy import TAXONOMY_JSON, TAXONOMY_VERSION
+from .views import TransactionListView
+from .writer import GroupCommitWriter, get_writer
+from .pivot import MAX_COLUMNS, build_pivot, period_range
+
+
+def make_transaction(user, amount='100.00', day=date(2024, 1, 15), **fields):
+    """Новая транзакция со статьёй по умолчанию (списание на VPS)"""
+    fields = {
+        'status': Transaction.Status.BUSINESS,
+        'type': Transaction.Type.EXPENSE,
+        'category': Transaction.Category.INFRASTRUCTURE,
+        'subcategory': Transaction.Subcategory.VPS,
+        **fields,
+    }
+    return Transaction.objects.create(user=user, date=day, amount=Decimal(amount), **fields)
+
+
+def pivot_row(month, amount, rows=1, type_value='expense', category='infrastructure', subcategory='vps'):
+    return {
+        'month': month, 'type': type_value, 'category': category, 'subcategory': subcategory,
+        'amount': amount, 'rows': rows,
+    }
+
+
+class PivotRangeTests(SimpleTestCase):
+    """Столбцы сводного отчёта"""
+
+    def test_period_range_reaches_last_year(self):
+        self.assertEqual(
+            period_range(date(9999, 11, 1), date(9999, 12, 31), 'month'),
+            [date(9999, 11, 1), date(9999, 12, 1)],
+        )
+        self.assertEqual(period_range(date(9998, 5, 1), date(9999, 12, 31), 'year'), [date(9998, 1, 1), date(9999, 1, 1)])
+
+    def test_columns_clamped_to_data(self):
+        rows = [pivot_row(date(2024, 3, 1), 1000), pivot_row(date(2024, 5, 1), 250)]
+        report = build_pivot(rows, 'month', date(1, 1, 1), date(9999, 12, 31))
+        self.assertEqual([column['start'] for column in report['columns']], [
+            date(2024, 3, 1), date(2024, 4, 1), date(2024, 5, 1),
+        ])
+        self.assertEqual(report['net']['total'], Decimal('-12.50'))
+        self.assertFalse(report['truncated'])
+
+    def test_columns_capped(self):
+        rows = [pivot_row(date(1900, 1, 1), 100), pivot_row(date(2024, 12, 1), 100)]
+        report = build_pivot(rows, 'month')
+        self.assertEqual(len(report['columns']), MAX_COLUMNS)
+        self.assertEqual(report['columns'][-1]['start'], date(2024, 12, 1))
+        self.assertTrue(report['truncated'])
+        self.assertEqual(report['net']['total'], Decimal('-1.00'))
+
+    def test_form_rejects_oversized_span(self):
+        form = PivotReportForm({'period': 'month', 'date_from': '0001-01-01', 'date_to': '9999-12-31'})
+        self.assertFalse(form.is_valid())
+        form = PivotReportForm({'period': 'year', 'date_from': '2000-01-01', 'date_to': '2030-12-31'})
+        self.assertTrue(form.is_valid())
+
+
+class PivotReportViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('pivot', password='pass')
+        make_transaction(cls.user, '10.00', date(2024, 1, 15))
+        make_transaction(cls.user, '5.00', date(2024, 3, 2))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_extreme_dates(self):
+        for name in ('dds_app:pivot_report', 'dds_app:pivot_report_export', 'dds_app:pivot_report_api'):
+            for params in ({'date_to': '9999-12-31'}, {'date_from': '0001-01-01'}):
+                with self.subTest(view=name, params=params):
+                    response = self.client.get(reverse(name), params)
+                    self.assertEqual(response.status_code, 200)
+
+        report = self.client.get(reverse('dds_app:pivot_report_api'), {'date_from': '0001-01-01'}).json()
+        self.assertEqual([column['label'] for column in report['columns']], ['01.2024', '02.2024', '03.2024'])
+
+    def test_oversized_span_rejected(self):
+        response = self.client.get(reverse('dds_app:pivot_report_api'), {
+            'date_from': '0001-01-01', 'date_to': '9999-12-31',
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class BulkActionTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('bulk', password='pass')
+        self.client.force_login(self.user)
+        self.rent = make_transaction(self.user, '10.00', comment='аренда сервера')
+        self.food = make_transaction(
+            self.user, '5.00', category=Transaction.Category.FOOD, subcategory=Transaction.Subcategory.PRODUCTS,
+            comment='продукты',
+        )
+
+    def bulk(self, filter_query, action='delete'):
+        return self.client.post(reverse('dds_app:transaction_bulk_action'), {
+            'action': action, 'status': 'tax', 'all_matching': 'on', 'filter_query': filter_query,
+        })
+
+    def test_invalid_filter_rejected(self):
+        response = self.bulk('filter_mode=xor&category=food')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+
+    def test_search_only_filter_applied(self):
+        self.bulk('q=аренда')
+        self.assertQuerySetEqual(Transaction.objects.filter(user=self.user), [self.food])
+
+    def test_filter_applied(self):
+        self.bulk('filter_mode=and&category=food', action='status')
+        self.food.refresh_from_db()
+        self.rent.refresh_from_db()
+        self.assertEqual((self.food.status, self.rent.status), ('tax', 'business'))
+
+    def test_empty_filter_means_all(self):
+        self.bulk('')
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+
+
+class ExportStreamingTests(TestCase):
+    """Выгрузка в CSV под ASGI отдаётся частями, а не собирается в памяти"""
+
+    ROWS = 10000
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('export', password='pass')
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=cls.user, date=date(2024, 1, 1 + i % 28), amount=Decimal(i).scaleb(-2), comment='x' * 200,
+                status='business', type='expense', category='infrastructure', subcategory='vps',
+            )
+            for i in range(cls.ROWS)
+        ])
+
+    async def aexport(self):
+        request = AsyncRequestFactory().get('/dds_app/transactions/export/')
+
+        async def auser():
+            return self.user
+
+        request.user, request.auser = self.user, auser
+        return await async_views.TransactionExportView.as_view(chunk_size=50)(request)
+
+    async def test_memory_flat(self):
+        response = await self.aexport()
+        self.assertTrue(response.is_async)
+
+        size = chunks = 0
+        tracemalloc.start()
+        try:
+            async for chunk in response:
+                size += len(chunk)
+                chunks += 1
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertGreater(chunks, self.ROWS // 50)
+        # Держится одна часть из 50 строк (~14 КБ) и разовые расходы на запрос,
+        # а не весь файл (~2.8 МБ)
+        self.assertLess(peak, size / 4)
+
+    async def test_same_csv_as_sync_view(self):
+        response = await self.aexport()
+        content = b''.join([chunk async for chunk in response])
+
+        await self.async_client.aforce_login(self.user)
+        sync_response = await self.async_client.get(reverse('dds_app:transaction_export'))
+        self.assertEqual(content, await sync_to_async(b''.join)(sync_response.streaming_content))
+        self.assertEqual(content.count(b'\n'), self.ROWS + 1)
+
+
+class MoneyExpressionTests(TestCase):
+    """Выражения ORM над суммой дают те же рубли, что и до хранения в копейках"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('money', password='pass')
+        for amount in ('10.00', '5.00', '0.01'):
+            make_transaction(cls.user, amount)
+
+    def amounts(self):
+        return sorted(Transaction.objects.filter(user=self.user).values_list('amount', flat=True))
+
+    def test_update_with_numbers(self):
+        Transaction.objects.filter(user=self.user).update(amount=F('amount') + Decimal('1.00'))
+        self.assertEqual(self.amounts(), [Decimal('1.01'), Decimal('6.00'), Decimal('11.00')])
+        Transaction.objects.filter(user=self.user).update(amount=F('amount') - 1)
+        self.assertEqual(self.amounts(), [Decimal('0.01'), Decimal('5.00'), Decimal('10.00')])
+        Transaction.objects.filter(user=self.user).update(amount=Decimal('0.5') + F('amount'))
+        self.assertEqual(self.amounts(), [Decimal('0.51'), Decimal('5.50'), Decimal('10.50')])
+        Transaction.objects.filter(user=self.user).update(amount=F('amount') * 2)
+        self.assertEqual(self.amounts(), [Decimal('1.02'), Decimal('11.00'), Decimal('21.00')])
+        # Агрегаты ДДС пересчитаны по новым суммам
+        rollup = CashFlowRollup.objects.filter(user=self.user).aggregate(total=Sum('total'))['total']
+        self.assertEqual(from_minor(rollup), Decimal('33.02'))
+
+    def test_annotate(self):
+        rows = Transaction.objects.filter(user=self.user, amount=Decimal('10.00')).annotate(
+            plus=F('amount') + 1, half=F('amount') / 3, double=F('amount') * Decimal('1.5'),
+        ).get()
+        self.assertEqual((rows.plus, rows.half, rows.double), (Decimal('11.00'), Decimal('3.33'), Decimal('15.00')))
+        self.assertEqual(
+            Transaction.objects.filter(user=self.user, amount__gt=F('amount') - Decimal('0.01')).count(), 3,
+        )
+
+    def test_aggregates(self):
+        result = Transaction.objects.filter(user=self.user).aggregate(
+            Avg('amount'), total=Sum('amount'), plus=Sum(F('amount') + 1), low=Min('amount'),
+        )
+        self.assertEqual(result, {
+            'amount__avg': Decimal('5.00333333333333'),
+            'total': Decimal('15.01'),
+            'plus': Decimal('18.01'),
+            'low': Decimal('0.01'),
+        })
+
+
+class SQLiteConcurrencyTests(TransactionTestCase):
+    """Параллельные писатели и читатели на файловой БД с WAL (см. sqlite_contention)"""
+
+    WRITERS = 4
+    READERS = 4
+    OPERATIONS = 25
+
+    def test_no_lock_errors(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+
+        user = User.objects.create_user('contention')
+        errors = []
+        start = threading.Barrier(self.WRITERS + self.READERS)
+
+        def write(number):
+            for index in range(self.OPERATIONS):
+                make_transaction(user, '1.00', comment=f'Писатель {number}, {index}')
+
+        def read(number):
+            for _ in range(self.OPERATIONS):
+                list(KeysetPaginator(Transaction.objects.filter(user=user), per_page=20).page(None))
+                UserDataVersion.objects.current(user)
+
+        def worker(operation, number):
+            start.wait()
+            try:
+                operation(number)
+            except OperationalError as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(write, number)) for number in range(self.WRITERS)]
+        threads += [threading.Thread(target=worker, args=(read, number)) for number in range(self.READERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        rows = self.WRITERS * self.OPERATIONS
+        self.assertEqual(Transaction.objects.filter(user=user).count(), rows)
+        rollups = CashFlowRollup.objects.filter(user=user).aggregate(total=Sum('total'), count=Sum('count'))
+        self.assertEqual(rollups, {'total': rows * 100, 'count': rows})
+
+
+class GroupCommitWriterTests(TransactionTestCase):
+    """Групповая фиксация: пачки, ошибки отдельных строк, таймауты, обычный save()"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('writer')
+        self.writer = GroupCommitWriter(max_batch=8, max_delay_ms=20)
+        self.addCleanup(self.writer.stop)
+
+    def new_transaction(self, comment='', **fields):
+        return Transaction(**{
+            'user': self.user, 'date': date(2024, 1, 1), 'amount': Decimal('1.00'), 'comment': comment,
+            'status': 'business', 'type': 'expense', 'category': 'infrastructure', 'subcategory': 'vps',
+            **fields,
+        })
+
+    def test_batches(self):
+        futures = [self.writer.submit(self.new_transaction(str(index))) for index in range(20)]
+        created = [future.result(5) for future in futures]
+
+        self.assertTrue(all(obj.pk for obj in created))
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 20)
+        stats = self.writer.stats()
+        self.assertEqual(stats['rows'], 20)
+        self.assertLess(stats['batches'], 20)
+        self.assertEqual(CashFlowRollup.objects.get(user=self.user).count, 20)
+
+    def test_bad_row_does_not_fail_batch(self):
+        # Внешний ключ на SQLite проверяется при фиксации - падает вся пачка
+        bad = self.new_transaction('bad', user_id=self.user.pk + 1000)
+        batch = [(obj, Future()) for obj in (self.new_transaction('a'), bad, self.new_transaction('b'))]
+        with self.assertLogs('dds_app.writer', 'WARNING'):
+            self.writer._commit(batch)
+
+        (first, first_future), (_, bad_future), (last, last_future) = batch
+        self.assertIsInstance(bad_future.exception(), IntegrityError)
+        self.assertEqual((first_future.result(), last_future.result()), (first, last))
+        self.assertQuerySetEqual(
+            Transaction.objects.order_by('comment').values_list('comment', flat=True), ['a', 'b'],
+        )
+        self.assertEqual(self.writer.stats()['rows'], 2)
+
+    def test_create_validates(self):
+        with self.assertRaises(ValidationError):
+            self.writer.create(self.new_transaction(category='food'))
+        self.assertEqual(self.writer.stats()['rows'], 0)
+
+    def test_timeout_cancels_queued_row(self):
+        self.writer.timeout = 0.05
+        # Поток-писатель не запущен: строка остаётся в очереди
+        with mock.patch.object(self.writer, '_ensure_started'):
+            with self.assertRaises(TimeoutError):
+                self.writer.create(self.new_transaction('cancelled'))
+        self.writer.timeout = 5
+        self.writer.create(self.new_transaction('created'))
+
+        self.assertQuerySetEqual(Transaction.objects.values_list('comment', flat=True), ['created'])
+
+    def test_timeout_waits_for_running_batch(self):
+        self.writer.timeout = 0.05
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_write_lock():
+            # IMMEDIATE-транзакция держит блокировку записи, пачка ждёт её в busy_timeout
+            with db_transaction.atomic():
+                locked.set()
+                release.wait(5)
+            connections.close_all()
+
+        holder = threading.Thread(target=hold_write_lock)
+        holder.start()
+        locked.wait(5)
+        threading.Timer(0.3, release.set).start()
+        obj = self.writer.create(self.new_transaction('late'))
+        holder.join()
+
+        self.assertIsNotNone(obj.pk)
+        self.assertQuerySetEqual(Transaction.objects.values_list('comment', flat=True), ['late'])
+
+    def test_inside_atomic_saves_directly(self):
+        with db_transaction.atomic():
+            obj = self.writer.create(self.new_transaction())
+        self.assertIsNotNone(obj.pk)
+        self.assertEqual(self.writer.stats()['batches'], 0)
+
+    def test_view_without_group_commit(self):
+        self.client.force_login(self.user)
+        data = {
+            'date': '2024-01-01', 'status': 'business', 'type': 'expense', 'category': 'infrastructure',
+            'subcategory': 'vps', 'amount': '12.50', 'comment': 'save',
+        }
+        with override_settings(DDS_GROUP_COMMIT=None):
+            self.assertIsNone(get_writer())
+            response = self.client.post(reverse('dds_app:transaction_create'), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Transaction.objects.get(user=self.user).amount, Decimal('12.50'))
+
+
+class SlowQueryLogTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'slow.jsonl')
+
+    def run_queries(self, log, count=1):
+        with self.assertLogs('dds_app.slow_sql', 'WARNING'), connection.execute_wrapper(log):
+            for _ in range(count):
+                Transaction.objects.filter(comment='секретный комментарий').exists()
+
+    def test_params_not_written(self):
+        self.run_queries(SlowQueryLog(threshold_ms=0, path=self.path))
+        with open(self.path, encoding='utf-8') as log_file:
+            content = log_file.read()
+        self.assertNotIn('секретный', content)
+        entry = json.loads(content)
+        self.assertEqual(entry['param_count'], entry['sql'].count('%s'))
+        self.assertNotIn('plan', entry)
+
+    def test_rotation(self):
+        self.run_queries(SlowQueryLog(threshold_ms=0, path=self.path, max_bytes=1000), count=10)
+        self.assertLessEqual(os.path.getsize(self.path), 1000)
+        self.assertLessEqual(os.path.getsize(f'{self.path}.1'), 1000)
+
+
+def rollup_snapshot(user):
+    """Корзины агрегатов пользователя: {ключ корзины: (сумма в копейках, количество)}"""
+    return {
+        tuple(row[:-2]): tuple(row[-2:])
+        for row in CashFlowRollup.objects.filter(user=user).values_list(
+            *CashFlowRollup.BUCKET_FIELDS, 'total', 'count'
+        )
+    }
+
+
+class RollupConsistencyTests(TestCase):
+    """Агрегаты ДДС после каждого пути записи совпадают с пересчётом с нуля"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('rollups')
+        self.other = User.objects.create_user('rollups-other')
+        self.rent = make_transaction(self.user, '10.50')
+        self.food = make_transaction(
+            self.user, '3.25', date(2024, 2, 1),
+            category=Transaction.Category.FOOD, subcategory=Transaction.Subcategory.PRODUCTS,
+        )
+
+    def assertRollupsConsistent(self):
+        for user in (self.user, self.other):
+            stored = rollup_snapshot(user)
+            CashFlowRollup.objects.rebuild(user)
+            self.assertEqual(stored, rollup_snapshot(user))
+            self.assertNotIn(0, [count for _, count in stored.values()])
+
+    def test_save(self):
+        self.assertRollupsConsistent()
+        self.rent.amount = Decimal('99.99')
+        self.rent.date = date(2024, 3, 1)
+        self.rent.save()
+        self.assertRollupsConsistent()
+
+    def test_delete(self):
+        self.food.delete()
+        self.assertRollupsConsistent()
+        self.assertEqual(len(rollup_snapshot(self.user)), 1)
+
+    def test_bulk_create(self):
+        # Больше BULK_THRESHOLD корзин - пакетное применение приращений
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user, date=date(2024, 5, day), amount=Decimal('1.01'),
+                status=Transaction.Status.BUSINESS, type=Transaction.Type.EXPENSE,
+                category=Transaction.Category.INFRASTRUCTURE, subcategory=Transaction.Subcategory.VPS,
+            )
+            for day in range(1, 21)
+        ])
+        self.assertRollupsConsistent()
+
+    def test_bulk_update(self):
+        self.rent.amount = Decimal('0.01')
+        self.food.user = self.other
+        Transaction.objects.bulk_update([self.rent, self.food], ['amount', 'user'])
+        self.assertRollupsConsistent()
+
+    def test_update(self):
+        for changes in (
+            {'amount': Decimal('7.77')},
+            {'category': Transaction.Category.FOOD, 'subcategory': Transaction.Subcategory.PRODUCTS},
+            {'date': date(2024, 4, 1)},
+            {'amount': F('amount') * 2},
+            {'user': self.other},
+        ):
+            with self.subTest(changes=changes):
+                Transaction.objects.filter(pk=self.rent.pk).update(**changes)
+                self.assertRollupsConsistent()
+
+    def test_queryset_delete(self):
+        make_transaction(self.other, '1.00')
+        Transaction.objects.filter(amount__gt=Decimal('5.00')).delete()
+        self.assertRollupsConsistent()
+
+
+class UserDataVersionTests(TestCase):
+    """Версия данных растёт при любой записи и сбрасывает кэш списка"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('version')
+        self.signals = []
+        receiver = lambda **kwargs: self.signals.append((kwargs['user_ids'], kwargs['changed_ids']))  # noqa: E731
+        transactions_changed.connect(receiver)
+        self.addCleanup(transactions_changed.disconnect, receiver)
+
+    def version(self):
+        return UserDataVersion.objects.current(self.user)[0]
+
+    def test_every_write_bumps(self):
+        self.assertEqual(self.version(), 0)
+        transaction = make_transaction(self.user)
+        self.assertEqual(self.version(), 1)
+        self.assertEqual(self.signals, [({self.user.pk}, [transaction.pk])])
+
+        writes = [
+            lambda: transaction.save(),
+            lambda: Transaction.objects.filter(pk=transaction.pk).update(comment='без корзины'),
+            lambda: Transaction.objects.filter(pk=transaction.pk).update(amount=Decimal('1.00')),
+            lambda: Transaction.objects.bulk_update([transaction], ['comment']),
+            lambda: Transaction.objects.filter(pk=transaction.pk).delete(),
+        ]
+        for number, write in enumerate(writes, start=2):
+            write()
+            self.assertEqual(self.version(), number)
+        self.assertEqual(self.signals[-1], ({self.user.pk}, None))
+
+    def test_rollback_restores_version(self):
+        make_transaction(self.user)
+        with self.assertRaises(IntegrityError), db_transaction.atomic():
+            make_transaction(self.user)
+            raise IntegrityError
+        self.assertEqual(self.version(), 1)
+
+
+@override_settings(DDS_RESULT_CACHE={'BACKEND': 'dds_app.cache.LRUCacheBackend'})
+class ResultCacheTests(TransactionTestCase):
+    """Кэш страниц списка: ключ по версии данных, промах после записи"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('cache', password='pass')
+        self.client.force_login(self.user)
+        get_result_cache().clear()
+
+    def test_key(self):
+        cache = get_result_cache()
+        key = cache.make_key(1, 3, {'category': ['food', 'transport'], 'q': ''}, None)
+        self.assertEqual(key, cache.make_key(1, 3, {'category': ['transport', 'food']}, None))
+        self.assertTrue(key.startswith('u1:v3:'))
+        self.assertNotEqual(key, cache.make_key(1, 4, {'category': ['food', 'transport']}, None))
+        self.assertNotEqual(key, cache.make_key(2, 3, {'category': ['food', 'transport']}, None))
+
+    def test_write_invalidates(self):
+        cache = get_result_cache()
+        self.client.get(reverse('dds_app:transaction_list'))
+        self.client.get(reverse('dds_app:transaction_list'))
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+
+        make_transaction(self.user, '42.00', comment='новая запись')
+        response = self.client.get(reverse('dds_app:transaction_list'))
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+        self.assertContains(response, 'новая запись')
+
+    def test_not_stored_inside_atomic(self):
+        cache = get_result_cache()
+        with db_transaction.atomic():
+            self.assertEqual(cache.get_or_compute('key', lambda: 'value'), 'value')
+        self.assertEqual(cache.stats()['skipped'], 1)
+        self.assertEqual(cache.get_or_compute('key', lambda: 'new'), 'new')
+        self.assertEqual(cache.get_or_compute('key', lambda: 'newer'), 'new')
+
+
+class KeysetPaginatorTests(TestCase):
+    """Курсор страницы не пропускает и не повторяет строки при вставках"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('keyset')
+        self.rows = [make_transaction(self.user, '1.00', date(2024, 1, day)) for day in (1, 2, 2, 2, 3, 3, 4)]
+        # Одинаковые дата и время создания: порядок решает id
+        Transaction.objects.filter(date=date(2024, 1, 2)).update(created_at=self.rows[1].created_at)
+
+    def paginator(self):
+        return KeysetPaginator(Transaction.objects.filter(user=self.user), per_page=3)
+
+    def test_insert_between_pages(self):
+        first = self.paginator().page()
+        make_transaction(self.user, '1.00', date(2024, 2, 1))
+        make_transaction(self.user, '1.00', date(2024, 1, 3))
+
+        pks = [row.pk for row in first]
+        cursor = first.next_cursor
+        while cursor:
+            page = self.paginator().page(cursor)
+            pks += [row.pk for row in page]
+            cursor = page.next_cursor
+
+        self.assertEqual(len(pks), len(set(pks)))
+        self.assertTrue({row.pk for row in self.rows} <= set(pks))
+        ordered = Transaction.objects.filter(pk__in=pks).order_by(*KeysetPaginator.ordering)
+        self.assertEqual(pks, [row.pk for row in ordered])
+
+    def test_previous_page(self):
+        first = self.paginator().page()
+        second = self.paginator().page(first.next_cursor)
+        make_transaction(self.user, '1.00', date(2024, 2, 1))
+        self.assertEqual(list(self.paginator().page(second.previous_cursor)), list(first))
+
+    def test_broken_cursor(self):
+        self.assertEqual(list(self.paginator().page('испорчен')), list(self.paginator().page()))
+
+
+class CommentSearchTests(TestCase):
+    """FTS-индекс комментариев следует за записями триггерами"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('search')
+        self.other = User.objects.create_user('search-other')
+
+    def found(self, text, user=None):
+        return list(Transaction.objects.search(text, user).values_list('pk', flat=True))
+
+    def test_triggers(self):
+        self.assertTrue(fts_available())
+        transaction = make_transaction(self.user, comment='Оплата хостинга')
+        self.assertEqual(self.found('хост', self.user), [transaction.pk])
+
+        transaction.comment = 'Продукты Ашан'
+        transaction.save()
+        self.assertEqual(self.found('хостинг'), [])
+        self.assertEqual(self.found('ашан'), [transaction.pk])
+
+        Transaction.objects.filter(pk=transaction.pk).update(comment='Такси')
+        self.assertEqual(self.found('такси'), [transaction.pk])
+        transaction.comment = 'Аптека'
+        Transaction.objects.bulk_update([transaction], ['comment'])
+        self.assertEqual(self.found('аптека'), [transaction.pk])
+
+        Transaction.objects.filter(pk=transaction.pk).update(user=self.other)
+        self.assertEqual(self.found('аптека', self.user), [])
+        self.assertEqual(self.found('аптека', self.other), [transaction.pk])
+
+        Transaction.objects.filter(pk=transaction.pk).delete()
+        self.assertEqual(self.found('аптека'), [])
+
+
+class QueryPlanTests(TestCase):
+    """Запросы страниц списка идут по индексам (команда check_query_plans)"""
+
+    def test_no_full_scans(self):
+        output = StringIO()
+        call_command('check_query_plans', stdout=output)
+        self.assertNotIn('FAIL', output.getvalue())
+
+
+class AmountMigrationTests(TransactionTestCase):
+    """0006_amount_minor_units: рубли в копейки и обратно без потерь"""
+
+    before = [('dds_app', '0005_user_data_version')]
+    after = [('dds_app', '0006_amount_minor_units')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def setUp(self):
+        self.addCleanup(self.migrate, self.after)
+        apps = self.migrate(self.before)
+        user = apps.get_model('auth', 'User').objects.create(username='migration')
+        self.user_id = user.pk
+        self.transaction_id = apps.get_model('dds_app', 'Transaction').objects.create(
+            user=user, date=date(2024, 1, 15), amount=Decimal('1234.56'), comment='Аренда офиса',
+            status='business', type='expense', category='infrastructure', subcategory='vps',
+        ).pk
+        apps.get_model('dds_app', 'CashFlowRollup').objects.create(
+            user=user, day=date(2024, 1, 15), total=Decimal('1234.56'), count=1,
+            status='business', type='expense', category='infrastructure', subcategory='vps',
+        )
+
+    def test_round_trip(self):
+        self.migrate(self.after)
+        transaction = Transaction.objects.get(pk=self.transaction_id)
+        self.assertEqual(transaction.amount, Decimal('1234.56'))
+        self.assertEqual(CashFlowRollup.objects.get(user_id=self.user_id).total, 123456)
+        self.assertEqual(list(Transaction.objects.search('аренда').values_list('pk', flat=True)), [transaction.pk])
+
+        apps = self.migrate(self.before)
+        self.assertEqual(apps.get_model('dds_app', 'Transaction').objects.get().amount, Decimal('1234.56'))
+        self.assertEqual(apps.get_model('dds_app', 'CashFlowRollup').objects.get().total, Decimal('1234.56'))
+
+
+class BenchmarkTests(TestCase):
+    """Сценарии бенчмарков отрабатывают на небольшом наборе данных"""
+
+    def test_all_benchmarks_run(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'results.json')
+        call_command('benchmark', rows=[30], repeat=1, warmup=0, output=path, stdout=StringIO())
+
+        with open(path, encoding='utf-8') as results_file:
+            results = json.load(results_file)['results']
+        names = {entry['benchmark'] for entry in results}
+        self.assertTrue({'list.no_filter', 'list.not_modified', 'create.post', 'export.csv'} <= names)
+        self.assertEqual({entry['dataset'] for entry in results}, {30})
+        self.assertEqual(Transaction.objects.filter(user__username='bench30_1').count(), 30)
+
+    def test_compare(self):
+        baseline = [
+            {'benchmark': 'a', 'dataset': 10, 'median_ms': 10.0},
+            {'benchmark': 'b', 'dataset': 10, 'median_ms': 10.0},
+            {'benchmark': 'c', 'dataset': 10, 'median_ms': 10.0},
+        ]
+        results = [
+            {'benchmark': 'a', 'dataset': 10, 'median_ms': 13.0},
+            {'benchmark': 'b', 'dataset': 10, 'median_ms': 7.0},
+            {'benchmark': 'c', 'dataset': 10, 'median_ms': 11.0},
+            {'benchmark': 'd', 'dataset': 10, 'median_ms': 1.0},
+        ]
+        self.assertEqual(
+            [(row[0], row[-1]) for row in compare(results, baseline)],
+            [('a', 'slower'), ('b', 'faster'), ('c', 'same')],
+        )
+
+    def test_fail_on_regression(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'baseline.json')
+        with open(path, 'w', encoding='utf-8') as baseline_file:
+            json.dump({'results': [{'benchmark': 'model.full_clean', 'dataset': 5, 'median_ms': 1e-9}]}, baseline_file)
+        with self.assertRaisesMessage(CommandError, 'slower than the baseline'):
+            call_command(
+                'benchmark', rows=[5], benchmark=['model.full_clean'], repeat=1, warmup=0,
+                baseline=path, fail_on_regression=True, stdout=StringIO(),
+            )
+
+
+class BulkAPITests(TestCase):
+    """JSON API пакетного создания и обновления транзакций"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('bulk-api')
+        self.other = User.objects.create_user('bulk-api-other')
+        self.client.force_login(self.user)
+        self.existing = make_transaction(self.user, '10.00')
+
+    def item(self, **fields):
+        return {
+            'date': '2024-03-01', 'status': 'business', 'type': 'expense', 'category': 'food',
+            'subcategory': 'products', 'amount': '12.50', 'comment': 'пакет', **fields,
+        }
+
+    def post(self, items, mode='atomic'):
+        return self.client.post(
+            reverse('dds_app:transactions_bulk'), {'mode': mode, 'transactions': items},
+            content_type='application/json',
+        )
+
+    def test_atomic(self):
+        response = self.post([self.item(), self.item(amount='abc')])
+        self.assertEqual(response.status_code, 400)
+        body = response.json()
+        self.assertEqual((body['created'], body['errors']), (0, 1))
+        self.assertEqual([result['status'] for result in body['results']], ['skipped', 'error'])
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+
+        response = self.post([self.item(), {'id': self.existing.pk, 'amount': '20.00'}])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['created'], body['updated'], body['errors']), (1, 1, 0))
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.amount, Decimal('20.00'))
+        self.assertEqual(body['results'][1], {'index': 1, 'status': 'updated', 'id': self.existing.pk})
+        created = Transaction.objects.get(pk=body['results'][0]['id'])
+        self.assertEqual((created.amount, created.user), (Decimal('12.50'), self.user))
+
+    def test_partial(self):
+        response = self.post([self.item(), self.item(category='salary'), 'строка'], mode='partial')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual((body['created'], body['updated'], body['errors']), (1, 0, 2))
+        self.assertEqual([result['status'] for result in body['results']], ['created', 'error', 'error'])
+        self.assertIn('category', body['results'][1]['errors'])
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 2)
+
+    def test_other_users_transaction(self):
+        foreign = make_transaction(self.other, '5.00')
+        response = self.post([{'id': foreign.pk, 'amount': '1.00'}], mode='partial')
+        self.assertEqual(response.json()['results'][0]['errors'], {'id': 'Транзакция не найдена'})
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.amount, Decimal('5.00'))
+
+    def test_malformed_types(self):
+        items = [
+            self.item(date=5),
+            self.item(amount=True),
+            self.item(amount=['1']),
+            self.item(status={'a': 1}),
+            {'id': True, 'amount': '1.00'},
+        ]
+        response = self.post(items, mode='partial')
+        self.assertEqual(response.status_code, 200)
+        errors = [result['errors'] for result in response.json()['results']]
+        self.assertEqual([list(error) for error in errors], [['date'], ['amount'], ['amount'], ['status'], ['id']])
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 1)
+
+    @override_settings(DDS_BULK_API_MAX_ITEMS=2)
+    def test_max_items(self):
+        self.assertEqual(self.post([self.item()] * 3).status_code, 413)
+        self.assertEqual(self.post([self.item()] * 2).status_code, 200)
+
+    def test_bad_request(self):
+        self.assertEqual(self.post([self.item()], mode='both').status_code, 400)
+        response = self.client.post(reverse('dds_app:transactions_bulk'), 'не json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_anonymous(self):
+        self.client.logout()
+        self.assertEqual(self.post([self.item()]).status_code, 401)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+
+class MoneyFieldTests(SimpleTestCase):
+
+    def test_bool_rejected(self):
+        with self.assertRaises(ValidationError):
+            Transaction._meta.get_field('amount').to_python(True)
+
+
+class ImportTransactionsTests(TestCase):
+    """Импорт выписки: корректные строки загружаются, остальные уходят в файл отказов"""
+
+    CSV = (
+        'date,status,type,category,subcategory,amount,comment\n'
+        '2024-01-10,business,expense,food,products,"1 234,56",Ашан\n'
+        '15.01.2024,Личное,Списание,Еда,Доставка,99.90,\n'
+        '2024-01-20,business,expense,food,products,много,Ошибка суммы\n'
+        '2024-01-21,business,income,food,products,10.00,Не тот тип\n'
+    )
+
+    def setUp(self):
+        self.user = User.objects.create_user('import')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'statement.csv')
+        with open(self.path, 'w', encoding='utf-8') as csv_file:
+            csv_file.write(self.CSV)
+
+    def import_csv(self, **options):
+        call_command('import_transactions', self.path, user='import', stdout=StringIO(), **options)
+
+    def rejects(self):
+        with open(f'{self.path}.rejects.csv', encoding='utf-8') as rejects_file:
+            return list(csv.reader(rejects_file))
+
+    def test_good_and_bad_rows(self):
+        self.import_csv(batch_size=2)
+
+        self.assertQuerySetEqual(
+            Transaction.objects.filter(user=self.user).order_by('date'),
+            [
+                (date(2024, 1, 10), 'business', 'products', Decimal('1234.56'), 'Ашан'),
+                (date(2024, 1, 15), 'personal', 'delivery', Decimal('99.90'), ''),
+            ],
+            lambda obj: (obj.date, obj.status, obj.subcategory, obj.amount, obj.comment),
+        )
+        bucket = (self.user.pk, date(2024, 1, 10), 'expense', 'business', 'food', 'products')
+        self.assertEqual(rollup_snapshot(self.user)[bucket], (123456, 1))
+
+        header, *rows = self.rejects()
+        self.assertEqual(header, ['line', *TRANSACTION_FIELDS, 'error'])
+        self.assertEqual([(row[0], row[-2]) for row in rows], [('4', 'Ошибка суммы'), ('5', 'Не тот тип')])
+        self.assertTrue(rows[0][-1].startswith('amount: '))
+        self.assertTrue(rows[1][-1].startswith('category: '))
+
+    def test_dry_run(self):
+        self.import_csv(dry_run=True)
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+        self.assertEqual(len(self.rejects()), 3)
+
+    def test_files_closed_when_import_fails(self):
+        opened = []
+
+        def tracking_open(*args, **kwargs):
+            opened.append(open(*args, **kwargs))
+            return opened[-1]
+
+        with (
+            mock.patch('dds_app.management.commands.import_transactions.open', tracking_open, create=True),
+            mock.patch.object(Transaction.objects, 'bulk_create', side_effect=OperationalError('диск')),
+            self.assertRaises(OperationalError),
+        ):
+            self.import_csv(batch_size=4)
+        self.assertEqual([file.closed for file in opened], [True, True])
+        self.assertEqual(len(self.rejects()), 3)
+
+    def test_missing_columns(self):
+        with open(self.path, 'w', encoding='utf-8') as csv_file:
+            csv_file.write('date,amount\n2024-01-10,1.00\n')
+        with self.assertRaisesMessage(CommandError, 'Missing CSV columns: status'):
+            self.import_csv()
+
+
+class PerformanceMiddlewareTests(TestCase):
+    """Метрики запроса в заголовке Server-Timing и в логе dds_app.performance"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('timing')
+        self.client.force_login(self.user)
+        make_transaction(self.user)
+
+    def timings(self, response):
+        return {
+            name: (float(duration[len('dur='):]), desc)
+            for name, duration, *desc in (part.split(';') for part in response['Server-Timing'].split(', '))
+        }
+
+    def test_server_timing(self):
+        with CaptureQueriesContext(connection) as queries, self.assertLogs('dds_app.performance', 'INFO') as logs:
+            response = self.client.get(reverse('dds_app:transaction_list'))
+        timings = self.timings(response)
+        self.assertEqual(list(timings), ['total', 'db', 'tpl'])
+        self.assertEqual(timings['db'][1], [f'desc="{len(queries)} queries"'])
+        self.assertGreater(timings['tpl'][0], 0)
+        self.assertLessEqual(timings['tpl'][0], timings['total'][0])
+
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((record['view'], record['status'], record['sql_count']), (
+            'dds_app:transaction_list', 200, len(queries),
+        ))
+
+    def test_json_view_has_no_template_time(self):
+        response = self.client.get(reverse('dds_app:taxonomy'))
+        self.assertEqual(self.timings(response)['tpl'][0], 0)
+
+    def test_rendering_outside_request(self):
+        # Штатный класс шаблона не подменяется: замер только в бэкенде dds_app
+        self.assertEqual(DjangoTemplate.render.__module__, 'django.template.backends.django')
+        self.assertIsInstance(engines['django'].from_string(''), TimedTemplate)
+        self.assertEqual(engines['django'].from_string('{{ value }}').render({'value': 1}), '1')
+
+    @override_settings(DDS_SERVER_TIMING=False)
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('dds_app:taxonomy')))
+
+
+class FacetCountTests(TestCase):
+    """Счётчики фильтров совпадают с числом строк, которое даст выбор варианта"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('facets')
+        food = {'category': Transaction.Category.FOOD, 'subcategory': Transaction.Subcategory.PRODUCTS}
+        make_transaction(self.user, comment='Продление VPS')
+        make_transaction(self.user, status=Transaction.Status.PERSONAL, comment='VPS для себя')
+        make_transaction(self.user, status=Transaction.Status.PERSONAL, comment='Ашан', **food)
+        make_transaction(self.user, status=Transaction.Status.TAX, comment='Ашан', **food)
+        make_transaction(self.user, day=date(2024, 2, 1), comment='Пятёрочка', **food)
+        make_transaction(
+            self.user, type=Transaction.Type.INCOME, category=Transaction.Category.SALARY,
+            subcategory=Transaction.Subcategory.MAIN_SALARY, comment='Зарплата',
+        )
+        make_transaction(User.objects.create_user('facets-other'), comment='Ашан', **food)
+
+    def matching(self, cleaned_data):
+        queryset = TransactionListView()._apply_filters(Transaction.objects.filter(user=self.user), cleaned_data)
+        if cleaned_data.get('q'):
+            queryset = queryset.search(cleaned_data['q'], user=self.user)
+        return queryset.count()
+
+    def assertCounts(self, cleaned_data):
+        counts = facet_counts(facet_groups(self.user, cleaned_data), cleaned_data)
+        or_mode = cleaned_data['filter_mode'] == 'or'
+        selected_rows = self.matching(cleaned_data)
+        for name in FACET_FIELDS:
+            for value, _ in Transaction._meta.get_field(name).choices:
+                selected = list(cleaned_data.get(name, []))
+                if value in selected:
+                    continue
+                with_value = self.matching({**cleaned_data, name: selected + [value]})
+                expected = with_value - selected_rows if or_mode and any(
+                    cleaned_data.get(field) for field in FACET_FIELDS
+                ) else self.matching({**cleaned_data, name: [value]})
+                with self.subTest(criteria=cleaned_data, field=name, value=value):
+                    self.assertEqual(counts[name].get(value, 0), expected)
+
+    def test_and(self):
+        self.assertCounts({'filter_mode': 'and'})
+        self.assertCounts({'filter_mode': 'and', 'status': ['personal'], 'category': ['food']})
+        self.assertCounts({'filter_mode': 'and', 'type': ['expense'], 'date_to': date(2024, 1, 31)})
+
+    def test_or(self):
+        self.assertCounts({'filter_mode': 'or'})
+        self.assertCounts({'filter_mode': 'or', 'status': ['personal']})
+        self.assertCounts({'filter_mode': 'or', 'status': ['tax'], 'category': ['salary']})
+
+    def test_search(self):
+        self.assertCounts({'filter_mode': 'and', 'q': 'ашан'})
+        self.assertCounts({'filter_mode': 'and', 'q': 'vps', 'status': ['personal']})
+        self.assertCounts({'filter_mode': 'or', 'q': 'ашан', 'status': ['tax']})
+
+    def test_or_counts_added_rows(self):
+        counts = facet_counts(facet_groups(self.user, {}), {'filter_mode': 'or', 'status': ['personal']})
+        # Еда: три строки, одна уже отобрана статусом "Личное"
+        self.assertEqual(counts['category']['food'], 2)
+        self.assertEqual(counts['status']['personal'], 2)
+
+    def test_list_view(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('dds_app:transaction_list'), {'filter_mode': 'and', 'category': 'food'})
+        status_counts = {
+            choice.data['value']: count for choice, count in response.context['facet_choices']['status']
+        }
+        self.assertEqual(status_counts, {'business': 1, 'personal': 1, 'tax': 1})
+
+
+class SeedDatabaseTests(TestCase):
+    """Генератор данных: одинаковый seed - одинаковые данные, повторный запуск их не дублирует"""
+
+    def seed(self, **options):
+        output = StringIO()
+        call_command('seed_db', users=2, per_user=40, username_prefix='seed', stdout=output, **options)
+        return output.getvalue()
+
+    def snapshot(self):
+        return list(Transaction.objects.filter(user__username__startswith='seed').order_by(
+            'user__username', 'date', 'amount', 'comment', 'status', 'category', 'subcategory',
+        ).values_list('user__username', 'date', 'status', 'type', 'category', 'subcategory', 'amount', 'comment'))
+
+    def test_deterministic(self):
+        self.seed(seed=7)
+        first = self.snapshot()
+        self.assertEqual(len(first), 80)
+        for row in first:
+            self.assertEqual(Transaction.relation_errors(*row[3:6]), {})
+
+        self.seed(seed=7, reset=True)
+        self.assertEqual(self.snapshot(), first)
+        self.seed(seed=8, reset=True)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_rerun_idempotent(self):
+        self.seed(seed=7)
+        first = self.snapshot()
+        output = self.seed(seed=7)
+        self.assertIn('Skipped 2 users', output)
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual(User.objects.filter(username__startswith='seed').count(), 2)
+        user = User.objects.get(username='seed1')
+        stored = rollup_snapshot(user)
+        CashFlowRollup.objects.rebuild(user)
+        self.assertEqual(rollup_snapshot(user), stored)
+
+
+class TaxonomyTests(TestCase):
+    """Справочник одним JSON: версия в URL и перепроверка по ETag"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('taxonomy'))
+
+    def test_tree_matches_model_maps(self):
+        tree = self.client.get(reverse('dds_app:taxonomy')).json()
+        self.assertEqual(
+            {node['id']: [category['id'] for category in node['categories']] for node in tree['types']},
+            Transaction.TYPE_CATEGORY_MAP,
+        )
+        for node in tree['types']:
+            for category in node['categories']:
+                self.assertEqual(
+                    [subcategory['id'] for subcategory in category['subcategories']],
+                    Transaction.CATEGORY_SUBCATEGORY_MAP[category['id']],
+                )
+
+    def test_not_modified(self):
+        response = self.client.get(reverse('dds_app:taxonomy'))
+        self.assertEqual((response['ETag'], response['Cache-Control']), (f'"{TAXONOMY_VERSION}"', 'private, no-cache'))
+        response = self.client.get(reverse('dds_app:taxonomy'), headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        for name, params in (('ajax_load_categories', {'type_value': 'income'}),
+                             ('ajax_load_subcategories', {'category_value': 'food'})):
+            with self.subTest(view=name):
+                response = self.client.get(reverse(f'dds_app:{name}'), params)
+                self.assertEqual(response.status_code, 200)
+                response = self.client.get(
+                    reverse(f'dds_app:{name}'), params, headers={'If-None-Match': response['ETag']},
+                )
+                self.assertEqual(response.status_code, 304)
+
+    def test_versioned_url(self):
+        response = self.client.get(reverse('dds_app:taxonomy_versioned', args=[TAXONOMY_VERSION]))
+        self.assertEqual(response['Cache-Control'], 'private, max-age=31536000, immutable')
+        self.assertEqual(response.content, TAXONOMY_JSON)
+        self.assertRedirects(
+            self.client.get(reverse('dds_app:taxonomy_versioned', args=['0' * 16])),
+            reverse('dds_app:taxonomy_versioned', args=[TAXONOMY_VERSION]),
+        )
+
+
+class ConditionalGetTests(TestCase):
+    """ETag/Last-Modified страниц с данными пользователя и ответы 304"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('conditional')
+        self.client.force_login(self.user)
+        make_transaction(self.user, '10.00')
+
+    def test_round_trip(self):
+        for name in ('transaction_list', 'cashflow_report', 'pivot_report', 'pivot_report_api'):
+            with self.subTest(view=name):
+                url = reverse(f'dds_app:{name}')
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('no-cache', response['Cache-Control'])
+                self.assertIn('private', response['Cache-Control'])
+
+                cached = self.client.get(url, headers={'If-None-Match': response['ETag']})
+                self.assertEqual((cached.status_code, cached['ETag']), (304, response['ETag']))
+                cached = self.client.get(url, headers={'If-Modified-Since': response['Last-Modified']})
+                self.assertEqual(cached.status_code, 304)
+
+    def test_write_changes_validators(self):
+        url = reverse('dds_app:transaction_list')
+        etag = self.client.get(url)['ETag']
+        make_transaction(self.user, '5.00', comment='после первой загрузки')
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'после первой загрузки')
+
+    def test_filter_changes_etag(self):
+        url = reverse('dds_app:transaction_list')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, {'filter_mode': 'and', 'category': 'food'}, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_pending_messages_prevent_304(self):
+        etag = make_etag(self.user.pk, 1)
+        request = RequestFactory().get('/', headers={'If-None-Match': etag})
+        request._messages = CookieStorage(request)
+        self.assertEqual(not_modified(request, etag, None).status_code, 304)
+        request._messages.add(messages.SUCCESS, 'Транзакция успешно создана!')
+        self.assertIsNone(not_modified(request, etag, None))
+
+    def test_other_user_etag(self):
+        url = reverse('dds_app:transaction_list')
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(User.objects.create_user('conditional-other'))
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+
+@mock.patch('dds_app.routers.replica_configured', return_value=True)
+class ReplicaRouterTests(TestCase):
+    """Чтения replica_reads-представлений идут на реплику, кроме окна после записи"""
+
+    @staticmethod
+    def read_db(request):
+        return HttpResponse(Transaction.objects.all().db)
+
+    def request(self, method='get', session=None):
+        request = getattr(RequestFactory(), method)('/')
+        request.session = session if session is not None else SessionStore()
+        return request
+
+    def test_reads(self, configured):
+        view = replica_reads(self.read_db)
+        self.assertEqual(view(self.request()).content, b'replica')
+        self.assertEqual(view(self.request('post')).content, b'default')
+        # Вне replica_reads и для записей - основная БД
+        self.assertEqual(Transaction.objects.all().db, 'default')
+        self.assertEqual(ReplicaRouter().db_for_write(Transaction), 'default')
+        configured.return_value = False
+        self.assertEqual(view(self.request()).content, b'default')
+
+    def test_sticky_window(self, configured):
+        view = replica_reads(self.read_db)
+        session = SessionStore()
+        mark_write(self.request('post', session))
+        self.assertEqual(view(self.request(session=session)).content, b'default')
+
+        session[LAST_WRITE_SESSION_KEY] -= 301
+        self.assertEqual(view(self.request(session=session)).content, b'replica')
+        with override_settings(DDS_REPLICA_STICKY_SECONDS=600):
+            self.assertEqual(view(self.request(session=session)).content, b'default')
+
+    async def test_async_view(self, configured):
+        async def read_db(request):
+            return HttpResponse(Transaction.objects.all().db)
+
+        view = replica_reads(read_db)
+        request = AsyncRequestFactory().get('/')
+        request.session = SessionStore()
+        self.assertEqual((await view(request)).content, b'replica')
+        await amark_write(request)
+        self.assertEqual((await view(request)).content, b'default')
+
+    def test_post_marks_session(self, configured):
+        user = User.objects.create_user('replica')
+        self.client.force_login(user)
+        self.client.get(reverse('dds_app:taxonomy'))
+        self.assertNotIn(LAST_WRITE_SESSION_KEY, self.client.session)
+        self.client.post(reverse('dds_app:transaction_create'), {
+            'date': '2024-01-15', 'status': 'business', 'type': 'expense', 'category': 'infrastructure',
+            'subcategory': 'vps', 'amount': '1.00',
+        })
+        self.assertTrue(Transaction.objects.filter(user=user).exists())
+        self.assertAlmostEqual(self.client.session[LAST_WRITE_SESSION_KEY], time.time(), delta=60)
+
+
+@mock.patch.object(TransactionListView, 'paginate_by', 4)
+class RunningBalanceTests(TestCase):
+    """Остаток строки списка равен сумме со знаком всех строк выборки до неё включительно"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('balance')
+        self.client.force_login(self.user)
+        food = {'category': Transaction.Category.FOOD, 'subcategory': Transaction.Subcategory.PRODUCTS}
+        salary = {
+            'type': Transaction.Type.INCOME, 'category': Transaction.Category.SALARY,
+            'subcategory': Transaction.Subcategory.MAIN_SALARY,
+        }
+        for day, amount, fields in (
+            (1, '1000.00', salary), (1, '10.10', food), (2, '5.00', {}), (2, '7.25', food),
+            (2, '3.00', {'comment': 'Ашан'} | food), (3, '500.00', salary), (5, '0.99', {}),
+            (5, '12.00', {'comment': 'Ашан у дома'} | food), (5, '1.00', {}), (9, '250.00', salary),
+            (9, '40.00', {'status': Transaction.Status.TAX}),
+        ):
+            make_transaction(self.user, amount, date(2024, 3, day), **fields)
+        # Другой пользователь не влияет на остаток
+        make_transaction(User.objects.create_user('balance-other'), '999.00', date(2024, 3, 1))
+
+    def expected(self, params):
+        params = {'filter_mode': 'and', **params}
+        queryset = TransactionListView()._apply_filters(Transaction.objects.filter(user=self.user), params)
+        if params.get('q'):
+            queryset = queryset.search(params['q'], user=self.user)
+        balance, balances = Decimal(0), {}
+        for row in queryset.order_by(*KeysetPaginator.reverse_ordering):
+            balance += row.amount if row.type == Transaction.Type.INCOME else -row.amount
+            balances[row.pk] = balance
+        return balances
+
+    def listed(self, params):
+        # Форма фильтра списка без filter_mode невалидна
+        params = {'filter_mode': 'and', **params}
+        balances, cursor = {}, None
+        while True:
+            response = self.client.get(reverse('dds_app:transaction_list'), {**params, 'cursor': cursor or ''})
+            for row in response.context['transactions']:
+                balances[row.pk] = row.balance
+            cursor = response.context['page'].next_cursor
+            if cursor is None:
+                return balances
+
+    def test_pages_and_filters(self):
+        for params in (
+            {},
+            {'filter_mode': 'and', 'category': ['food', 'salary']},
+            {'filter_mode': 'or', 'status': ['tax'], 'category': ['salary']},
+            {'date_from': '2024-03-02', 'date_to': '2024-03-05'},
+            {'q': 'ашан'},
+            {'q': 'ашан', 'date_from': '2024-03-03'},
+        ):
+            with self.subTest(params=params):
+                expected = self.expected(params)
+                self.assertTrue(expected)
+                self.assertEqual(self.listed(params), expected)
+
+
+@skipUnless(importlib.util.find_spec('numpy'), 'numpy is not installed')
+@override_settings(DDS_COLUMNAR={'memory_budget_mb': 16})
+class ColumnarAnalyticsTests(TestCase):
+    """Аналитика по колоночному снимку совпадает с GROUP BY в SQL и догоняет записи"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('columnar')
+        food = {'category': Transaction.Category.FOOD, 'subcategory': Transaction.Subcategory.PRODUCTS}
+        salary = {
+            'type': Transaction.Type.INCOME, 'category': Transaction.Category.SALARY,
+            'subcategory': Transaction.Subcategory.MAIN_SALARY,
+        }
+        for day, amount, fields in (
+            (date(2023, 12, 31), '1000.00', salary), (date(2024, 1, 1), '10.10', food),
+            (date(2024, 1, 15), '5.00', {}), (date(2024, 1, 15), '7.25', {'comment': 'Ашан'} | food),
+            (date(2024, 2, 29), '0.01', {'status': Transaction.Status.PERSONAL}),
+            (date(2024, 3, 1), '500.00', salary), (date(2024, 3, 9), '12.00', {'comment': 'Ашан у дома'} | food),
+            (date(2024, 3, 9), '40.00', {'status': Transaction.Status.TAX}),
+        ):
+            make_transaction(self.user, amount, day, **fields)
+        make_transaction(User.objects.create_user('columnar-other'), '999.00', date(2024, 1, 15))
+        self.engine = get_columnar_engine()
+
+    def sql(self, criteria, group_by):
+        queryset = TransactionListView()._apply_filters(Transaction.objects.filter(user=self.user), criteria)
+        if criteria.get('q'):
+            queryset = queryset.search(criteria['q'], user=self.user)
+        if not group_by:
+            row = queryset.aggregate(total=Sum('amount', default=Decimal('0.00')), count=Count('pk'))
+            return {(): (row['total'], row['count'])}
+        rows = queryset.annotate(month=TruncMonth('date'), year=ExtractYear('date')).values(*group_by).annotate(
+            total=Sum('amount'), count=Count('pk'),
+        ).order_by()
+        return {tuple(row[name] for name in group_by): (row['total'], row['count']) for row in rows}
+
+    def columnar(self, criteria, group_by):
+        return {
+            tuple(row[name] for name in group_by): (row['total'], row['count'])
+            for row in self.engine.aggregate(self.user, criteria, group_by)
+        }
+
+    def assertMatchesSQL(self, criteria, group_by):
+        with self.subTest(criteria=criteria, group_by=group_by):
+            self.assertEqual(self.columnar(criteria, group_by), self.sql(criteria, group_by))
+
+    def test_group_by_matches_sql(self):
+        for criteria in (
+            {'filter_mode': 'and'},
+            {'filter_mode': 'and', 'type': ['expense'], 'category': ['food']},
+            {'filter_mode': 'or', 'status': ['tax'], 'category': ['salary']},
+            {'filter_mode': 'and', 'date_from': date(2024, 1, 15), 'date_to': date(2024, 3, 1)},
+            {'filter_mode': 'and', 'q': 'ашан'},
+        ):
+            for group_by in ((), ('category',), ('month',), ('year', 'type'), ('date', 'status', 'subcategory')):
+                self.assertMatchesSQL(criteria, group_by)
+
+    def test_snapshot_patched_after_writes(self):
+        self.engine.aggregate(self.user, {'filter_mode': 'and'})
+        changed = Transaction.objects.filter(user=self.user, amount=Decimal('5.00')).get()
+        with self.captureOnCommitCallbacks(execute=True):
+            make_transaction(self.user, '3.50', date(2024, 4, 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            changed.amount = Decimal('6.00')
+            changed.category = Transaction.Category.FOOD
+            changed.subcategory = Transaction.Subcategory.PRODUCTS
+            changed.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.filter(user=self.user, amount=Decimal('40.00')).get().delete()
+
+        for group_by in ((), ('category',), ('month', 'status')):
+            self.assertMatchesSQL({'filter_mode': 'and'}, group_by)
+        stats = self.engine.stats()
+        # Снимок строился один раз, дальше только патчи
+        self.assertEqual((stats['builds'], stats['patches']), (1, 3))
+
+    def test_api(self):
+        url = reverse('dds_app:transactions_analytics')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(self.user)
+        response = self.client.get(url, {'group_by': ['year', 'type'], 'category': 'salary'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rows'], [
+            {'year': 2023, 'type': 'income', 'total': '1000.00', 'count': 1},
+            {'year': 2024, 'type': 'income', 'total': '500.00', 'count': 1},
+        ])
+        self.assertEqual(self.client.get(url, {'group_by': 'comment'}).status_code, 400)
+
+
+@override_settings(
+    DDS_RESULT_CACHE=None,
+    DDS_ROW_CACHE={'BACKEND': 'dds_app.cache.LRUCacheBackend', 'OPTIONS': {'max_entries': 100}},
+)
+class RowFragmentCacheTests(TestCase):
+    """Строка списка берётся из кэша, пока не сменился её updated_at; остаток не кэшируется"""
+
+    def setUp(self):
+        get_row_cache().clear()
+        self.user = User.objects.create_user('rows')
+        self.client.force_login(self.user)
+        self.income = make_transaction(
+            self.user, '1000.00', date(2024, 3, 1), type=Transaction.Type.INCOME,
+            category=Transaction.Category.SALARY, subcategory=Transaction.Subcategory.MAIN_SALARY,
+        )
+        self.vps = make_transaction(self.user, '100.00', date(2024, 3, 2), comment='Продление VPS')
+        self.other = make_transaction(self.user, '5.00', date(2024, 3, 3), comment='Домен')
+
+    def get_list(self, **params):
+        response = self.client.get(reverse('dds_app:transaction_list'), {'filter_mode': 'and', **params})
+        return response, response.content.decode()
+
+    def counters(self):
+        stats = get_row_cache().stats()
+        return stats['hits'], stats['misses']
+
+    def test_rows_rerendered_after_update(self):
+        self.get_list()
+        self.assertEqual(self.counters(), (0, 3))
+        self.get_list()
+        self.assertEqual(self.counters(), (3, 3))
+
+        self.vps.comment = 'Продление VPS на год'
+        self.vps.save()
+        _, content = self.get_list()
+        self.assertEqual(self.counters(), (5, 4))
+        self.assertIn('Продление VPS на год', content)
+
+        Transaction.objects.filter(pk=self.other.pk).update(amount=Decimal('7.00'))
+        _, content = self.get_list()
+        self.assertEqual(self.counters(), (7, 5))
+        self.assertIn('-7.00₽', content)
+        self.assertNotIn('-5.00₽', content)
+
+    def test_balance_follows_filter(self):
+        self.get_list()
+        for params in ({'type': 'expense'}, {'q': 'домен'}, {}):
+            with self.subTest(params=params):
+                response, content = self.get_list(**params)
+                for row in response.context['transactions']:
+                    self.assertIn(str(balance_cell(row.balance)), content)
+        # Все строки после первого запроса - из кэша
+        self.assertEqual(self.counters()[1], 3)
+        self.assertIn(str(balance_cell(Decimal('-5.00'))), self.get_list(q='домен')[1])
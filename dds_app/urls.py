@@ -1,14 +1,34 @@
+from django.conf import settings
 from django.urls import path
 from . import views
+from .routers import replica_reads
+
+# Под ASGI читающие представления заменяются async-вариантами;
+# replica_reads - чтения с реплики БД, если она настроена (dds_app.routers)
+if getattr(settings, 'DDS_ASYNC_VIEWS', False):
+    from . import async_views as read_views
+else:
+    read_views = views
 
 app_name = 'dds_app'
 
 urlpatterns = [
-    path('transactions/', views.TransactionListView.as_view(), name='transaction_list'),
+    path('transactions/', replica_reads(read_views.TransactionListView.as_view()), name='transaction_list'),
+    path('transactions/export/', replica_reads(read_views.TransactionExportView.as_view()), name='transaction_export'),
+    path('transactions/bulk-action/', views.transaction_bulk_action, name='transaction_bulk_action'),
     path('transactions/create/', views.TransactionCreateView.as_view(), name='transaction_create'),
     path('transactions/edit/<int:pk>/', views.transaction_edit, name='transaction_edit'),
     path('transactions/delete/<int:pk>/', views.transaction_delete, name='transaction_delete'),
-    path('ajax/load-categories/', views.load_categories, name='ajax_load_categories'),
-    path('ajax/load-subcategories/', views.load_subcategories, name='ajax_load_subcategories'),
+    path('api/transactions/bulk/', views.transactions_bulk, name='transactions_bulk'),
+    path('api/transactions/analytics/', views.transactions_analytics, name='transactions_analytics'),
+    path('reports/cashflow/', replica_reads(read_views.cashflow_report), name='cashflow_report'),
+    path('reports/pivot/', replica_reads(read_views.pivot_report), name='pivot_report'),
+    path('reports/pivot/export/', replica_reads(views.pivot_report_export), name='pivot_report_export'),
+    path('api/reports/pivot/', replica_reads(read_views.pivot_report_api), name='pivot_report_api'),
+    path('ajax/taxonomy/', read_views.taxonomy, name='taxonomy'),
+    path('ajax/taxonomy/<str:version>/', read_views.taxonomy, name='taxonomy_versioned'),
+    path('ajax/load-categories/', read_views.load_categories, name='ajax_load_categories'),
+    path('ajax/load-subcategories/', read_views.load_subcategories, name='ajax_load_subcategories'),
     path('register/', views.register, name='register'),
+    path('monitoring/cache/', views.cache_stats, name='cache_stats'),
 ]
\ No newline at end of file
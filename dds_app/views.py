@@ -1,87 +1,191 @@
+import csv
+import json
+import logging
+from collections import Counter
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from django.middleware.csrf import get_token
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse, QueryDict, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.views import View
-from django.db.models import Q
-from .models import Transaction
-from .forms import TransactionForm, TransactionFilterForm, UserRegistrationForm
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag, require_GET, require_POST
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.conf import settings
+from .balance import attach_balances, page_balances
+from .bulk import save_transaction_batch
+from .models import CashFlowRollup, Transaction, UserDataVersion
+from .money import format_minor, from_minor, minor_units
+from .cache import get_result_cache
+from .columnar import GROUP_FIELDS, get_columnar_engine
+from .conditional import make_etag, not_modified, set_validators
+from .facets import base_criteria, facet_choices, facet_counts, facet_groups
+from .forms import (
+    CashFlowReportForm, PivotReportForm, TransactionBulkActionForm, TransactionForm, TransactionFilterForm,
+    UserRegistrationForm,
+)
+from .pagination import KeysetPaginator
+from .pivot import build_pivot, pivot_csv_rows, pivot_queryset
+from .rows import get_row_cache
+from .taxonomy import CATEGORIES_BY_TYPE, SUBCATEGORIES_BY_CATEGORY, TAXONOMY_JSON, TAXONOMY_VERSION
+from .writer import get_writer
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
+
+logger = logging.getLogger(__name__)
 
 # ================ AJAX Views для динамических селектов ================
 
 @login_required
+def taxonomy(request, version=None):
+    """
+    Полный справочник тип -> категория -> подкатегория одним JSON.
+
+    Ответ неизменен в пределах версии, поэтому отдаётся с сильным ETag,
+    а по версионированному URL - ещё и с годовым immutable-кэшированием:
+    форма загружает справочник один раз и дальше работает без сервера.
+    """
+    return taxonomy_response(request, version)
+
+
+def taxonomy_response(request, version=None):
+    """Ответ справочника без обращений к БД (общий для sync и async представлений)"""
+    if version is not None and version != TAXONOMY_VERSION:
+        # Устаревшая версия из закэшированной страницы - на актуальную
+        return redirect('dds_app:taxonomy_versioned', version=TAXONOMY_VERSION)
+
+    etag = f'"{TAXONOMY_VERSION}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(TAXONOMY_JSON, content_type='application/json')
+    response['ETag'] = etag
+    if version is not None:
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@staff_member_required
+def cache_stats(request):
+    """Счётчики кэша результатов и кэша строк списка текущего процесса (для мониторинга)"""
+    return JsonResponse({**get_result_cache().stats(), 'rows': get_row_cache().stats()})
+
+
+def taxonomy_etag(request):
+    return f'"{TAXONOMY_VERSION}"'
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@etag(taxonomy_etag)
 def load_categories(request):
     """AJAX загрузка категорий по типу транзакции"""
     type_value = request.GET.get('type_value')
-    print(f" AJAX: Loading categories for type '{type_value}'")
-    
-    categories = []
-
-    if type_value:
-        allowed_categories = Transaction.TYPE_CATEGORY_MAP.get(type_value, [])
-        print(f"   Allowed categories: {allowed_categories}")
-        
-        for value, label in Transaction.Category.choices:
-            if value in allowed_categories:
-                categories.append({'id': value, 'name': label})
-        
-        print(f"   Returning {len(categories)} categories: {[c['id'] for c in categories]}")
-    else:
-        print("   No type value provided, returning empty list")
-
-    return JsonResponse(categories, safe=False)
+    return JsonResponse(CATEGORIES_BY_TYPE.get(type_value, []), safe=False)
 
 
 @login_required
+@cache_control(private=True, no_cache=True)
+@etag(taxonomy_etag)
 def load_subcategories(request):
     """AJAX загрузка подкатегорий по категории"""
     category_value = request.GET.get('category_value')
-    print(f" AJAX: Loading subcategories for category '{category_value}'")
-    
-    subcategories = []
-
-    if category_value:
-        allowed_subcategories = Transaction.CATEGORY_SUBCATEGORY_MAP.get(category_value, [])
-        print(f"   Allowed subcategories: {allowed_subcategories}")
-        
-        for value, label in Transaction.Subcategory.choices:
-            if value in allowed_subcategories:
-                subcategories.append({'id': value, 'name': label})
-        
-        print(f"   Returning {len(subcategories)} subcategories: {[s['id'] for s in subcategories]}")
-    else:
-        print("   No category value provided, returning empty list")
-
-    return JsonResponse(subcategories, safe=False)
+    return JsonResponse(SUBCATEGORIES_BY_CATEGORY.get(category_value, []), safe=False)
 
 
 # ================ Основные представления транзакций ================
 
 class TransactionListView(LoginRequiredMixin, View):
-    """Список транзакций с фильтрацией"""
+    """Список транзакций с фильтрацией и keyset-пагинацией"""
+
+    paginate_by = 50
 
     def get(self, request):
-        transactions_queryset = Transaction.objects.filter(
-            user=request.user
-        ).order_by('-date', '-created_at')
+        transactions_queryset, filter_form = self.get_filtered_queryset(request)
+        cursor = request.GET.get('cursor')
+        criteria = filter_form.cleaned_data if filter_form.is_valid() else {}
+
+        # Версия читается до выборки: запись после чтения даст новую версию,
+        # и следующий запрос уже не попадёт в эту запись кэша
+        version, changed_at = UserDataVersion.objects.current(request.user)
+        # Страница содержит CSRF-токен формы массовых действий: новый секрет - новая копия.
+        # get_token создаёт секрет уже сейчас, если у клиента его ещё нет
+        get_token(request)
+        page_etag = make_etag(
+            request.user.pk, version, criteria, cursor, self.paginate_by, request.META['CSRF_COOKIE'],
+        )
+        response = not_modified(request, page_etag, changed_at)
+        if response is not None:
+            return response
+
+        cache_key = get_result_cache().make_key(request.user.pk, version, criteria, cursor, self.paginate_by)
+        page = get_result_cache().get_or_compute(
+            cache_key, lambda: self.get_page(request, transactions_queryset, criteria, cursor)
+        )
+
+        # Счётчики считаются по тем же критериям, что и список (без фильтра, если форма невалидна)
+        facets_key = get_result_cache().make_key(request.user.pk, version, base_criteria(criteria), 'facets')
+        groups = get_result_cache().get_or_compute(
+            facets_key, lambda: list(facet_groups(request.user, criteria))
+        )
+        counts = facet_counts(groups, criteria)
+
+        response = render(
+            request, 'dds_app/transaction_list.html', self.get_context_data(request, page, filter_form, counts),
+        )
+        return set_validators(response, page_etag, changed_at)
+
+    def get_page(self, request, transactions_queryset, criteria, cursor):
+        """Страница списка с нарастающим остатком в строках (dds_app.balance)"""
+        page = KeysetPaginator(transactions_queryset, per_page=self.paginate_by).page(cursor)
+        if page.object_list:
+            attach_balances(page.object_list, self.get_balances_queryset(
+                request, transactions_queryset, criteria, page.object_list
+            ))
+        return page
+
+    def get_balances_queryset(self, request, transactions_queryset, criteria, rows):
+        return page_balances(request.user, transactions_queryset, rows, criteria, self._apply_filters)
+
+    def get_context_data(self, request, page, filter_form, counts=None):
+        # Параметры фильтра без курсора - для ссылок на соседние страницы
+        filter_params = request.GET.copy()
+        filter_params.pop('cursor', None)
+
+        return {
+            'transactions': page.object_list,
+            'page': page,
+            'filter_query': filter_params.urlencode(),
+            'filter_form': filter_form,
+            'facet_choices': facet_choices(filter_form, counts),
+            'bulk_form': TransactionBulkActionForm(),
+        }
 
-        filter_form = TransactionFilterForm(request.GET)
+    def get_filtered_queryset(self, request, params=None):
+        """Транзакции пользователя с фильтрами из GET-параметров (или params)"""
+        transactions_queryset = Transaction.objects.filter(user=request.user)
+
+        filter_form = TransactionFilterForm(request.GET if params is None else params)
 
         if filter_form.is_valid():
             transactions_queryset = self._apply_filters(
                 transactions_queryset, filter_form.cleaned_data
             )
+            # Поиск по комментарию сужает результат в любом режиме фильтрации
+            if filter_form.cleaned_data.get('q'):
+                transactions_queryset = transactions_queryset.search(
+                    filter_form.cleaned_data['q'], user=request.user
+                )
 
-        context = {
-            'transactions': transactions_queryset,
-            'filter_form': filter_form,
-        }
-        return render(request, 'dds_app/transaction_list.html', context)
+        return transactions_queryset, filter_form
 
-    def _apply_filters(self, queryset, cleaned_data):
-        """Применение фильтров к queryset"""
+    def _apply_filters(self, queryset, cleaned_data, date_field='date'):
+        """Применение фильтров к queryset (date_field - поле даты, 'day' для агрегатов ДДС)"""
         filter_mode = cleaned_data.get('filter_mode', 'and')
 
         # Получаем значения фильтров
@@ -107,9 +211,9 @@ class TransactionListView(LoginRequiredMixin, View):
         # Фильтр по датам применяется всегда
         date_query = Q()
         if date_from:
-            date_query &= Q(date__gte=date_from)
+            date_query &= Q(**{f'{date_field}__gte': date_from})
         if date_to:
-            date_query &= Q(date__lte=date_to)
+            date_query &= Q(**{f'{date_field}__lte': date_to})
 
         # Объединяем запросы
         if queries:
@@ -129,132 +233,145 @@ class TransactionListView(LoginRequiredMixin, View):
         return queryset.filter(main_query)
 
 
+class _Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи"""
+
+    def write(self, value):
+        return value
+
+
+class TransactionExportView(TransactionListView):
+    """Потоковая выгрузка отфильтрованных транзакций в CSV"""
+
+    chunk_size = 2000
+
+    # Сумма выбирается в копейках и форматируется без Decimal на каждую строку
+    EXPORT_FIELDS = ('date', 'status', 'type', 'category', 'subcategory', minor_units('amount'), 'comment')
+    HEADER = ('Дата', 'Статус', 'Тип', 'Категория', 'Подкатегория', 'Сумма', 'Комментарий')
+
+    # Подписи выбираются из словарей, без get_*_display() на каждую строку
+    LABELS = {
+        'status': dict(Transaction.Status.choices),
+        'type': dict(Transaction.Type.choices),
+        'category': dict(Transaction.Category.choices),
+        'subcategory': dict(Transaction.Subcategory.choices),
+    }
+
+    def get(self, request):
+        transactions_queryset, filter_form = self.get_filtered_queryset(request)
+        rows = transactions_queryset.order_by(*KeysetPaginator.ordering).values_list(
+            *self.EXPORT_FIELDS
+        )
+        # Строки читаются уже после выхода из представления, когда маршрутизация
+        # на реплику (dds_app.routers) не действует - БД выбирается сейчас
+        rows = rows.using(rows.db)
+
+        response = StreamingHttpResponse(
+            self._stream_rows(rows.iterator(chunk_size=self.chunk_size)),
+            content_type='text/csv; charset=utf-8',
+        )
+        response['Content-Disposition'] = 'attachment; filename="transactions.csv"'
+        return response
+
+    def _stream_rows(self, rows):
+        writer = csv.writer(_Echo())
+        # BOM, чтобы Excel открывал файл в UTF-8
+        yield '\ufeff' + writer.writerow(self.HEADER)
+        for row in rows:
+            yield writer.writerow(self.csv_row(*row))
+
+    def csv_row(self, row_date, status, type_value, category, subcategory, amount, comment):
+        """Строка выгрузки из значений EXPORT_FIELDS"""
+        return (
+            row_date.isoformat(),
+            self.LABELS['status'].get(status, status),
+            self.LABELS['type'].get(type_value, type_value),
+            self.LABELS['category'].get(category, category),
+            self.LABELS['subcategory'].get(subcategory, subcategory),
+            format_minor(amount),
+            comment or '',
+        )
+
+
 class TransactionCreateView(LoginRequiredMixin, View):
     """Создание новой транзакции"""
 
     def get(self, request):
-        print(f" GET: Creating new transaction form")
         form = TransactionForm()
         return render(request, 'dds_app/transaction_form.html', {
             'form': form,
             'title': 'Добавить транзакцию',
-            'action': 'create'
+            'action': 'create',
+            'taxonomy_version': TAXONOMY_VERSION,
         })
 
     def post(self, request):
-        print(f" POST: Processing new transaction creation")
-        print(f"POST data keys: {list(request.POST.keys())}")
-        
         form = TransactionForm(request.POST)
         
         if form.is_valid():
-            print(" Form is valid, saving transaction...")
             transaction = form.save(commit=False)
             transaction.user = request.user
             
             try:
-                transaction.save()
-                print(f" Transaction saved successfully with ID: {transaction.pk}")
+                writer = get_writer()
+                if writer is not None:
+                    # Фиксация пачкой вместе с транзакциями других запросов (dds_app.writer)
+                    writer.create(transaction)
+                else:
+                    transaction.save()
+                logger.debug("Transaction %s created", transaction.pk)
                 messages.success(request, 'Транзакция успешно создана!')
                 return redirect('dds_app:transaction_list')
             except Exception as e:
-                print(f" Error saving transaction: {str(e)}")
+                logger.debug("Error saving transaction: %s", e)
                 form.add_error(None, f"Ошибка при сохранении транзакции: {str(e)}")
         else:
-            print(" Form validation failed:")
-            for field, errors in form.errors.items():
-                print(f"   {field}: {errors}")
+            logger.debug("Transaction form errors: %r", form.errors)
 
         return render(request, 'dds_app/transaction_form.html', {
             'form': form,
             'title': 'Добавить транзакцию',
-            'action': 'create'
+            'action': 'create',
+            'taxonomy_version': TAXONOMY_VERSION,
         })
 
 
 @login_required
 def transaction_edit(request, pk):
-    """Редактирование транзакции с улучшенным логированием"""
+    """Редактирование транзакции"""
     transaction = get_object_or_404(Transaction, pk=pk, user=request.user)
 
     if request.method == 'POST':
-        print(f"  POST: Editing transaction {pk}")
-        print("="*60)
-        
-        # Логируем POST данные
-        print(" Received POST data:")
-        for key, value in request.POST.items():
-            if key != 'csrfmiddlewaretoken':
-                print(f"   {key}: {repr(value)}")
-        
-        # Логируем исходные данные транзакции
-        print(f" Original transaction data:")
-        print(f"   ID: {transaction.pk}")
-        print(f"   Type: {repr(transaction.type)}")
-        print(f"   Category: {repr(transaction.category)}")
-        print(f"   Subcategory: {repr(transaction.subcategory)}")
-        print(f"   Amount: {transaction.amount}")
-        print(f"   Status: {repr(transaction.status)}")
-        
-        # Создаем форму
-        print(f" Creating form with POST data...")
         form = TransactionForm(request.POST, instance=transaction)
-        
-        print(f" Checking form validity...")
-        is_valid = form.is_valid()
-        print(f" Form validation result: {is_valid}")
-        
-        if is_valid:
-            print(" Form is valid, attempting to save...")
-            
+
+        if form.is_valid():
             try:
-                # Сохраняем изменения
                 updated_transaction = form.save(commit=False)
                 updated_transaction.user = request.user  # Убеждаемся, что пользователь не изменился
-                
-                print(f" Saving updated transaction:")
-                print(f"   Type: {repr(updated_transaction.type)}")
-                print(f"   Category: {repr(updated_transaction.category)}")
-                print(f"   Subcategory: {repr(updated_transaction.subcategory)}")
-                print(f"   Amount: {updated_transaction.amount}")
-                print(f"   Status: {repr(updated_transaction.status)}")
-                
                 updated_transaction.save()
-                
-                print(f" Transaction {pk} updated successfully!")
+
+                logger.debug("Transaction %s updated", pk)
                 messages.success(request, 'Транзакция успешно обновлена!')
                 return redirect('dds_app:transaction_list')
-                
+
             except ValueError as e:
-                print(f" ValueError during save: {str(e)}")
+                logger.debug("Validation error saving transaction %s: %s", pk, e)
                 form.add_error(None, f"Ошибка валидации: {str(e)}")
             except Exception as e:
-                print(f" Unexpected error during save: {str(e)}")
+                logger.debug("Error saving transaction %s: %s", pk, e)
                 form.add_error(None, f"Неизвестная ошибка: {str(e)}")
         else:
-            print(" Form validation failed!")
-            print(" Form errors:")
-            for field, errors in form.errors.items():
-                print(f"   {field}: {errors}")
-            
-            if form.non_field_errors():
-                print(" Non-field errors:")
-                for error in form.non_field_errors():
-                    print(f"   {error}")
-        
-        print("="*60 + "\n")
+            logger.debug("Transaction %s form errors: %r", pk, form.errors)
 
     else:  # GET request
-        print(f" GET: Loading edit form for transaction {pk}")
-        print(f"   Original values: type={transaction.type}, category={transaction.category}, subcategory={transaction.subcategory}")
-        
         form = TransactionForm(instance=transaction)
 
     return render(request, 'dds_app/transaction_form.html', {
         'form': form,
         'transaction': transaction,
         'title': 'Редактировать транзакцию',
-        'action': 'edit'
+        'action': 'edit',
+        'taxonomy_version': TAXONOMY_VERSION,
     })
 
 
@@ -264,7 +381,7 @@ def transaction_delete(request, pk):
     transaction = get_object_or_404(Transaction, pk=pk, user=request.user)
 
     if request.method == 'POST':
-        print(f"  Deleting transaction {pk}")
+        logger.debug("Deleting transaction %s", pk)
         transaction.delete()
         messages.success(request, 'Транзакция успешно удалена!')
         return redirect('dds_app:transaction_list')
@@ -274,6 +391,283 @@ def transaction_delete(request, pk):
     })
 
 
+@login_required
+@require_POST
+def transaction_bulk_action(request):
+    """
+    Массовое изменение статуса, смена категории или удаление отмеченных
+    транзакций (или всех, подходящих под фильтр) одним UPDATE/DELETE.
+    Агрегаты ДДС и версия данных обновляются в той же операции.
+    """
+    form = TransactionBulkActionForm(request.POST)
+    filter_query = request.POST.get('filter_query', '')
+    list_url = reverse('dds_app:transaction_list') + (f'?{filter_query}' if filter_query else '')
+
+    if not form.is_valid():
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(request, error)
+        return redirect(list_url)
+
+    data = form.cleaned_data
+    if data['all_matching'] and not data['filter_query']:
+        # Список без фильтра: действие над всеми транзакциями пользователя
+        queryset = Transaction.objects.filter(user=request.user)
+    elif data['all_matching']:
+        # Неверный фильтр отклоняется: список без него означал бы все транзакции
+        params = QueryDict(data['filter_query'], mutable=True)
+        params.setdefault('filter_mode', 'and')
+        queryset, filter_form = TransactionListView().get_filtered_queryset(request, params)
+        if not filter_form.is_valid():
+            return HttpResponseBadRequest('Неверный фильтр транзакций')
+    else:
+        queryset = Transaction.objects.filter(user=request.user, pk__in=data['ids'])
+
+    if data['action'] == 'delete':
+        rows, _ = queryset.delete()
+        messages.success(request, f'Удалено транзакций: {rows}')
+    elif data['action'] == 'status':
+        rows = queryset.update(status=data['status'])
+        messages.success(request, f'Статус изменён у транзакций: {rows}')
+    elif queryset.exclude(type=data['type']).exists():
+        messages.error(request, 'Категория не подходит к типу части выбранных транзакций: выберите транзакции одного типа')
+    else:
+        rows = queryset.update(category=data['category'], subcategory=data['subcategory'])
+        messages.success(request, f'Категория изменена у транзакций: {rows}')
+
+    logger.debug("Bulk action %s: user=%s all_matching=%s", data['action'], request.user.pk, data['all_matching'])
+    return redirect(list_url)
+
+
+# ================ Отчёты ================
+
+@login_required
+def cashflow_report(request):
+    """Отчёт ДДС по агрегатам: стоимость зависит от числа корзин, а не транзакций"""
+    form = CashFlowReportForm(request.GET or None)
+
+    # Агрегаты меняются только вместе с транзакциями, то есть с версией данных
+    version, changed_at = UserDataVersion.objects.current(request.user)
+    report_etag = make_etag(request.user.pk, version, form.cleaned_data if form.is_valid() else {}, 'cashflow')
+    response = not_modified(request, report_etag, changed_at)
+    if response is not None:
+        return response
+
+    period, grouped, by_category = cashflow_report_queries(request.user, form)
+    response = render(
+        request, 'dds_app/cashflow_report.html',
+        cashflow_report_context(form, period, list(grouped), list(by_category)),
+    )
+    return set_validators(response, report_etag, changed_at)
+
+
+def cashflow_report_queries(user, form):
+    """Период группировки и запросы отчёта: по периодам и типам, по категориям"""
+    rollups = CashFlowRollup.objects.filter(user=user)
+    period = 'month'
+
+    if form.is_valid():
+        period = form.cleaned_data['period'] or 'month'
+        if form.cleaned_data['date_from']:
+            rollups = rollups.filter(day__gte=form.cleaned_data['date_from'])
+        if form.cleaned_data['date_to']:
+            rollups = rollups.filter(day__lte=form.cleaned_data['date_to'])
+
+    period_expression = TruncMonth('day') if period == 'month' else F('day')
+    grouped = rollups.annotate(period=period_expression).values('period', 'type').annotate(
+        amount=Sum('total'), rows=Sum('count')
+    ).order_by('-period')
+    by_category = rollups.values('type', 'category').annotate(
+        amount=Sum('total'), rows=Sum('count')
+    ).order_by('type', '-amount')
+    return period, grouped, by_category
+
+
+def cashflow_report_context(form, period, grouped_rows, category_rows):
+    """Контекст шаблона отчёта из уже выбранных строк (суммы в копейках -> Decimal)"""
+    periods = {}
+    totals = {'income': 0, 'expense': 0, 'net': 0, 'count': 0}
+    for row in grouped_rows:
+        line = periods.setdefault(row['period'], {
+            'period': row['period'], 'income': 0, 'expense': 0, 'net': 0, 'count': 0,
+        })
+        sign = 1 if row['type'] == Transaction.Type.INCOME else -1
+        for target in (line, totals):
+            target[row['type']] += row['amount']
+            target['net'] += sign * row['amount']
+            target['count'] += row['rows']
+    for target in (*periods.values(), totals):
+        for key in ('income', 'expense', 'net'):
+            target[key] = from_minor(target[key])
+
+    category_labels = dict(Transaction.Category.choices)
+    categories = [
+        {
+            'type': row['type'],
+            'category': category_labels.get(row['category'], row['category']),
+            'amount': from_minor(row['amount']),
+            'count': row['rows'],
+        }
+        for row in category_rows
+    ]
+
+    return {
+        'form': form,
+        'period': period,
+        'periods': list(periods.values()),
+        'totals': totals,
+        'categories': categories,
+    }
+
+
+@login_required
+def pivot_report(request):
+    """Сводный отчёт ДДС: статьи по строкам, периоды по столбцам (см. dds_app.pivot)"""
+    form = PivotReportForm(request.GET or None)
+
+    version, changed_at = UserDataVersion.objects.current(request.user)
+    report_etag = make_etag(request.user.pk, version, form.cleaned_data if form.is_valid() else {}, 'pivot')
+    response = not_modified(request, report_etag, changed_at)
+    if response is not None:
+        return response
+
+    period, date_from, date_to = pivot_report_options(form)
+    report = build_pivot(pivot_queryset(request.user, date_from, date_to), period, date_from, date_to)
+    response = render(request, 'dds_app/pivot_report.html', {'form': form, 'report': report})
+    return set_validators(response, report_etag, changed_at)
+
+
+@login_required
+def pivot_report_export(request):
+    """Сводный отчёт ДДС в CSV: те же параметры, что у страницы отчёта"""
+    period, date_from, date_to = pivot_report_options(PivotReportForm(request.GET or None))
+    report = build_pivot(pivot_queryset(request.user, date_from, date_to), period, date_from, date_to)
+
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="cashflow_pivot_{period}.csv"'
+    # BOM, чтобы Excel открывал файл в UTF-8
+    response.write('\ufeff')
+    csv.writer(response).writerows(pivot_csv_rows(report))
+    return response
+
+
+def pivot_report_options(form):
+    """(period, date_from, date_to) сводного отчёта; при ошибках в форме - по месяцам за всё время"""
+    if not form.is_valid():
+        return 'month', None, None
+    return form.cleaned_data['period'] or 'month', form.cleaned_data['date_from'], form.cleaned_data['date_to']
+
+
+# ================ API ================
+
+@require_GET
+def pivot_report_api(request):
+    """
+    JSON API сводного отчёта ДДС.
+
+    Параметры - period (month, quarter, year), date_from, date_to; ответ -
+    столбцы, строки статей с уровнем вложенности (0 - тип, 1 - категория,
+    2 - подкатегория) и строка чистого потока net.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+
+    form = PivotReportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({'error': 'Неверные параметры отчёта', 'errors': form.errors}, status=400)
+
+    version, changed_at = UserDataVersion.objects.current(request.user)
+    report_etag = make_etag(request.user.pk, version, form.cleaned_data, 'pivot-json')
+    response = not_modified(request, report_etag, changed_at)
+    if response is not None:
+        return response
+
+    period, date_from, date_to = pivot_report_options(form)
+    report = build_pivot(pivot_queryset(request.user, date_from, date_to), period, date_from, date_to)
+    return set_validators(JsonResponse(report), report_etag, changed_at)
+
+
+@require_POST
+def transactions_bulk(request):
+    """
+    JSON API: создание и обновление транзакций пачкой.
+
+    Тело: {"mode": "atomic" | "partial", "transactions": [{...}, ...]};
+    элементы с "id" обновляют транзакции, без него - создают (см.
+    bulk.save_transaction_batch). Защищено CSRF, как и формы: клиент
+    передаёт токен в заголовке X-CSRFToken.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Тело запроса должно быть JSON'}, status=400)
+
+    items = payload.get('transactions') if isinstance(payload, dict) else None
+    mode = payload.get('mode', 'atomic') if isinstance(payload, dict) else None
+    if not isinstance(items, list) or mode not in ('atomic', 'partial'):
+        return JsonResponse({
+            'error': 'Ожидается {"mode": "atomic" | "partial", "transactions": [...]}',
+        }, status=400)
+
+    max_items = getattr(settings, 'DDS_BULK_API_MAX_ITEMS', 5000)
+    if len(items) > max_items:
+        return JsonResponse({'error': f'Не больше {max_items} транзакций за запрос'}, status=413)
+
+    results = save_transaction_batch(request.user, items, atomic=mode == 'atomic')
+    counts = Counter(result['status'] for result in results)
+    logger.debug(
+        "Bulk API: user=%s mode=%s created=%s updated=%s errors=%s",
+        request.user.pk, mode, counts['created'], counts['updated'], counts['error'],
+    )
+    return JsonResponse({
+        'mode': mode,
+        'created': counts['created'],
+        'updated': counts['updated'],
+        'errors': counts['error'],
+        'results': results,
+    }, status=400 if mode == 'atomic' and counts['error'] else 200)
+
+
+@require_GET
+def transactions_analytics(request):
+    """
+    JSON API: сумма и количество транзакций под фильтром списка в разрезе group_by.
+
+    Параметры фильтра - те же, что у списка (filter_mode по умолчанию and);
+    group_by повторяется: status, type, category, subcategory, date, month,
+    year. Считается по колоночному снимку данных пользователя (dds_app.columnar).
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+
+    engine = get_columnar_engine()
+    if engine is None:
+        return JsonResponse({'error': 'Аналитика отключена (DDS_COLUMNAR)'}, status=404)
+
+    params = request.GET.copy()
+    params.setdefault('filter_mode', 'and')
+    form = TransactionFilterForm(params)
+    group_by = request.GET.getlist('group_by')
+    unknown = [name for name in group_by if name not in GROUP_FIELDS]
+    if not form.is_valid() or unknown:
+        return JsonResponse({
+            'error': f'Группировка возможна по: {", ".join(GROUP_FIELDS)}' if unknown else 'Неверный фильтр',
+            'errors': form.errors,
+        }, status=400)
+
+    version, changed_at = UserDataVersion.objects.current(request.user)
+    analytics_etag = make_etag(request.user.pk, version, form.cleaned_data, group_by, 'analytics')
+    response = not_modified(request, analytics_etag, changed_at)
+    if response is not None:
+        return response
+
+    rows = engine.aggregate(request.user, form.cleaned_data, group_by, version=version)
+    return set_validators(JsonResponse({'group_by': group_by, 'rows': rows}), analytics_etag, changed_at)
+
+
 # ================ Прочие представления ================
 
 def register(request):
@@ -0,0 +1,189 @@
+"""
+Групповая фиксация новых транзакций (group commit).
+
+На SQLite каждая запись - отдельная транзакция БД со своей синхронизацией
+с диском, а конкурентные писатели ждут друг друга на блокировке записи.
+GroupCommitWriter собирает проверенные транзакции из всех потоков процесса
+в очередь; один поток-писатель фиксирует их пачками (до max_batch строк,
+сбор пачки - не дольше max_delay_ms) одним bulk_create, а каждый запрос
+ждёт, пока его строка будет зафиксирована.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections, connection, transaction as db_transaction
+from django.dispatch import receiver
+
+from .models import Transaction
+
+
+logger = logging.getLogger('dds_app.writer')
+
+# Признак остановки в очереди писателя
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Поток-писатель, фиксирующий транзакции пачками"""
+
+    def __init__(self, max_batch=64, max_delay_ms=2, timeout=30):
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.timeout = timeout
+        self.batches = 0
+        self.rows = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def create(self, obj):
+        """
+        Сохранить новую транзакцию и дождаться её фиксации; obj получает pk.
+
+        Внутри atomic() вызывающего кода строка сохраняется обычным save():
+        она должна стать частью его транзакции (и откатиться вместе с ней).
+        Если за timeout строка не зафиксирована, она снимается с очереди и
+        выбрасывается TimeoutError; если её пачка уже фиксируется, вызов
+        дожидается результата - повтор запроса не создаст дубль.
+        """
+        if connection.in_atomic_block:
+            obj.save()
+            return obj
+        obj.full_clean()
+        future = self.submit(obj)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise
+            return future.result()
+
+    def submit(self, obj):
+        """Поставить проверенную транзакцию в очередь; Future завершится после фиксации"""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((obj, future))
+        return future
+
+    def stop(self):
+        """Зафиксировать очередь и остановить поток"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'avg_batch': round(self.rows / self.batches, 2) if self.batches else None,
+            'queued': self._queue.qsize(),
+        }
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='dds-group-commit', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        stopping = False
+        previous_size = 0
+        while not stopping:
+            batch = [self._queue.get()]
+            if batch[0] is _STOP:
+                break
+            # Одиночный писатель не ждёт попутчиков; пока прошлая пачка была
+            # из нескольких строк, следующая собирается до max_delay
+            deadline = time.monotonic() + (self.max_delay if previous_size > 1 else 0)
+            while len(batch) < self.max_batch:
+                try:
+                    timeout = deadline - time.monotonic()
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._commit(batch)
+            previous_size = len(batch)
+        close_old_connections()
+        connection.close()
+
+    def _commit(self, batch):
+        # Строки, снятые по таймауту, пропускаются; остальные с этого момента не отменить
+        batch = [(obj, future) for obj, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        # Соединение потока живёт между пачками по правилам CONN_MAX_AGE
+        close_old_connections()
+        objs = [obj for obj, future in batch]
+        try:
+            # Агрегаты ДДС и версии данных обновляются в той же транзакции
+            Transaction.objects.bulk_create(objs)
+        except Exception:
+            # Пачка откатилась целиком: строки фиксируются по одной,
+            # чтобы ошибка одной строки не доставалась остальным запросам
+            logger.warning('Group commit of %d rows failed, retrying row by row', len(batch), exc_info=True)
+            for obj, future in batch:
+                # pk мог быть присвоен до отката
+                obj.pk = None
+                try:
+                    Transaction.objects.bulk_create([obj])
+                except Exception as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(obj)
+                    self._count(1)
+            return
+        for obj, future in batch:
+            future.set_result(obj)
+        self._count(len(batch))
+
+    def _count(self, rows):
+        self.batches += 1
+        self.rows += rows
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    """
+    Писатель по настройке DDS_GROUP_COMMIT ({'max_batch': ..., 'max_delay_ms': ...});
+    None, если групповая фиксация выключена.
+    """
+    global _writer
+    config = getattr(settings, 'DDS_GROUP_COMMIT', None)
+    if config is None:
+        return None
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = GroupCommitWriter(**config)
+    return _writer
+
+
+@atexit.register
+def _stop_writer():
+    if _writer is not None:
+        _writer.stop()
+
+
+@receiver(setting_changed)
+def _reset_writer(setting, **kwargs):
+    global _writer
+    if setting == 'DDS_GROUP_COMMIT' and _writer is not None:
+        _writer.stop()
+        _writer = None
@@ -12,5 +12,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dds_project.settings')
+# Под ASGI читающие представления обслуживаются async-вариантами
+os.environ.setdefault('DDS_ASYNC_VIEWS', '1')
+# Async-запросы открывают соединения в разных потоках, постоянные соединения
+# там не переиспользуются, а копятся - под ASGI они выключены
+os.environ.setdefault('DDS_CONN_MAX_AGE', '0')
 
 application = get_asgi_application()
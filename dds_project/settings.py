@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import importlib.util
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,8 +43,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'dds_app.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'dds_app.middleware.ReplicaStickyMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -54,7 +58,9 @@ ROOT_URLCONF = 'dds_project.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates with render timing for the Server-Timing header (dds_app.middleware)
+        'BACKEND': 'dds_app.backends.templates.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [BASE_DIR / 'dds_app/templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,11 +81,46 @@ WSGI_APPLICATION = 'dds_project.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'dds_app.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections between requests: pragmas run once per connection
+        'CONN_MAX_AGE': int(os.environ.get('DDS_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock at BEGIN: a deferred transaction that reads
+            # first cannot wait for the lock on upgrade and fails with
+            # "database is locked" regardless of busy_timeout
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Tests run on a file, not in memory: WAL and busy_timeout behave as in
+        # production, and concurrency tests can open connections from threads
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# PRAGMAs applied to every new SQLite connection by dds_app.backends.sqlite3,
+# on top of its DEFAULT_PRAGMAS (WAL, synchronous=NORMAL, busy_timeout=5000,
+# cache_size=-64000, temp_store=MEMORY, mmap_size=256MB). Per-database
+# overrides go to DATABASES[alias]['OPTIONS']['pragmas']; None drops a pragma.
+DDS_SQLITE_PRAGMAS = {}
+
+# Read replica (dds_app.routers): a copy of the main database refreshed by
+# `manage.py refresh_replica`. The transaction list, export and report read
+# from it unless the session wrote within DDS_REPLICA_STICKY_SECONDS, so the
+# window should cover the refresh interval. Enabled with DDS_READ_REPLICA=1.
+DDS_REPLICA_STICKY_SECONDS = 300
+
+if os.environ.get('DDS_READ_REPLICA', '0') == '1':
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        # Read-only connections; no IMMEDIATE transactions competing with refreshes
+        'OPTIONS': {'pragmas': {'query_only': True}},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['dds_app.routers.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -124,3 +165,83 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Performance instrumentation (dds_app.middleware.PerformanceMiddleware)
+
+# Requests slower than this are logged with WARNING level
+DDS_SLOW_REQUEST_MS = 500
+
+# Send per-request timings to the browser in the Server-Timing header
+DDS_SERVER_TIMING = True
+
+# Slow SQL log (dds_app.querylog.SlowQueryLog): queries slower than
+# DDS_SLOW_QUERY_MS are appended as JSON lines to DDS_SLOW_QUERY_LOG.
+# Parameter values are never written, only their number. The file is
+# rotated to <name>.1 past DDS_SLOW_QUERY_LOG_MAX_BYTES. DDS_SLOW_QUERY_EXPLAIN
+# adds EXPLAIN QUERY PLAN, an extra query on the request path. On in
+# development only; summarise with `manage.py slow_queries`.
+DDS_SLOW_QUERY_LOG_ENABLED = DEBUG
+DDS_SLOW_QUERY_MS = 100
+DDS_SLOW_QUERY_LOG = BASE_DIR / 'slow_queries.jsonl'
+DDS_SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+DDS_SLOW_QUERY_EXPLAIN = False
+
+# Serve the read-heavy views (transaction list, report, taxonomy/AJAX)
+# with their async versions from dds_app.async_views. dds_project/asgi.py
+# turns this on through the environment; WSGI keeps the sync views.
+DDS_ASYNC_VIEWS = os.environ.get('DDS_ASYNC_VIEWS', '0') == '1'
+
+# Group commit (dds_app.writer): new transactions from concurrent requests
+# are committed by one writer thread in batches of up to max_batch rows,
+# collected for at most max_delay_ms. None saves each row in its own
+# transaction.
+DDS_GROUP_COMMIT = {'max_batch': 64, 'max_delay_ms': 2}
+
+# Largest batch accepted by the bulk JSON API (dds_app.views.transactions_bulk).
+# Request bodies are also capped by DATA_UPLOAD_MAX_MEMORY_SIZE (2.5 MB by
+# default, roughly 10 000 transactions).
+DDS_BULK_API_MAX_ITEMS = 5000
+
+# Columnar analytics engine (dds_app.columnar) behind
+# /dds_app/api/transactions/analytics/: per-user NumPy snapshots of the
+# transactions, kept in process memory up to memory_budget_mb (LRU). Needs
+# numpy (pip install numpy); disabled when it is not installed. Set to None
+# to disable.
+DDS_COLUMNAR = {'memory_budget_mb': 256} if importlib.util.find_spec('numpy') else None
+
+# Cache of transaction list pages keyed by the user's data version
+# (dds_app.cache). LRUCacheBackend keeps entries in process memory;
+# dds_app.cache.DjangoCacheBackend stores them in CACHES[alias] instead.
+# Set to None to disable. Counters: /dds_app/monitoring/cache/ (staff only).
+DDS_RESULT_CACHE = {
+    'BACKEND': 'dds_app.cache.LRUCacheBackend',
+    'OPTIONS': {'max_entries': 512},
+}
+
+# Cache of rendered transaction list rows keyed by (pk, updated_at)
+# (dds_app.rows); same backends as DDS_RESULT_CACHE. About 2 KB per row.
+# Set to None to render every row with the template.
+DDS_ROW_CACHE = {
+    'BACKEND': 'dds_app.cache.LRUCacheBackend',
+    'OPTIONS': {'max_entries': 10000},
+}
+
+# App loggers report warnings (slow requests, slow SQL) by default.
+# DDS_LOG_LEVEL=INFO adds a line per request from dds_app.performance,
+# DEBUG adds the views' debug messages.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'dds_app': {
+            'handlers': ['console'],
+            'level': os.environ.get('DDS_LOG_LEVEL', 'WARNING'),
+        },
+    },
+}